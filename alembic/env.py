@@ -22,6 +22,7 @@ from api.sub_category.model import SubCategory
 from api.chat.model import ChatRoom, ChatMessage
 from api.payment.model import Payment, PaymentMethod, RefundRequest
 from api.product.model import Product
+from api.media.model import MediaAsset
 target_metadata = SQLModel.metadata
 
 
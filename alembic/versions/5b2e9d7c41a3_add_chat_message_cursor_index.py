@@ -0,0 +1,34 @@
+"""add chat message cursor index
+
+Revision ID: 5b2e9d7c41a3
+Revises: c3af36d79ed8, fix_address_columns
+Create Date: 2025-07-20 10:12:44.518203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b2e9d7c41a3'
+down_revision: Union[str, None] = ('c3af36d79ed8', 'fix_address_columns')
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Index cho history theo cursor: WHERE room_id = ? AND id < ? ORDER BY id DESC
+    op.create_index(
+        'ix_chat_messages_room_id_id',
+        'chat_messages',
+        ['room_id', sa.text('id DESC')],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_chat_messages_room_id_id', table_name='chat_messages')
@@ -0,0 +1,49 @@
+"""add chat read states
+
+Revision ID: 7e4c1a9f2d60
+Revises: 5b2e9d7c41a3
+Create Date: 2025-07-20 15:38:02.904117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7e4c1a9f2d60'
+down_revision: Union[str, None] = '5b2e9d7c41a3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('chat_read_states',
+        sa.Column('room_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('last_read_message_id', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['room_id'], ['chat_rooms.id'], ),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('room_id', 'user_id')
+    )
+
+    # Backfill watermarks from messages already marked as read
+    op.execute("""
+        INSERT INTO chat_read_states (room_id, user_id, last_read_message_id, updated_at)
+        SELECT r.id, u.user_id, MAX(m.id), NOW()
+        FROM chat_rooms r
+        CROSS JOIN LATERAL (VALUES (r.user1_id), (r.user2_id)) AS u(user_id)
+        JOIN chat_messages m
+          ON m.room_id = r.id
+         AND m.sender_id <> u.user_id
+         AND m.status = 'read'
+        GROUP BY r.id, u.user_id
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('chat_read_states')
@@ -0,0 +1,61 @@
+"""add rating summaries
+
+Revision ID: 9d3f6b2a8c15
+Revises: 7e4c1a9f2d60
+Create Date: 2025-07-21 09:05:51.227840
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9d3f6b2a8c15'
+down_revision: Union[str, None] = '7e4c1a9f2d60'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('rating_summaries',
+        sa.Column('target_type', sa.String(length=10), nullable=False),
+        sa.Column('target_id', sa.Integer(), nullable=False),
+        sa.Column('rating_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('rating_sum', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('star_1', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('star_2', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('star_3', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('star_4', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('star_5', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('target_type', 'target_id')
+    )
+
+    # Backfill từ các rating hiện có
+    for target_type, table, column in (
+        ('user', 'user_ratings', 'rated_user_id'),
+        ('shop', 'shop_ratings', 'shop_id'),
+    ):
+        op.execute(f"""
+            INSERT INTO rating_summaries (
+                target_type, target_id, rating_count, rating_sum,
+                star_1, star_2, star_3, star_4, star_5, updated_at
+            )
+            SELECT '{target_type}', {column}, COUNT(*), SUM(rating),
+                   COUNT(*) FILTER (WHERE rating = 1),
+                   COUNT(*) FILTER (WHERE rating = 2),
+                   COUNT(*) FILTER (WHERE rating = 3),
+                   COUNT(*) FILTER (WHERE rating = 4),
+                   COUNT(*) FILTER (WHERE rating = 5),
+                   NOW()
+            FROM {table}
+            GROUP BY {column}
+        """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('rating_summaries')
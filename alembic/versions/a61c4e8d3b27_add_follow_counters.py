@@ -0,0 +1,56 @@
+"""add follow counters
+
+Revision ID: a61c4e8d3b27
+Revises: 9d3f6b2a8c15
+Create Date: 2025-07-21 14:26:37.660418
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a61c4e8d3b27'
+down_revision: Union[str, None] = '9d3f6b2a8c15'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('users', sa.Column('followers_count', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('users', sa.Column('following_count', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('users', sa.Column('shop_following_count', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('shop', sa.Column('followers_count', sa.Integer(), nullable=False, server_default='0'))
+
+    # Backfill bộ đếm từ dữ liệu follow hiện có
+    op.execute("""
+        UPDATE users u SET followers_count = c.cnt
+        FROM (SELECT following_id, COUNT(*) AS cnt FROM user_follows GROUP BY following_id) c
+        WHERE u.id = c.following_id
+    """)
+    op.execute("""
+        UPDATE users u SET following_count = c.cnt
+        FROM (SELECT follower_id, COUNT(*) AS cnt FROM user_follows GROUP BY follower_id) c
+        WHERE u.id = c.follower_id
+    """)
+    op.execute("""
+        UPDATE users u SET shop_following_count = c.cnt
+        FROM (SELECT user_id, COUNT(*) AS cnt FROM shop_follows GROUP BY user_id) c
+        WHERE u.id = c.user_id
+    """)
+    op.execute("""
+        UPDATE shop s SET followers_count = c.cnt
+        FROM (SELECT shop_id, COUNT(*) AS cnt FROM shop_follows GROUP BY shop_id) c
+        WHERE s.id = c.shop_id
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('shop', 'followers_count')
+    op.drop_column('users', 'shop_following_count')
+    op.drop_column('users', 'following_count')
+    op.drop_column('users', 'followers_count')
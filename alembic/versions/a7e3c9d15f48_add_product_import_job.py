@@ -0,0 +1,51 @@
+"""add product import job
+
+Revision ID: a7e3c9d15f48
+Revises: f6c2a8d4e915
+Create Date: 2025-07-24 09:12:45.318207
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7e3c9d15f48'
+down_revision: Union[str, None] = 'f6c2a8d4e915'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('product_import_job',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('shop_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('status', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column('source_format', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column('source_filename', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+        sa.Column('total_products', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('processed_products', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('created_products', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('created_attributes', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('failed_products', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('errors', sa.JSON(), nullable=False),
+        sa.Column('message', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['shop_id'], ['shop.id'], ),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_product_import_job_shop_id'), 'product_import_job', ['shop_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_product_import_job_shop_id'), table_name='product_import_job')
+    op.drop_table('product_import_job')
@@ -0,0 +1,33 @@
+"""add attribute sku and version
+
+Revision ID: b3f8d2a6c174
+Revises: a7e3c9d15f48
+Create Date: 2025-07-24 16:05:31.842716
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b3f8d2a6c174'
+down_revision: Union[str, None] = 'a7e3c9d15f48'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('attribute', sa.Column('sku', sqlmodel.sql.sqltypes.AutoString(), nullable=True))
+    op.add_column('attribute', sa.Column('version', sa.Integer(), nullable=False, server_default='1'))
+    op.create_index(op.f('ix_attribute_sku'), 'attribute', ['sku'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_attribute_sku'), table_name='attribute')
+    op.drop_column('attribute', 'version')
+    op.drop_column('attribute', 'sku')
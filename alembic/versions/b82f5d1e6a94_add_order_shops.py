@@ -0,0 +1,50 @@
+"""add order shops
+
+Revision ID: b82f5d1e6a94
+Revises: a61c4e8d3b27
+Create Date: 2025-07-22 10:41:18.093551
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b82f5d1e6a94'
+down_revision: Union[str, None] = 'a61c4e8d3b27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('order_shops',
+        sa.Column('order_id', sa.Integer(), nullable=False),
+        sa.Column('shop_id', sa.Integer(), nullable=False),
+        sa.Column('item_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('subtotal', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['order_id'], ['orders.id'], ),
+        sa.ForeignKeyConstraint(['shop_id'], ['shop.id'], ),
+        sa.PrimaryKeyConstraint('order_id', 'shop_id')
+    )
+    op.create_index('ix_order_shops_shop_id_created_at', 'order_shops', ['shop_id', 'created_at'], unique=False)
+
+    # Backfill từ các đơn hàng hiện có
+    op.execute("""
+        INSERT INTO order_shops (order_id, shop_id, item_count, subtotal, created_at)
+        SELECT o.id, p.shop_id, SUM(oi.quantity), SUM(oi.total_price), o.created_at
+        FROM orders o
+        JOIN order_items oi ON o.id = oi.order_id
+        JOIN product p ON oi.product_id = p.product_id
+        WHERE p.shop_id IS NOT NULL
+        GROUP BY o.id, p.shop_id, o.created_at
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_order_shops_shop_id_created_at', table_name='order_shops')
+    op.drop_table('order_shops')
@@ -0,0 +1,28 @@
+"""add order items order id index
+
+Revision ID: c5d8e2f7a419
+Revises: b82f5d1e6a94
+Create Date: 2025-07-22 15:06:42.517203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5d8e2f7a419'
+down_revision: Union[str, None] = 'b82f5d1e6a94'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_order_items_order_id', 'order_items', ['order_id'], unique=False, if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_order_items_order_id', table_name='order_items', if_exists=True)
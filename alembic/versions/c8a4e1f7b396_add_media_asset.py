@@ -0,0 +1,40 @@
+"""add media asset
+
+Revision ID: c8a4e1f7b396
+Revises: b3f8d2a6c174
+Create Date: 2025-07-25 10:27:14.506381
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c8a4e1f7b396'
+down_revision: Union[str, None] = 'b3f8d2a6c174'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('media_asset',
+        sa.Column('content_hash', sqlmodel.sql.sqltypes.AutoString(length=64), nullable=False),
+        sa.Column('preset', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column('url', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column('width', sa.Integer(), nullable=False),
+        sa.Column('height', sa.Integer(), nullable=False),
+        sa.Column('variants', sa.JSON(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('content_hash', 'preset')
+    )
+    op.create_index(op.f('ix_media_asset_url'), 'media_asset', ['url'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_media_asset_url'), table_name='media_asset')
+    op.drop_table('media_asset')
@@ -0,0 +1,30 @@
+"""add user created_at last_login indexes
+
+Revision ID: d13a7c9e5b82
+Revises: c5d8e2f7a419
+Create Date: 2025-07-22 16:27:09.341876
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd13a7c9e5b82'
+down_revision: Union[str, None] = 'c5d8e2f7a419'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(op.f('ix_users_created_at'), 'users', ['created_at'], unique=False)
+    op.create_index(op.f('ix_users_last_login'), 'users', ['last_login'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_users_last_login'), table_name='users')
+    op.drop_index(op.f('ix_users_created_at'), table_name='users')
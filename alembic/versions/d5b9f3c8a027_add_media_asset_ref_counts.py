@@ -0,0 +1,47 @@
+"""add media asset ref counts
+
+Revision ID: d5b9f3c8a027
+Revises: c8a4e1f7b396
+Create Date: 2025-07-25 17:41:09.273615
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd5b9f3c8a027'
+down_revision: Union[str, None] = 'c8a4e1f7b396'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('media_asset', sa.Column('keys', sa.JSON(), nullable=False, server_default='[]'))
+    op.add_column('media_asset', sa.Column('ref_count', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('media_asset', sa.Column('orphaned_at', sa.DateTime(), nullable=True))
+    op.alter_column('media_asset', 'width', existing_type=sa.Integer(), nullable=True)
+    op.alter_column('media_asset', 'height', existing_type=sa.Integer(), nullable=True)
+    op.create_index(op.f('ix_media_asset_orphaned_at'), 'media_asset', ['orphaned_at'], unique=False)
+    # Asset đã có (image pipeline, lưu local): key của các file suy ra từ URL các bản thu nhỏ
+    op.execute("""
+        UPDATE media_asset SET keys = (
+            SELECT COALESCE(json_agg(regexp_replace(x.url, '^/static/', '')), '[]'::json)
+            FROM json_array_elements(variants) v,
+                 LATERAL (VALUES (v->>'webp'), (v->>'jpg')) AS x(url)
+        )
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_media_asset_orphaned_at'), table_name='media_asset')
+    op.execute("DELETE FROM media_asset WHERE width IS NULL OR height IS NULL")
+    op.alter_column('media_asset', 'height', existing_type=sa.Integer(), nullable=False)
+    op.alter_column('media_asset', 'width', existing_type=sa.Integer(), nullable=False)
+    op.drop_column('media_asset', 'orphaned_at')
+    op.drop_column('media_asset', 'ref_count')
+    op.drop_column('media_asset', 'keys')
@@ -0,0 +1,44 @@
+"""incremental product trending
+
+Revision ID: e1a7c4f9b258
+Revises: d5b9f3c8a027
+Create Date: 2025-07-26 10:12:47.518302
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e1a7c4f9b258'
+down_revision: Union[str, None] = 'd5b9f3c8a027'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Bảng xếp hạng cũ không có activity_score - job dựng lại toàn bộ ở lượt đầu tiên
+    op.execute("DELETE FROM product_trending")
+    op.add_column('product_trending', sa.Column('activity_score', sa.Float(), nullable=False, server_default='0'))
+    op.add_column('product_trending', sa.Column('last_activity_at', sa.DateTime(), nullable=True))
+    op.drop_constraint('product_trending_rank_key', 'product_trending', type_='unique')
+    op.create_unique_constraint(
+        'product_trending_rank_key', 'product_trending', ['rank'], deferrable=True, initially='DEFERRED'
+    )
+    op.create_index(op.f('ix_orders_updated_at'), 'orders', ['updated_at'], unique=False)
+    op.create_index('ix_order_items_product_id', 'order_items', ['product_id'], unique=False)
+    op.create_index(op.f('ix_cartitem_added_at'), 'cartitem', ['added_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_cartitem_added_at'), table_name='cartitem')
+    op.drop_index('ix_order_items_product_id', table_name='order_items')
+    op.drop_index(op.f('ix_orders_updated_at'), table_name='orders')
+    op.drop_constraint('product_trending_rank_key', 'product_trending', type_='unique')
+    op.create_unique_constraint('product_trending_rank_key', 'product_trending', ['rank'])
+    op.drop_column('product_trending', 'last_activity_at')
+    op.drop_column('product_trending', 'activity_score')
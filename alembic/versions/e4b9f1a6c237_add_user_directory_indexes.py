@@ -0,0 +1,40 @@
+"""add user directory indexes
+
+Revision ID: e4b9f1a6c237
+Revises: d13a7c9e5b82
+Create Date: 2025-07-23 09:12:55.804129
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4b9f1a6c237'
+down_revision: Union[str, None] = 'd13a7c9e5b82'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+_TRGM_COLUMNS = ('username', 'email', 'phone_number')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_users_role_is_active_id', 'users', ['role', 'is_active', 'id'], unique=False)
+
+    # Trigram index cho tìm kiếm ILIKE '%...%' trong danh bạ user admin
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for column in _TRGM_COLUMNS:
+        op.create_index(
+            f'ix_users_{column}_trgm', 'users', [column], unique=False,
+            postgresql_using='gin', postgresql_ops={column: 'gin_trgm_ops'}
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for column in _TRGM_COLUMNS:
+        op.drop_index(f'ix_users_{column}_trgm', table_name='users')
+    op.drop_index('ix_users_role_is_active_id', table_name='users')
@@ -0,0 +1,38 @@
+"""add product trending
+
+Revision ID: f6c2a8d4e915
+Revises: e4b9f1a6c237
+Create Date: 2025-07-23 14:38:20.661047
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f6c2a8d4e915'
+down_revision: Union[str, None] = 'e4b9f1a6c237'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('product_trending',
+        sa.Column('product_id', sa.Integer(), nullable=False),
+        sa.Column('rank', sa.Integer(), nullable=False),
+        sa.Column('score', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('order_quantity', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('cart_adds', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['product_id'], ['product.product_id'], ),
+        sa.PrimaryKeyConstraint('product_id'),
+        sa.UniqueConstraint('rank')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('product_trending')
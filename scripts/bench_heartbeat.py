@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Heartbeat scheduler benchmark
+So sánh timing wheel (api/chat/heartbeat.py) với cách quét toàn bộ dict heartbeat
+cho N kết nối WebSocket giả lập.
+
+Usage: python scripts/bench_heartbeat.py [--connections 50000] [--seconds 600]
+"""
+
+import argparse
+import importlib.util
+import os
+import random
+import time
+
+# Load module trực tiếp để không kéo theo router / database của package api.chat
+_HEARTBEAT_PATH = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..', 'src', 'api', 'chat', 'heartbeat.py')
+)
+_spec = importlib.util.spec_from_file_location("heartbeat", _HEARTBEAT_PATH)
+heartbeat = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(heartbeat)
+
+HeartbeatScheduler = heartbeat.HeartbeatScheduler
+PING_INTERVAL_SECONDS = heartbeat.PING_INTERVAL_SECONDS
+IDLE_TIMEOUT_SECONDS = heartbeat.IDLE_TIMEOUT_SECONDS
+
+
+class FakeClock:
+    """Monotonic clock điều khiển bằng tay để mô phỏng nhiều phút trong vài giây"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def simulate_wheel(connections: int, seconds: int, active_ratio: float, seed: int):
+    rng = random.Random(seed)
+    clock = FakeClock()
+    scheduler = HeartbeatScheduler(clock=clock)
+
+    start = time.perf_counter()
+    for user_id in range(connections):
+        scheduler.register(user_id)
+    register_time = time.perf_counter() - start
+
+    touches = 0
+    touch_time = 0.0
+    tick_time = 0.0
+    max_tick = 0.0
+    pings = 0
+    stale = 0
+    active = int(connections * active_ratio)
+
+    for _ in range(seconds):
+        clock.now += 1.0
+
+        # Mỗi giây một phần kết nối gửi dữ liệu
+        batch = [rng.randrange(active) for _ in range(active // 10)] if active else []
+        t0 = time.perf_counter()
+        for user_id in batch:
+            scheduler.touch(user_id)
+        touch_time += time.perf_counter() - t0
+        touches += len(batch)
+
+        t0 = time.perf_counter()
+        to_ping, dropped = scheduler.due()
+        elapsed = time.perf_counter() - t0
+        tick_time += elapsed
+        max_tick = max(max_tick, elapsed)
+        pings += len(to_ping)
+        stale += len(dropped)
+        for user_id in dropped:
+            scheduler.unregister(user_id)
+
+    return {
+        "register_ms": register_time * 1000,
+        "touch_ns": (touch_time / touches * 1e9) if touches else 0.0,
+        "avg_tick_ms": tick_time / seconds * 1000,
+        "max_tick_ms": max_tick * 1000,
+        "pings": pings,
+        "stale": stale,
+        "remaining": len(scheduler),
+    }
+
+
+def simulate_scan(connections: int, seconds: int, active_ratio: float, seed: int):
+    """Cách cũ: dict {user_id: last_heartbeat} và quét toàn bộ mỗi tick (kể cả chọn kết nối cần ping)"""
+    rng = random.Random(seed)
+    now = 1000.0
+    heartbeats = {user_id: now for user_id in range(connections)}
+    last_ping = {user_id: now for user_id in range(connections)}
+    active = int(connections * active_ratio)
+
+    scan_time = 0.0
+    max_scan = 0.0
+    pings = 0
+    stale = 0
+    for _ in range(seconds):
+        now += 1.0
+        for _ in range(active // 10):
+            heartbeats[rng.randrange(active)] = now
+
+        t0 = time.perf_counter()
+        idle_cutoff = now - IDLE_TIMEOUT_SECONDS
+        ping_cutoff = now - PING_INTERVAL_SECONDS
+        stale_users = []
+        to_ping = []
+        for user_id, last in heartbeats.items():
+            if last < idle_cutoff:
+                stale_users.append(user_id)
+            elif last <= ping_cutoff and last_ping[user_id] <= ping_cutoff:
+                to_ping.append(user_id)
+        for user_id in stale_users:
+            del heartbeats[user_id]
+            del last_ping[user_id]
+        for user_id in to_ping:
+            last_ping[user_id] = now
+        elapsed = time.perf_counter() - t0
+        scan_time += elapsed
+        max_scan = max(max_scan, elapsed)
+        pings += len(to_ping)
+        stale += len(stale_users)
+
+    return {
+        "avg_tick_ms": scan_time / seconds * 1000,
+        "max_tick_ms": max_scan * 1000,
+        "pings": pings,
+        "stale": stale,
+        "remaining": len(heartbeats),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark heartbeat scheduling")
+    parser.add_argument("--connections", type=int, default=50000)
+    parser.add_argument("--seconds", type=int, default=600, help="Simulated seconds")
+    parser.add_argument("--active-ratio", type=float, default=0.5,
+                        help="Fraction of connections that send traffic")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    print(f"💓 Heartbeat benchmark: {args.connections} connections, {args.seconds}s simulated")
+    print(f"   ping interval {PING_INTERVAL_SECONDS}s, idle timeout {IDLE_TIMEOUT_SECONDS}s")
+
+    wheel = simulate_wheel(args.connections, args.seconds, args.active_ratio, args.seed)
+    scan = simulate_scan(args.connections, args.seconds, args.active_ratio, args.seed)
+
+    print("\nTiming wheel (1s tick)")
+    print(f"   register all:     {wheel['register_ms']:.1f} ms")
+    print(f"   touch:            {wheel['touch_ns']:.0f} ns/op")
+    print(f"   tick avg / max:   {wheel['avg_tick_ms']:.3f} / {wheel['max_tick_ms']:.3f} ms")
+    print(f"   pings sent:       {wheel['pings']}")
+    print(f"   stale dropped:    {wheel['stale']} (remaining {wheel['remaining']})")
+
+    print("\nFull scan (every 1s)")
+    print(f"   tick avg / max:   {scan['avg_tick_ms']:.3f} / {scan['max_tick_ms']:.3f} ms")
+    print(f"   pings sent:       {scan['pings']}")
+    print(f"   stale dropped:    {scan['stale']} (remaining {scan['remaining']})")
+
+
+if __name__ == "__main__":
+    main()
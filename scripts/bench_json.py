@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+JSON rendering benchmark
+So sánh chi phí render một trang response cho các listing (product / order / chat):
+- stdlib   : jsonable_encoder + json.dumps (JSONResponse mặc định của FastAPI)
+- orjson   : jsonable_encoder + orjson.dumps (ORJSONResponse - default_response_class)
+- direct   : orjson.dumps thẳng trên dict projection (không qua jsonable_encoder)
+
+Payload được dựng giả lập với đúng các field của endpoint, không cần database.
+
+Usage: python scripts/bench_json.py [--items 100] [--rounds 2000]
+"""
+
+import argparse
+import json
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel
+
+
+class OrderSummary(BaseModel):
+    id: int
+    order_number: str
+    status: str
+    total_items: int
+    total_amount: float
+    created_at: datetime
+
+
+class ChatMessageRead(BaseModel):
+    id: int
+    room_id: int
+    sender_id: int
+    content: str
+    type: str
+    status: str
+    timestamp: datetime
+    file_url: Optional[str] = None
+    thumbnail_url: Optional[str] = None
+    reply_to_id: Optional[int] = None
+    is_edited: bool = False
+    is_deleted: bool = False
+
+
+def product_page(rng: random.Random, items: int):
+    now = datetime.utcnow()
+    rows = [{
+        "product_id": i,
+        "name": f"Sản phẩm xanh {i}",
+        "description": "Mô tả sản phẩm thân thiện môi trường " * 4,
+        "price": round(rng.uniform(10000, 900000), 2),
+        "cover": f"/static/products/product_{i:08x}.jpg",
+        "shop_id": rng.randint(1, 500),
+        "sub_category_id": rng.randint(1, 60),
+        "is_approved": True,
+        "create_at": (now - timedelta(minutes=i)).isoformat(),
+    } for i in range(items)]
+    return {"items": rows, "total": 12000, "page": 1, "limit": items,
+            "total_pages": 12000 // items, "has_next": True, "has_prev": False}
+
+
+def order_page(rng: random.Random, items: int, as_models: bool):
+    now = datetime.utcnow()
+    rows = [{
+        "id": i,
+        "order_number": f"ORD-20250723-{i:08X}",
+        "status": rng.choice(["pending", "confirmed", "shipped", "delivered"]),
+        "total_items": rng.randint(1, 8),
+        "total_amount": round(rng.uniform(50000, 3000000), 2),
+        "created_at": now - timedelta(hours=i),
+    } for i in range(items)]
+    if as_models:
+        rows = [OrderSummary(**row) for row in rows]
+    return {"items": rows, "total": 340, "page": 1, "limit": items,
+            "total_pages": 4, "has_next": True, "has_prev": False}
+
+
+def chat_page(rng: random.Random, items: int, as_models: bool):
+    now = datetime.utcnow()
+    rows = [{
+        "id": 10_000 + i,
+        "room_id": 42,
+        "sender_id": rng.choice([7, 9]),
+        "content": "Shop ơi còn hàng size M không ạ?" * rng.randint(1, 3),
+        "type": "text",
+        "status": "read",
+        "timestamp": now - timedelta(seconds=30 * i),
+        "file_url": None,
+        "thumbnail_url": None,
+        "reply_to_id": None,
+        "is_edited": False,
+        "is_deleted": False,
+    } for i in range(items)]
+    return [ChatMessageRead(**row) for row in rows] if as_models else rows
+
+
+def render_stdlib(content) -> bytes:
+    return json.dumps(
+        jsonable_encoder(content), ensure_ascii=False, allow_nan=False,
+        indent=None, separators=(",", ":"),
+    ).encode("utf-8")
+
+
+def render_orjson(content) -> bytes:
+    return orjson.dumps(jsonable_encoder(content), option=orjson.OPT_NON_STR_KEYS)
+
+
+def render_direct(content) -> bytes:
+    return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+def measure(render, content, rounds: int) -> float:
+    render(content)
+    start = time.perf_counter()
+    for _ in range(rounds):
+        render(content)
+    return (time.perf_counter() - start) / rounds * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=100)
+    parser.add_argument("--rounds", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    # (tên, payload theo cách endpoint hiện tại trả về, payload dạng dict projection)
+    cases = [
+        ("products", product_page(rng, args.items), product_page(rng, args.items)),
+        ("orders", order_page(rng, args.items, True), order_page(rng, args.items, False)),
+        ("chat", chat_page(rng, args.items, True), chat_page(rng, args.items, False)),
+    ]
+
+    print(f"{args.items} items/page, {args.rounds} rounds (µs per page)")
+    print(f"{'endpoint':<10}{'stdlib':>10}{'orjson':>10}{'direct':>10}{'speedup':>10}")
+    for name, current, projected in cases:
+        stdlib_us = measure(render_stdlib, current, args.rounds)
+        orjson_us = measure(render_orjson, current, args.rounds)
+        direct_us = measure(render_direct, projected, args.rounds)
+        print(f"{name:<10}{stdlib_us:>10.1f}{orjson_us:>10.1f}{direct_us:>10.1f}{stdlib_us / direct_us:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
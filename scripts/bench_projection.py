@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Product listing projection benchmark
+So sánh chi phí đọc N dòng sản phẩm rồi dựng dict trả về:
+- entity     : select(Product) -> ORM entity -> dict (cách listing cũ)
+- dataclass  : select(các cột) -> ProductListItem (slots) -> dict (api/product/read_model.py)
+- tuple      : select(các cột) -> Row -> dict
+
+Dùng SQLite in-memory với bảng có cùng cột như bảng product, nên không cần Postgres.
+Đo thời gian mỗi 1000 dòng và peak memory (tracemalloc) khi giữ kết quả trong bộ nhớ.
+
+Usage: python scripts/bench_projection.py [--rows 20000] [--rounds 5]
+"""
+
+import argparse
+import importlib.util
+import os
+import sys
+import time
+import tracemalloc
+import types
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import create_engine, insert
+from sqlmodel import Field, Session, SQLModel, select
+
+
+class Product(SQLModel, table=True):
+    """Cùng cột với api.product.model.Product (bỏ FK / relationship)"""
+    __tablename__ = "product"
+
+    product_id: Optional[int] = Field(default=None, primary_key=True)
+    shop_id: int
+    sub_category_id: int
+    is_approved: Optional[bool] = None
+    approval_note: Optional[str] = None
+    approver_id: Optional[int] = None
+    name: str
+    description: Optional[str] = None
+    cover: Optional[str] = None
+    price: Optional[float] = None
+    create_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+def load_read_model():
+    """Load read_model.py với Product ở trên thay cho api.product.model (tránh kéo database thật / app)"""
+    fake_model = types.ModuleType("api.product.model")
+    fake_model.Product = Product
+    sys.modules.setdefault("api", types.ModuleType("api"))
+    sys.modules.setdefault("api.product", types.ModuleType("api.product"))
+    sys.modules["api.product.model"] = fake_model
+    fake_images = types.ModuleType("api.media.images")
+    fake_images.image_variants = lambda url: None
+    sys.modules.setdefault("api.media", types.ModuleType("api.media"))
+    sys.modules["api.media.images"] = fake_images
+
+    path = os.path.abspath(
+        os.path.join(os.path.dirname(__file__), "..", "src", "api", "product", "read_model.py")
+    )
+    spec = importlib.util.spec_from_file_location("read_model", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+read_model = load_read_model()
+
+
+def entity_to_dict(product: Product) -> dict:
+    return {
+        "product_id": product.product_id,
+        "name": product.name,
+        "description": product.description,
+        "price": product.price,
+        "cover": product.cover,
+        "shop_id": product.shop_id,
+        "sub_category_id": product.sub_category_id,
+        "is_approved": product.is_approved,
+        "create_at": product.create_at.isoformat() if product.create_at else None,
+    }
+
+
+def row_to_dict(row) -> dict:
+    data = dict(row._mapping)
+    data["create_at"] = data["create_at"].isoformat() if data["create_at"] else None
+    return data
+
+
+def run_entity(session: Session):
+    products = session.exec(select(Product).where(Product.is_approved == True)).all()
+    result = [entity_to_dict(product) for product in products]
+    return products, result
+
+
+def run_dataclass(session: Session):
+    items = read_model.fetch_product_list(
+        session, read_model.select_product_list().where(Product.is_approved == True)
+    )
+    return items, [item.to_dict() for item in items]
+
+
+def run_tuple(session: Session):
+    rows = session.execute(
+        read_model.select_product_list().where(Product.is_approved == True)
+    ).all()
+    return rows, [row_to_dict(row) for row in rows]
+
+
+def seed(engine, rows: int):
+    SQLModel.metadata.create_all(engine)
+    now = datetime.utcnow()
+    values = [{
+        "shop_id": i % 500 + 1,
+        "sub_category_id": i % 60 + 1,
+        "is_approved": True,
+        "name": f"Sản phẩm xanh {i}",
+        "description": "Mô tả sản phẩm thân thiện môi trường " * 3,
+        "cover": f"/static/products/product_{i:08x}.jpg",
+        "price": float(10000 + i % 90000),
+        "create_at": now - timedelta(minutes=i),
+    } for i in range(rows)]
+    with engine.begin() as conn:
+        conn.execute(insert(Product), values)
+
+
+def measure(engine, runner, rows: int, rounds: int):
+    best = float("inf")
+    for _ in range(rounds):
+        with Session(engine) as session:
+            start = time.perf_counter()
+            runner(session)
+            best = min(best, time.perf_counter() - start)
+
+    with Session(engine) as session:
+        tracemalloc.start()
+        kept = runner(session)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del kept
+
+    per_1000 = rows / 1000
+    return best * 1000 / per_1000, peak / 1024 / per_1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    engine = create_engine("sqlite://")
+    seed(engine, args.rows)
+
+    print(f"{args.rows} rows, best of {args.rounds} (per 1000 rows)")
+    print(f"{'mode':<12}{'ms':>10}{'peak KiB':>12}")
+    baseline = None
+    for name, runner in (("entity", run_entity), ("dataclass", run_dataclass), ("tuple", run_tuple)):
+        ms, kib = measure(engine, runner, args.rows, args.rounds)
+        baseline = baseline or (ms, kib)
+        print(f"{name:<12}{ms:>10.2f}{kib:>12.1f}   ({baseline[0] / ms:.1f}x time, {baseline[1] / kib:.1f}x memory)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Tạo bản nén sẵn cho file tĩnh
+Ghi <file>.gz (và <file>.br nếu có package brotli) cạnh các file text trong thư mục
+static để MediaStaticFiles (src/api/media/static.py) trả bản nén mà không nén lúc request.
+Bỏ qua file đã có bản nén mới hơn file gốc và file mà bản nén không nhỏ hơn.
+
+Usage: python scripts/precompress_static.py [--root src/static] [--min-size 1024]
+"""
+
+import argparse
+import gzip
+import os
+
+# Cùng danh sách với api/media/static.py (import trực tiếp sẽ kéo theo starlette / config của app)
+COMPRESSIBLE_EXTENSIONS = {".css", ".js", ".json", ".svg", ".txt", ".html", ".xml", ".map"}
+
+
+def compressors():
+    result = [(".gz", lambda data: gzip.compress(data, compresslevel=9, mtime=0))]
+    try:
+        import brotli
+        result.append((".br", lambda data: brotli.compress(data, quality=11)))
+    except ImportError:
+        print("brotli not installed - only writing .gz")
+    return result
+
+
+def precompress(path: str, codecs, min_size: int) -> int:
+    stat = os.stat(path)
+    if stat.st_size < min_size:
+        return 0
+    written = 0
+    data = None
+    for suffix, compress in codecs:
+        target = path + suffix
+        if os.path.exists(target) and os.stat(target).st_mtime >= stat.st_mtime:
+            continue
+        if data is None:
+            with open(path, "rb") as f:
+                data = f.read()
+        compressed = compress(data)
+        if len(compressed) >= len(data):
+            continue
+        tmp = target + ".part"
+        with open(tmp, "wb") as f:
+            f.write(compressed)
+        os.replace(tmp, target)
+        written += 1
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--root", default=os.path.join("src", "static"))
+    parser.add_argument("--min-size", type=int, default=1024)
+    args = parser.parse_args()
+
+    codecs = compressors()
+    files = written = 0
+    for directory, _, names in os.walk(args.root):
+        for name in names:
+            if os.path.splitext(name)[1].lower() not in COMPRESSIBLE_EXTENSIONS:
+                continue
+            files += 1
+            written += precompress(os.path.join(directory, name), codecs, args.min_size)
+    print(f"{files} compressible files, {written} precompressed files written")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Cập nhật tồn kho hàng loạt (đồng bộ từ ERP của seller)
+Mỗi lô: một SELECT xác định các biến thể (theo attribute_id hoặc sku, trong shop của
+seller), một UPDATE ... FROM (VALUES ...) cho tất cả các dòng hợp lệ. Dòng có
+expected_version khác version hiện tại không được cập nhật (optimistic check) và
+được trả về với status "conflict" kèm version hiện tại.
+"""
+
+from typing import Dict, List, Optional, Set, Tuple
+from sqlalchemy import bindparam, text
+from sqlmodel import Session
+from api.attribute.scheme import InventoryUpdateItem, InventoryUpdateResult
+
+_RESOLVE_QUERY = text("""
+    SELECT a.attribute_id, a.sku, a.version, p.shop_id, p.sub_category_id
+    FROM attribute a
+    JOIN product p ON p.product_id = a.product_id
+    WHERE p.shop_id = :shop_id
+    AND (a.attribute_id IN :attribute_ids OR a.sku IN :skus)
+""").bindparams(bindparam("attribute_ids", expanding=True), bindparam("skus", expanding=True))
+
+_CURRENT_VERSIONS_QUERY = text("""
+    SELECT attribute_id, version FROM attribute WHERE attribute_id IN :attribute_ids
+""").bindparams(bindparam("attribute_ids", expanding=True))
+
+
+def _update_statement(count: int):
+    # Cast từng cột để Postgres biết kiểu của giá trị NULL trong VALUES
+    rows = ", ".join(
+        f"(CAST(:id_{i} AS INTEGER), CAST(:quantity_{i} AS INTEGER), "
+        f"CAST(:price_{i} AS DOUBLE PRECISION), CAST(:expected_version_{i} AS INTEGER))"
+        for i in range(count)
+    )
+    return text(f"""
+        UPDATE attribute AS a
+        SET quantity = COALESCE(v.quantity, a.quantity),
+            price = COALESCE(v.price, a.price),
+            version = a.version + 1
+        FROM (VALUES {rows}) AS v(attribute_id, quantity, price, expected_version)
+        WHERE a.attribute_id = v.attribute_id
+        AND (v.expected_version IS NULL OR a.version = v.expected_version)
+        RETURNING a.attribute_id, a.version
+    """)
+
+
+def bulk_update_inventory(
+    session: Session, shop_id: int, items: List[InventoryUpdateItem]
+) -> Tuple[List[InventoryUpdateResult], Set[Tuple[int, int]]]:
+    """
+    Áp dụng các dòng cập nhật cho biến thể thuộc shop và commit.
+    Trả về (kết quả theo từng dòng, vị trí (shop_id, sub_category_id) của các biến thể đã cập nhật).
+    """
+    results: Dict[int, InventoryUpdateResult] = {}
+    pending: List[Tuple[int, InventoryUpdateItem]] = []
+    for index, item in enumerate(items):
+        message = None
+        if (item.attribute_id is None) == (item.sku is None):
+            message = "Exactly one of attribute_id or sku is required"
+        elif item.quantity is None and item.price is None:
+            message = "Nothing to update (quantity or price required)"
+        if message:
+            results[index] = InventoryUpdateResult(
+                index=index, attribute_id=item.attribute_id, sku=item.sku, status="invalid", message=message
+            )
+        else:
+            pending.append((index, item))
+
+    # Xác định biến thể bằng một query
+    by_id: Dict[int, tuple] = {}
+    by_sku: Dict[str, List[tuple]] = {}
+    if pending:
+        rows = session.execute(_RESOLVE_QUERY, {
+            "shop_id": shop_id,
+            "attribute_ids": [item.attribute_id for _, item in pending if item.attribute_id is not None] or [0],
+            "skus": [item.sku for _, item in pending if item.sku is not None] or [""],
+        }).fetchall()
+        for row in rows:
+            by_id[row.attribute_id] = row
+            if row.sku is not None:
+                by_sku.setdefault(row.sku, []).append(row)
+
+    to_update: Dict[int, Tuple[int, InventoryUpdateItem]] = {}
+    for index, item in pending:
+        row: Optional[tuple] = None
+        message = None
+        status = "invalid"
+        if item.attribute_id is not None:
+            row = by_id.get(item.attribute_id)
+        else:
+            matches = by_sku.get(item.sku, [])
+            if len(matches) > 1:
+                message = f"SKU {item.sku} matches {len(matches)} variants"
+            elif matches:
+                row = matches[0]
+
+        if row is None and message is None:
+            status, message = "not_found", "Variant not found in your shop"
+        elif row is not None and row.attribute_id in to_update:
+            row, message = None, "Variant appears more than once in this batch"
+
+        if row is None:
+            results[index] = InventoryUpdateResult(
+                index=index, attribute_id=item.attribute_id, sku=item.sku, status=status, message=message
+            )
+        else:
+            to_update[row.attribute_id] = (index, item)
+
+    placements: Set[Tuple[int, int]] = set()
+    if to_update:
+        params = {}
+        for i, (attribute_id, (_, item)) in enumerate(to_update.items()):
+            params[f"id_{i}"] = attribute_id
+            params[f"quantity_{i}"] = item.quantity
+            params[f"price_{i}"] = item.price
+            params[f"expected_version_{i}"] = item.expected_version
+        updated = dict(session.execute(_update_statement(len(to_update)), params).fetchall())
+
+        conflicted = [attribute_id for attribute_id in to_update if attribute_id not in updated]
+        current_versions = dict(session.execute(
+            _CURRENT_VERSIONS_QUERY, {"attribute_ids": conflicted}
+        ).fetchall()) if conflicted else {}
+        session.commit()
+
+        for attribute_id, (index, item) in to_update.items():
+            row = by_id[attribute_id]
+            if attribute_id in updated:
+                placements.add((row.shop_id, row.sub_category_id))
+                results[index] = InventoryUpdateResult(
+                    index=index, attribute_id=attribute_id, sku=row.sku, status="updated",
+                    version=updated[attribute_id]
+                )
+            else:
+                results[index] = InventoryUpdateResult(
+                    index=index, attribute_id=attribute_id, sku=row.sku, status="conflict",
+                    version=current_versions.get(attribute_id),
+                    message=f"Version changed (expected {item.expected_version})"
+                )
+
+    return [results[index] for index in range(len(items))], placements
@@ -10,6 +10,7 @@ if TYPE_CHECKING:
 class Attribute(SQLModel, table=True):
     attribute_id: Optional[int] = Field(default=None, primary_key=True)
     product_id: int = Field(foreign_key="product.product_id")
+    sku: Optional[str] = Field(default=None, index=True)  # Mã biến thể của seller (duy nhất trong shop)
 
     color: Optional[str] = None
     size: Optional[str] = None
@@ -17,6 +18,8 @@ class Attribute(SQLModel, table=True):
     image: Optional[str] = None
     quantity: int = Field(default=1)
     create_at: datetime = Field(default_factory=datetime.utcnow)
+    # Tăng mỗi lần quantity/price thay đổi - dùng cho optimistic check của bulk update
+    version: int = Field(default=1)
 
     # Relationships using TYPE_CHECKING
     product: Optional["Product"] = Relationship(back_populates="attributes")
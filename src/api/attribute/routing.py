@@ -1,5 +1,3 @@
-import os
-import uuid
 from datetime import datetime
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
 from sqlmodel import Session, select
@@ -8,11 +6,24 @@ from typing import List, Annotated
 from api.auth.dependency import get_session, get_current_user
 from api.user.model import User
 from .model import Attribute
-from .scheme import AttributeRead
+from .scheme import AttributeRead, InventoryUpdateRequest, InventoryUpdateResponse
+from .inventory import bulk_update_inventory
+from api.product.model import Product
+from api.shop.model import Shop
+from api.auth.permission import require_seller_or_approver
+from api.product.cache import invalidate_product_listings
+from api.media.images import save_image, ATTRIBUTE_IMAGE
 
 router = APIRouter()
 
 
+def _invalidate_listings(session: Session, product_id: int):
+    """Biến thể thay đổi -> xoá cache listing chứa sản phẩm"""
+    product = session.get(Product, product_id)
+    if product:
+        invalidate_product_listings(session, [(product.shop_id, product.sub_category_id)])
+
+
 @router.post("", response_model=AttributeRead)
 async def create_attribute(
     current_user: Annotated[User, Depends(get_current_user)],
@@ -24,26 +35,16 @@ async def create_attribute(
     size: str = Form(...),
     price: float = Form(...),
     quantity: int = Form(...),
-    image: UploadFile = File(...)
+    image: UploadFile = File(...),
+    sku: str = Form(None),
 ):
-    # --- Tạo folder theo product ---
-    file_ext = os.path.splitext(image.filename)[1]
-    folder = f"static/attribute_images/product_{product_id}"
-    os.makedirs(folder, exist_ok=True)
-
-    # --- Đặt tên file tránh trùng (UUID) ---
-    filename = f"{uuid.uuid4()}{file_ext}"
-    save_path = os.path.join(folder, filename)
-
-    # --- Lưu file ảnh ---
-    with open(save_path, "wb") as f:
-        f.write(await image.read())
-
-    image_url = f"/static/attribute_images/product_{product_id}/{filename}"
+    # --- Lưu ảnh qua image pipeline ---
+    image_url = (await save_image(image, ATTRIBUTE_IMAGE, session)).url
 
     # --- Tạo Attribute ---
     attribute = Attribute(
         product_id=product_id,
+        sku=sku,
         color=color,
         size=size,
         price=price,
@@ -54,6 +55,7 @@ async def create_attribute(
     session.add(attribute)
     session.commit()
     session.refresh(attribute)
+    _invalidate_listings(session, attribute.product_id)
 
     return attribute
 
@@ -75,6 +77,36 @@ def get_attributes_by_product(product_id: int, session: Session = Depends(get_se
     return attributes
 
 
+@router.patch("/bulk", response_model=InventoryUpdateResponse)
+def bulk_update_attributes(
+    request: InventoryUpdateRequest,
+    current_user: Annotated[User, Depends(require_seller_or_approver)],
+    session: Session = Depends(get_session),
+):
+    """
+    Cập nhật quantity / price cho nhiều biến thể của shop trong một câu lệnh.
+    Mỗi dòng xác định biến thể bằng attribute_id hoặc sku; expected_version (nếu có)
+    phải khớp version hiện tại. Kết quả trả về theo từng dòng, đúng thứ tự items.
+    """
+    shop = session.exec(select(Shop).where(Shop.user_id == current_user.id)).first()
+    if not shop:
+        raise HTTPException(status_code=404, detail="No shop found")
+
+    results, placements = bulk_update_inventory(session, shop.id, request.items)
+    # Invalidate một lần cho cả lô
+    if placements:
+        invalidate_product_listings(session, placements)
+
+    updated = sum(1 for result in results if result.status == "updated")
+    conflicts = sum(1 for result in results if result.status == "conflict")
+    return InventoryUpdateResponse(
+        items=results,
+        updated=updated,
+        conflicts=conflicts,
+        failed=len(results) - updated - conflicts,
+    )
+
+
 @router.get("/{attribute_id}", response_model=AttributeRead)
 def get_attribute(attribute_id: int, session: Session = Depends(get_session)):
     attr = session.get(Attribute, attribute_id)
@@ -92,36 +124,39 @@ async def update_attribute(
     size: str = Form(...),
     price: float = Form(...),
     quantity: int = Form(...),
-    image: UploadFile = File(...)
+    image: UploadFile = File(None),
+    sku: str = Form(None),
 ):
-    attr = session.get(Attribute, attribute_id)
-    if not attr:
+    if not session.get(Attribute, attribute_id):
         raise HTTPException(status_code=404, detail="Attribute not found")
 
-    # Nếu có ảnh mới -> ghi đè
-    if image:
-        product_id = attr.product_id
-        file_ext = os.path.splitext(image.filename)[1]
-        folder = f"static/attribute_images/product_{product_id}"
-        os.makedirs(folder, exist_ok=True)
-
-        filename = f"{uuid.uuid4()}{file_ext}"
-        save_path = os.path.join(folder, filename)
+    # Xử lý ảnh trước khi khoá dòng
+    image_url = (await save_image(image, ATTRIBUTE_IMAGE, session)).url if image else None
 
-        with open(save_path, "wb") as f:
-            f.write(await image.read())
+    # Khoá dòng tới khi commit: version tăng từ giá trị đang khoá, bulk update đồng thời
+    # phải chờ rồi kiểm tra expected_version với version mới thay vì bị ghi đè
+    attr = session.get(Attribute, attribute_id, with_for_update=True, populate_existing=True)
+    if not attr:
+        raise HTTPException(status_code=404, detail="Attribute not found")
 
-        attr.image = f"/static/attribute_images/product_{product_id}/{filename}"
+    # Nếu có ảnh mới -> ghi đè
+    if image_url:
+        attr.image = image_url
 
     # Cập nhật các thông tin còn lại
     attr.color = color
     attr.size = size
+    if sku is not None:
+        attr.sku = sku
+    if (attr.price, attr.quantity) != (price, quantity):
+        attr.version += 1
     attr.price = price
     attr.quantity = quantity
 
     session.add(attr)
     session.commit()
     session.refresh(attr)
+    _invalidate_listings(session, attr.product_id)
 
     return attr
 
@@ -146,6 +181,8 @@ def delete_attribute(attribute_id: int, session: Session = Depends(get_session))
         )
 
     # Nếu không có cart items nào sử dụng, tiến hành xóa
+    product_id = attr.product_id
     session.delete(attr)
     session.commit()
+    _invalidate_listings(session, product_id)
     return {"detail": "Attribute deleted successfully"}
@@ -1,6 +1,7 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field, computed_field
+from typing import List, Optional
 from datetime import datetime
+from api.media import images
 
 class AttributeCreate(BaseModel):
     product_id: int
@@ -22,12 +23,49 @@ class AttributeUpdate(BaseModel):
 class AttributeRead(BaseModel):
     attribute_id: int
     product_id: int
+    sku: Optional[str] = None
     color: Optional[str]
     size: Optional[str]
     price: float
     image: Optional[str]
     quantity: int  # 👈 Thêm dòng này
     create_at: datetime
+    version: int
+
+    @computed_field
+    @property
+    def image_variants(self) -> Optional[List[dict]]:
+        """Các bản WebP/JPEG theo chiều rộng của ảnh biến thể"""
+        return images.image_variants(self.image)
 
     class Config:
         from_attributes = True
+
+
+# 📦 Bulk inventory update
+
+class InventoryUpdateItem(BaseModel):
+    """Một dòng cập nhật tồn kho - xác định biến thể bằng attribute_id hoặc sku"""
+    attribute_id: Optional[int] = None
+    sku: Optional[str] = None
+    quantity: Optional[int] = Field(None, ge=0)
+    price: Optional[float] = Field(None, ge=0)
+    # Version đọc được lần trước; khác version hiện tại thì dòng bị từ chối (conflict)
+    expected_version: Optional[int] = None
+
+class InventoryUpdateRequest(BaseModel):
+    items: List[InventoryUpdateItem] = Field(..., min_length=1, max_length=1000)
+
+class InventoryUpdateResult(BaseModel):
+    index: int  # Vị trí trong items
+    attribute_id: Optional[int] = None
+    sku: Optional[str] = None
+    status: str  # updated, conflict, not_found, invalid
+    version: Optional[int] = None  # Version sau khi cập nhật, hoặc version hiện tại khi conflict
+    message: Optional[str] = None
+
+class InventoryUpdateResponse(BaseModel):
+    items: List[InventoryUpdateResult]
+    updated: int
+    conflicts: int
+    failed: int
@@ -0,0 +1,173 @@
+"""
+HTTP caching cho các endpoint public (conditional GET)
+- cache_control(...) : dependency gắn header Cache-Control cho endpoint
+- ConditionalGetMiddleware : tính ETag từ nội dung response và trả 304 khi client
+  gửi If-None-Match / If-Modified-Since khớp
+- not_modified(...) : endpoint đã có ETag sẵn (từ version dữ liệu) thì trả 304 luôn,
+  không cần query / serialize
+"""
+
+import hashlib
+from email.utils import parsedate_to_datetime
+from typing import Optional
+from fastapi import Request, Response
+from starlette.datastructures import Headers, MutableHeaders
+
+# max-age mặc định (giây) cho từng nhóm endpoint
+PRODUCT_MAX_AGE = 30
+SHOP_MAX_AGE = 60
+CATEGORY_MAX_AGE = 300
+
+# Header được giữ lại trong response 304 (RFC 9110 15.4.5)
+_NOT_MODIFIED_HEADERS = (b"cache-control", b"etag", b"last-modified", b"vary", b"expires")
+
+
+def cache_control_header(max_age: int, stale_while_revalidate: Optional[int] = None) -> str:
+    value = f"public, max-age={max_age}"
+    if stale_while_revalidate:
+        value += f", stale-while-revalidate={stale_while_revalidate}"
+    return value
+
+
+def cache_control(max_age: int, stale_while_revalidate: Optional[int] = None):
+    """Dependency gắn Cache-Control: public cho response thành công của endpoint"""
+    header = cache_control_header(max_age, stale_while_revalidate)
+
+    def dependency(response: Response):
+        response.headers["Cache-Control"] = header
+
+    return dependency
+
+
+def make_etag(body: bytes) -> str:
+    """Weak ETag từ hash nội dung response"""
+    return f'W/"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+
+def _strip_weak(tag: str) -> str:
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """So sánh weak theo RFC 9110 13.1.2"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    target = _strip_weak(etag)
+    return any(_strip_weak(tag) == target for tag in if_none_match.split(","))
+
+
+def not_modified_since(if_modified_since: Optional[str], last_modified: Optional[str]) -> bool:
+    if not if_modified_since or not last_modified:
+        return False
+    try:
+        return parsedate_to_datetime(last_modified) <= parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+
+
+def is_not_modified(request_headers: Headers, etag: Optional[str], last_modified: Optional[str]) -> bool:
+    # If-None-Match được ưu tiên, chỉ xét If-Modified-Since khi client không gửi ETag
+    if_none_match = request_headers.get("if-none-match")
+    if if_none_match:
+        return etag is not None and etag_matches(if_none_match, etag)
+    return not_modified_since(request_headers.get("if-modified-since"), last_modified)
+
+
+def not_modified(request: Request, etag: str, cache_control_value: str) -> Optional[Response]:
+    """
+    Trả về response 304 nếu client đã có bản mới nhất (theo ETag biết trước), ngược lại None.
+    Dùng khi ETag tính được từ version dữ liệu mà không cần render response.
+    """
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": cache_control_value})
+    return None
+
+
+class ConditionalGetMiddleware:
+    """
+    ASGI middleware cho GET: response 200 có Cache-Control public được gắn ETag
+    (hash nội dung) và đổi thành 304 khi khớp If-None-Match / If-Modified-Since.
+    Response khác (private, streaming không có Cache-Control, lỗi...) đi thẳng qua.
+    """
+    def __init__(self, app, max_body_size: int = 4 * 1024 * 1024):
+        self.app = app
+        self.max_body_size = max_body_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "GET":
+            await self.app(scope, receive, send)
+            return
+
+        request_headers = Headers(scope=scope)
+        start_message = None
+        body_parts = []
+        body_size = 0
+        # "pending": đang chờ start; "buffer": gom body để tính ETag;
+        # "passthrough": gửi nguyên; "drop": đã gửi 304, bỏ body
+        mode = "pending"
+
+        async def send_not_modified(headers: MutableHeaders):
+            raw = [(k, v) for k, v in headers.raw if k in _NOT_MODIFIED_HEADERS]
+            await send({"type": "http.response.start", "status": 304, "headers": raw})
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+        async def wrapped_send(message):
+            nonlocal start_message, body_size, mode
+
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(raw=list(message["headers"]))
+                cache_control_value = headers.get("cache-control", "")
+                if message["status"] != 200 or "public" not in cache_control_value:
+                    mode = "passthrough"
+                    await send(message)
+                    return
+
+                etag = headers.get("etag")
+                if etag is not None:
+                    # Endpoint tự đặt ETag - không cần đọc body
+                    if is_not_modified(request_headers, etag, headers.get("last-modified")):
+                        mode = "drop"
+                        await send_not_modified(headers)
+                    else:
+                        mode = "passthrough"
+                        await send(message)
+                    return
+
+                mode = "buffer"
+                start_message = {**message, "headers": headers.raw}
+                return
+
+            if mode == "passthrough":
+                await send(message)
+                return
+            if mode == "drop":
+                return
+
+            # mode == "buffer"
+            body_parts.append(message.get("body", b""))
+            body_size += len(body_parts[-1])
+            more_body = message.get("more_body", False)
+
+            if body_size > self.max_body_size:
+                # Response quá lớn để hash trong bộ nhớ - gửi nguyên không có ETag
+                mode = "passthrough"
+                await send(start_message)
+                await send({"type": "http.response.body", "body": b"".join(body_parts), "more_body": more_body})
+                return
+            if more_body:
+                return
+
+            body = b"".join(body_parts)
+            headers = MutableHeaders(raw=start_message["headers"])
+            etag = make_etag(body)
+            headers["ETag"] = etag
+            if is_not_modified(request_headers, etag, headers.get("last-modified")):
+                await send_not_modified(headers)
+                return
+            await send({**start_message, "headers": headers.raw})
+            await send({"type": "http.response.body", "body": body, "more_body": False})
+
+        await self.app(scope, receive, wrapped_send)
@@ -0,0 +1,205 @@
+"""
+Response cache cho các listing public (giống nhau với mọi user)
+- LRU in-process, thêm backend Redis dùng chung giữa các worker nếu cấu hình
+  RESPONSE_CACHE_REDIS_URL (cần package redis)
+- Key = tên endpoint + query params; chỉ params endpoint so khớp không phân biệt hoa thường
+  (vd search dùng ILIKE) được chuyển về chữ thường, các params khác giữ nguyên giá trị
+- Mỗi entry gắn tag (vd "shop:3", "subcat:7"). Invalidate tag bằng cách tăng version
+  của tag; entry lưu version lúc tạo nên entry cũ tự hết hiệu lực ở lần đọc sau.
+"""
+
+import functools
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from decouple import config as decouple_config
+
+logger = logging.getLogger(__name__)
+
+RESPONSE_CACHE_MAX_ENTRIES = decouple_config("RESPONSE_CACHE_MAX_ENTRIES", default=2048, cast=int)
+RESPONSE_CACHE_TTL_SECONDS = decouple_config("RESPONSE_CACHE_TTL_SECONDS", default=30, cast=int)
+RESPONSE_CACHE_REDIS_URL = decouple_config("RESPONSE_CACHE_REDIS_URL", default="")
+
+_REDIS_PREFIX = "greenbuy:rc:"
+
+
+class RedisBackend:
+    """Backend dùng chung: entry lưu dạng JSON có TTL, version của tag là counter INCR"""
+    def __init__(self, url: str):
+        import redis
+        self._client = redis.Redis.from_url(url, socket_timeout=0.2, socket_connect_timeout=0.2)
+
+    def get(self, key: str) -> Optional[dict]:
+        raw = self._client.get(_REDIS_PREFIX + "entry:" + key)
+        return json.loads(raw) if raw else None
+
+    def set(self, key: str, entry: dict, ttl: int):
+        self._client.set(_REDIS_PREFIX + "entry:" + key, json.dumps(entry, default=str), ex=ttl)
+
+    def tag_versions(self, tags: List[str]) -> List[int]:
+        if not tags:
+            return []
+        values = self._client.mget([_REDIS_PREFIX + "tag:" + tag for tag in tags])
+        return [int(value) if value else 0 for value in values]
+
+    def bump_tags(self, tags: List[str]):
+        pipe = self._client.pipeline(transaction=False)
+        for tag in tags:
+            pipe.incr(_REDIS_PREFIX + "tag:" + tag)
+        pipe.execute()
+
+
+def _create_backend() -> Optional[RedisBackend]:
+    if not RESPONSE_CACHE_REDIS_URL:
+        return None
+    try:
+        return RedisBackend(RESPONSE_CACHE_REDIS_URL)
+    except ImportError:
+        logger.warning("RESPONSE_CACHE_REDIS_URL is set but redis is not installed; using local cache only")
+        return None
+
+
+class ResponseCache:
+    """
+    Cache kết quả endpoint theo key + tag.
+    Giá trị được dùng chung giữa các request - caller không được sửa.
+    """
+    def __init__(
+        self,
+        max_entries: int = RESPONSE_CACHE_MAX_ENTRIES,
+        ttl_seconds: int = RESPONSE_CACHE_TTL_SECONDS,
+        backend: Optional[RedisBackend] = None,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.backend = backend
+        # {key: (expires_at, tags, tag_versions, value)}
+        self._entries: "OrderedDict[str, Tuple[float, Tuple[str, ...], Tuple[int, ...], Any]]" = OrderedDict()
+        self._tag_versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "shared_hits": 0, "misses": 0, "invalidations": 0, "errors": 0}
+
+    @staticmethod
+    def make_key(namespace: str, params: Dict[str, Any], case_insensitive: Iterable[str] = ()) -> str:
+        normalized = {}
+        for name, value in params.items():
+            if name in case_insensitive and isinstance(value, str):
+                # Chuỗi rỗng = không lọc, giống None
+                value = value.lower() or None
+            if value is not None:
+                normalized[name] = value
+        return namespace + ":" + json.dumps(normalized, sort_keys=True, default=str)
+
+    def _current_versions(self, tags: Tuple[str, ...]) -> Tuple[int, ...]:
+        if self.backend is not None:
+            try:
+                return tuple(self.backend.tag_versions(list(tags)))
+            except Exception as e:
+                self._count("errors")
+                logger.warning(f"Response cache backend error: {e}")
+        with self._lock:
+            return tuple(self._tag_versions.get(tag, 0) for tag in tags)
+
+    def _count(self, name: str):
+        with self._lock:
+            self._stats[name] += 1
+
+    def get_or_compute(self, key: str, tags: Iterable[str], compute: Callable[[], Any]) -> Any:
+        tags = tuple(sorted(set(tags)))
+        versions = self._current_versions(tags)
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now and entry[1] == tags and entry[2] == versions:
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                return entry[3]
+
+        if self.backend is not None:
+            try:
+                shared = self.backend.get(key)
+            except Exception as e:
+                shared = None
+                self._count("errors")
+                logger.warning(f"Response cache backend error: {e}")
+            if shared and tuple(shared["tags"]) == tags and tuple(shared["versions"]) == versions:
+                self._count("shared_hits")
+                self._store(key, tags, versions, shared["value"], now)
+                return shared["value"]
+
+        self._count("misses")
+        value = compute()
+        self._store(key, tags, versions, value, now)
+        if self.backend is not None:
+            try:
+                self.backend.set(
+                    key, {"tags": tags, "versions": versions, "value": value}, self.ttl_seconds
+                )
+            except Exception as e:
+                self._count("errors")
+                logger.warning(f"Response cache backend error: {e}")
+        return value
+
+    def _store(self, key: str, tags: Tuple[str, ...], versions: Tuple[int, ...], value: Any, now: float):
+        with self._lock:
+            self._entries[key] = (now + self.ttl_seconds, tags, versions, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate_tags(self, tags: Iterable[str]):
+        """Làm mọi entry gắn một trong các tag này hết hiệu lực (gọi sau commit)"""
+        tags = [tag for tag in set(tags) if tag]
+        if not tags:
+            return
+        with self._lock:
+            for tag in tags:
+                self._tag_versions[tag] = self._tag_versions.get(tag, 0) + 1
+            self._stats["invalidations"] += 1
+        if self.backend is not None:
+            try:
+                self.backend.bump_tags(tags)
+            except Exception as e:
+                self._count("errors")
+                logger.warning(f"Response cache backend error: {e}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+        lookups = stats["hits"] + stats["shared_hits"] + stats["misses"]
+        stats["hit_ratio"] = round((stats["hits"] + stats["shared_hits"]) / lookups, 4) if lookups else 0.0
+        stats["backend"] = "redis" if self.backend is not None else "local"
+        return stats
+
+
+def cached_response(
+    cache: ResponseCache,
+    namespace: str,
+    tags: Callable[..., Iterable[str]],
+    case_insensitive: Iterable[str] = (),
+):
+    """
+    Decorator cho endpoint sync: cache kết quả theo query params (bỏ qua session).
+    `tags(**params)` trả về các tag của kết quả. `case_insensitive`: các param endpoint
+    so khớp không phân biệt hoa thường, dùng chung key khi chỉ khác hoa thường.
+    Chữ ký endpoint được giữ nguyên (functools.wraps) nên FastAPI vẫn thấy đủ params / dependencies.
+    """
+    case_insensitive = frozenset(case_insensitive)
+
+    def decorator(endpoint):
+        @functools.wraps(endpoint)
+        def wrapper(*args, **kwargs):
+            params = {name: value for name, value in kwargs.items() if name != "session"}
+            key = cache.make_key(namespace, params, case_insensitive)
+            return cache.get_or_compute(key, tags(**params), lambda: endpoint(*args, **kwargs))
+        return wrapper
+    return decorator
+
+
+# Singleton instance cho listing sản phẩm
+product_listing_cache = ResponseCache(backend=_create_backend())
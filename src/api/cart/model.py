@@ -1,6 +1,7 @@
 from sqlmodel import SQLModel, Field, Relationship
 from typing import Optional, List, TYPE_CHECKING
 from datetime import datetime
+from api.db.loading import NO_LAZY_COLLECTION
 
 # Forward references to avoid circular imports
 if TYPE_CHECKING:
@@ -13,7 +14,7 @@ class CartItem(SQLModel, table=True):
     cart_id: int = Field(foreign_key="cart.id")
     attribute_id: int = Field(foreign_key="attribute.attribute_id")
     quantity: int = Field(default=1)
-    added_at: datetime = Field(default_factory=datetime.utcnow)
+    added_at: datetime = Field(default_factory=datetime.utcnow, index=True)
 
     # 🔁 Relationships
     cart: Optional["Cart"] = Relationship(back_populates="items")
@@ -28,4 +29,4 @@ class Cart(SQLModel, table=True):
 
     # 🔁 Relationships
     user: Optional["User"] = Relationship(back_populates="cart")
-    items: List["CartItem"] = Relationship(back_populates="cart")
+    items: List["CartItem"] = Relationship(back_populates="cart", sa_relationship_kwargs=NO_LAZY_COLLECTION)
@@ -1,12 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from sqlmodel import Session, select
 from typing import List
 
 from api.category.model import Category
-from api.category.scheme import CategoryCreate, CategoryUpdate, CategoryRead
+from api.category.scheme import CategoryCreate, CategoryUpdate, CategoryRead, CategoryTreeResponse
+from api.category.taxonomy import taxonomy_cache
+from api.cache.http import cache_control, cache_control_header, not_modified, CATEGORY_MAX_AGE
 from api.auth.auth import get_session
 from api.sub_category.scheme import SubCategoryRead
-from api.sub_category.model import SubCategory
 
 router = APIRouter()
 
@@ -16,13 +17,27 @@ def create_category(payload: CategoryCreate, session: Session = Depends(get_sess
     session.add(category)
     session.commit()
     session.refresh(category)
+    taxonomy_cache.invalidate()
     return category
 
-@router.get("", response_model=List[CategoryRead])
+@router.get("", response_model=List[CategoryRead], dependencies=[Depends(cache_control(CATEGORY_MAX_AGE))])
 def list_categories(session: Session = Depends(get_session)):
-    return session.exec(select(Category)).all()
+    return taxonomy_cache.get(session).tree
 
-@router.get("/{category_id}", response_model=CategoryRead)
+@router.get("/tree", response_model=CategoryTreeResponse)
+def get_category_tree(request: Request, response: Response, session: Session = Depends(get_session)):
+    """Toàn bộ cây category -> sub_category trong một response (từ taxonomy cache)"""
+    snapshot = taxonomy_cache.get(session)
+    cache_control_value = cache_control_header(CATEGORY_MAX_AGE)
+    # ETag của snapshot tính sẵn lúc load - client đã có bản mới nhất thì không cần serialize
+    cached = not_modified(request, snapshot.etag, cache_control_value)
+    if cached:
+        return cached
+    response.headers["ETag"] = snapshot.etag
+    response.headers["Cache-Control"] = cache_control_value
+    return {"version": snapshot.version, "categories": snapshot.tree}
+
+@router.get("/{category_id}", response_model=CategoryRead, dependencies=[Depends(cache_control(CATEGORY_MAX_AGE))])
 def get_category(category_id: int, session: Session = Depends(get_session)):
     category = session.get(Category, category_id)
     if not category:
@@ -38,6 +53,7 @@ def update_category(category_id: int, payload: CategoryUpdate, session: Session
         setattr(category, key, value)
     session.commit()
     session.refresh(category)
+    taxonomy_cache.invalidate()
     return category
 
 @router.delete("/{category_id}")
@@ -47,17 +63,20 @@ def delete_category(category_id: int, session: Session = Depends(get_session)):
         raise HTTPException(status_code=404, detail="Category not found")
     session.delete(category)
     session.commit()
+    taxonomy_cache.invalidate()
     return {"detail": "Category deleted"}
 
 
-@router.get("/{category_id}/subcategories", response_model=List[SubCategoryRead])
+@router.get("/{category_id}/subcategories", response_model=List[SubCategoryRead], dependencies=[Depends(cache_control(CATEGORY_MAX_AGE))])
 def get_subcategories_by_category(
     category_id: int,
     session: Session = Depends(get_session),
 ):
-    subcategories = session.exec(
-        select(SubCategory).where(SubCategory.category_id == category_id)
-    ).all()
+    snapshot = taxonomy_cache.get(session)
+    subcategories = [
+        snapshot.sub_categories[sub_id]
+        for sub_id in snapshot.sub_category_ids.get(category_id, ())
+    ]
 
     if not subcategories:
         raise HTTPException(status_code=404, detail="No subcategories found for this category.")
@@ -1,6 +1,7 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
+from api.sub_category.scheme import SubCategoryRead
 
 class CategoryCreate(BaseModel):
     name: str
@@ -16,3 +17,10 @@ class CategoryRead(CategoryCreate):
 
     class Config:
         from_attributes = True
+
+class CategoryTreeNode(CategoryRead):
+    sub_categories: List[SubCategoryRead] = []
+
+class CategoryTreeResponse(BaseModel):
+    version: int  # Tăng mỗi khi category/sub_category thay đổi
+    categories: List[CategoryTreeNode]
@@ -0,0 +1,112 @@
+"""
+Taxonomy cache
+Cây category -> sub_category được load một lần vào bộ nhớ (2 query) và dùng lại cho
+trang điều hướng và filter sản phẩm theo category. Snapshot có version, bị xoá khi
+category/sub_category thay đổi và hết hạn sau TTL (giới hạn độ trễ giữa các worker).
+"""
+
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+from sqlmodel import Session, select
+from api.category.model import Category
+from api.sub_category.model import SubCategory
+from api.cache.http import make_etag
+
+TAXONOMY_TTL_SECONDS = 300
+
+
+@dataclass(frozen=True)
+class TaxonomySnapshot:
+    version: int
+    etag: str  # Hash nội dung cây - dùng cho If-None-Match của /category/tree
+    # [{category fields..., "sub_categories": [{sub_category fields...}]}] theo id
+    tree: List[dict]
+    categories: Dict[int, dict]
+    sub_categories: Dict[int, dict]
+    # {category_id: (sub_category_id, ...)}
+    sub_category_ids: Dict[int, Tuple[int, ...]]
+
+
+def load_taxonomy(session: Session, version: int) -> TaxonomySnapshot:
+    """Load toàn bộ category và sub_category"""
+    categories = {
+        category.id: {
+            "id": category.id,
+            "name": category.name,
+            "description": category.description,
+            "created_at": category.created_at,
+            "sub_categories": [],
+        }
+        for category in session.exec(select(Category).order_by(Category.id)).all()
+    }
+
+    sub_categories: Dict[int, dict] = {}
+    sub_category_ids: Dict[int, List[int]] = {}
+    for sub in session.exec(select(SubCategory).order_by(SubCategory.id)).all():
+        data = {
+            "id": sub.id,
+            "category_id": sub.category_id,
+            "name": sub.name,
+            "description": sub.description,
+            "created_at": sub.created_at,
+        }
+        sub_categories[sub.id] = data
+        sub_category_ids.setdefault(sub.category_id, []).append(sub.id)
+        if sub.category_id in categories:
+            categories[sub.category_id]["sub_categories"].append(data)
+
+    tree = list(categories.values())
+    return TaxonomySnapshot(
+        version=version,
+        etag=make_etag(repr(tree).encode()),
+        tree=tree,
+        categories=categories,
+        sub_categories=sub_categories,
+        sub_category_ids={key: tuple(ids) for key, ids in sub_category_ids.items()},
+    )
+
+
+class TaxonomyCache:
+    """
+    Cache cây category (in-process).
+    Dữ liệu trong snapshot dùng chung giữa các request - chỉ đọc, không sửa.
+    """
+    def __init__(self, ttl_seconds: float = TAXONOMY_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._snapshot: Optional[TaxonomySnapshot] = None
+        self._loaded_at = 0.0
+        self._version = 0
+        self._lock = threading.Lock()
+
+    def get(self, session: Session) -> TaxonomySnapshot:
+        """Lấy snapshot hiện tại, load lại nếu chưa có / đã bị invalidate / hết hạn"""
+        now = time.monotonic()
+        with self._lock:
+            snapshot = self._snapshot
+            version = self._version
+            if snapshot is not None and now - self._loaded_at < self.ttl_seconds:
+                return snapshot
+
+        snapshot = load_taxonomy(session, version)
+        with self._lock:
+            # Bỏ qua nếu có invalidate trong lúc đang load
+            if self._version == version:
+                self._snapshot = snapshot
+                self._loaded_at = now
+        return snapshot
+
+    def invalidate(self):
+        """Gọi sau khi commit thay đổi category/sub_category"""
+        with self._lock:
+            self._version += 1
+            self._snapshot = None
+
+    def get_sub_category_ids(self, session: Session, category_id: int) -> Tuple[int, ...]:
+        """Các sub_category thuộc category (tuple rỗng nếu không có)"""
+        return self.get(session).sub_category_ids.get(category_id, ())
+
+
+# Singleton instance
+taxonomy_cache = TaxonomyCache()
@@ -7,10 +7,13 @@ import asyncio
 import json
 import logging
 from typing import Dict, Set, Optional, List
-from datetime import datetime, timedelta
+from datetime import datetime
 from fastapi import WebSocket
 from sqlmodel import Session
-from api.chat.model import OnlineStatus, ChatRoom, ChatMessage
+from api.chat.model import ChatRoom, ChatMessage
+from api.chat.presence import presence_registry
+from api.chat.receipts import read_receipt_buffer
+from api.chat.heartbeat import HeartbeatScheduler, TimingWheel, TICK_SECONDS, TYPING_TIMEOUT_SECONDS
 from api.auth.auth import get_session
 
 logger = logging.getLogger(__name__)
@@ -28,103 +31,92 @@ class ConnectionManager:
         # {room_id: {user_id: is_typing}}
         self.typing_status: Dict[int, Dict[int, bool]] = {}
         
-        # Track connection heartbeats for mobile apps
-        self.connection_heartbeats: Dict[int, datetime] = {}
+        # {user_id: {room_id}} - rooms each connected user has joined
+        self.joined_rooms: Dict[int, Set[int]] = {}
+        
+        # Idle timeouts and server pings for mobile apps (monotonic timing wheels)
+        self.heartbeats = HeartbeatScheduler()
+        
+        # Auto-expiry of typing indicators, keyed by (room_id, user_id)
+        self._typing_expiry = TimingWheel(TYPING_TIMEOUT_SECONDS)
+        
+        # Presence state, debounced status changes and batched OnlineStatus writes
+        self.presence = presence_registry
+        self.presence.set_status_callback(self._broadcast_user_status)
+        
+        # Coalesced "read up to message X" receipts
+        self.receipts = read_receipt_buffer
+        self.receipts.set_receipt_callback(self._broadcast_read_receipt)
         
         # Background tasks
-        self._cleanup_task: Optional[asyncio.Task] = None
         self._heartbeat_task: Optional[asyncio.Task] = None
         
     async def start_background_tasks(self):
         """Start background maintenance tasks"""
-        if not self._cleanup_task:
-            self._cleanup_task = asyncio.create_task(self._periodic_cleanup())
         if not self._heartbeat_task:
             self._heartbeat_task = asyncio.create_task(self._heartbeat_checker())
+        await self.presence.start()
     
     async def stop_background_tasks(self):
         """Stop background tasks"""
-        if self._cleanup_task:
-            self._cleanup_task.cancel()
-            self._cleanup_task = None
         if self._heartbeat_task:
             self._heartbeat_task.cancel()
             self._heartbeat_task = None
+        await self.receipts.flush()
+        await self.presence.stop()
     
     async def connect_user(self, user_id: int, websocket: WebSocket, device_info: str = "mobile"):
         """Connect a user to the chat system"""
-        # Close existing connection if any
-        await self.disconnect_user(user_id)
+        # Close existing connection if any (a replaced socket is not an offline transition)
+        await self._drop_connection(user_id)
         
         # Store new connection
         self.user_connections[user_id] = websocket
-        self.connection_heartbeats[user_id] = datetime.utcnow()
-        
-        # Update online status in database
-        await self._update_online_status(user_id, True, device_info)
+        self.heartbeats.register(user_id)
         
-        # Notify other users about online status
-        await self._broadcast_user_status(user_id, True)
+        # Update presence; status is only broadcast when it actually changed
+        if self.presence.mark_online(user_id, device_info):
+            await self._broadcast_user_status(user_id, True)
         
         logger.info(f"User {user_id} connected from {device_info}")
     
-    async def disconnect_user(self, user_id: int):
-        """Disconnect a user from the chat system"""
-        # Remove from user connections
-        if user_id in self.user_connections:
-            try:
-                await self.user_connections[user_id].close()
-            except:
-                pass
-            del self.user_connections[user_id]
-        
-        # Remove from room connections
-        for room_id in list(self.room_connections.keys()):
-            if user_id in self.room_connections[room_id]:
-                del self.room_connections[room_id][user_id]
-                # Clean empty rooms
-                if not self.room_connections[room_id]:
-                    del self.room_connections[room_id]
-        
-        # Clear typing status
-        for room_id in self.typing_status:
-            if user_id in self.typing_status[room_id]:
-                del self.typing_status[room_id][user_id]
-        
-        # Remove heartbeat tracking
-        if user_id in self.connection_heartbeats:
-            del self.connection_heartbeats[user_id]
+    async def disconnect_user(self, user_id: int, websocket: Optional[WebSocket] = None):
+        """
+        Disconnect a user from the chat system.
+        If websocket is given, only disconnect when it is still the user's active connection.
+        """
+        if websocket is not None and self.user_connections.get(user_id) is not websocket:
+            return
         
-        # Update online status in database
-        await self._update_online_status(user_id, False)
+        if not await self._drop_connection(user_id):
+            return
         
-        # Notify other users about offline status
-        await self._broadcast_user_status(user_id, False)
+        # Offline status is written and broadcast after the debounce window
+        self.presence.mark_offline(user_id)
         
         logger.info(f"User {user_id} disconnected")
     
-    async def join_room(self, user_id: int, room_id: int) -> bool:
-        """Add user to a chat room"""
-        if user_id not in self.user_connections:
+    async def _drop_connection(self, user_id: int) -> bool:
+        """Remove all connection state for a user. Returns False if the user was not connected"""
+        websocket = self.user_connections.pop(user_id, None)
+        if websocket is None:
             return False
         
-        # Verify user has access to this room
-        session = next(get_session())
-        room = session.get(ChatRoom, room_id)
-        if not room or (room.user1_id != user_id and room.user2_id != user_id):
-            return False
+        try:
+            await websocket.close()
+        except:
+            pass
         
-        # Add to room connections
-        if room_id not in self.room_connections:
-            self.room_connections[room_id] = {}
+        # Remove from joined rooms and their typing status
+        for room_id in self.joined_rooms.pop(user_id, set()):
+            self._remove_from_room(user_id, room_id)
         
-        self.room_connections[room_id][user_id] = self.user_connections[user_id]
+        # Remove heartbeat tracking
+        self.heartbeats.unregister(user_id)
         
-        logger.info(f"User {user_id} joined room {room_id}")
         return True
     
-    async def leave_room(self, user_id: int, room_id: int):
-        """Remove user from a chat room"""
+    def _remove_from_room(self, user_id: int, room_id: int):
         if room_id in self.room_connections and user_id in self.room_connections[room_id]:
             del self.room_connections[room_id][user_id]
             
@@ -135,6 +127,38 @@ class ConnectionManager:
         # Clear typing status for this room
         if room_id in self.typing_status and user_id in self.typing_status[room_id]:
             del self.typing_status[room_id][user_id]
+            if not self.typing_status[room_id]:
+                del self.typing_status[room_id]
+        self._typing_expiry.remove((room_id, user_id))
+    
+    async def join_room(self, user_id: int, room_id: int) -> bool:
+        """Add user to a chat room"""
+        if user_id not in self.user_connections:
+            return False
+        
+        # Verify user has access to this room (cached index first, DB for rooms created elsewhere)
+        if room_id not in self.presence.get_user_rooms(user_id):
+            session = next(get_session())
+            room = session.get(ChatRoom, room_id)
+            if not room or (room.user1_id != user_id and room.user2_id != user_id):
+                return False
+            self.presence.add_room(room.id, room.user1_id, room.user2_id)
+        
+        # Add to room connections
+        if room_id not in self.room_connections:
+            self.room_connections[room_id] = {}
+        
+        self.room_connections[room_id][user_id] = self.user_connections[user_id]
+        self.joined_rooms.setdefault(user_id, set()).add(room_id)
+        
+        logger.info(f"User {user_id} joined room {room_id}")
+        return True
+    
+    async def leave_room(self, user_id: int, room_id: int):
+        """Remove user from a chat room"""
+        self._remove_from_room(user_id, room_id)
+        if user_id in self.joined_rooms:
+            self.joined_rooms[user_id].discard(room_id)
         
         logger.info(f"User {user_id} left room {room_id}")
     
@@ -153,7 +177,7 @@ class ConnectionManager:
             try:
                 await websocket.send_text(message_str)
                 # Update heartbeat
-                self.connection_heartbeats[user_id] = datetime.utcnow()
+                self.heartbeats.touch(user_id)
             except Exception as e:
                 logger.warning(f"Failed to send message to user {user_id}: {e}")
                 dead_connections.append(user_id)
@@ -169,7 +193,7 @@ class ConnectionManager:
         
         try:
             await self.user_connections[user_id].send_text(json.dumps(message))
-            self.connection_heartbeats[user_id] = datetime.utcnow()
+            self.heartbeats.touch(user_id)
             return True
         except Exception as e:
             logger.warning(f"Failed to send message to user {user_id}: {e}")
@@ -183,6 +207,12 @@ class ConnectionManager:
         
         self.typing_status[room_id][user_id] = is_typing
         
+        # Typing indicators expire on their own if the client never sends is_typing=false
+        if is_typing:
+            self._typing_expiry.add((room_id, user_id))
+        else:
+            self._typing_expiry.remove((room_id, user_id))
+        
         # Broadcast typing status to other users in room
         typing_message = {
             "type": "typing",
@@ -212,55 +242,15 @@ class ConnectionManager:
     
     def get_user_rooms(self, user_id: int) -> List[int]:
         """Get list of rooms a user is currently in"""
-        rooms = []
-        for room_id, users in self.room_connections.items():
-            if user_id in users:
-                rooms.append(room_id)
-        return rooms
+        return list(self.joined_rooms.get(user_id, set()))
     
     async def heartbeat(self, user_id: int):
         """Update heartbeat for a user connection"""
-        if user_id in self.user_connections:
-            self.connection_heartbeats[user_id] = datetime.utcnow()
-    
-    async def _update_online_status(self, user_id: int, is_online: bool, device_info: Optional[str] = None):
-        """Update user online status in database"""
-        try:
-            session = next(get_session())
-            
-            status = session.get(OnlineStatus, user_id)
-            if status:
-                status.is_online = is_online
-                status.last_seen = datetime.utcnow()
-                status.updated_at = datetime.utcnow()
-                if device_info:
-                    status.device_info = device_info
-            else:
-                status = OnlineStatus(
-                    user_id=user_id,
-                    is_online=is_online,
-                    device_info=device_info or "unknown"
-                )
-                session.add(status)
-            
-            session.commit()
-            
-        except Exception as e:
-            logger.error(f"Failed to update online status for user {user_id}: {e}")
+        self.heartbeats.touch(user_id)
     
     async def _broadcast_user_status(self, user_id: int, is_online: bool):
         """Broadcast user online status to relevant rooms"""
         try:
-            session = next(get_session())
-            
-            # Find all rooms where this user participates
-            from sqlmodel import select, or_
-            rooms = session.exec(
-                select(ChatRoom).where(
-                    or_(ChatRoom.user1_id == user_id, ChatRoom.user2_id == user_id)
-                )
-            ).all()
-            
             status_message = {
                 "type": "user_status",
                 "data": {
@@ -270,58 +260,68 @@ class ConnectionManager:
                 }
             }
             
-            # Broadcast to all relevant rooms
-            for room in rooms:
-                await self.broadcast_to_room(room.id, status_message, exclude_user_id=user_id)
+            # Only rooms with live connections can receive the status
+            for room_id in self.presence.get_user_rooms(user_id):
+                if room_id in self.room_connections:
+                    await self.broadcast_to_room(room_id, status_message, exclude_user_id=user_id)
             
         except Exception as e:
             logger.error(f"Failed to broadcast user status for user {user_id}: {e}")
     
-    async def _periodic_cleanup(self):
-        """Periodic cleanup of dead connections and old data"""
-        while True:
-            try:
-                await asyncio.sleep(300)  # Run every 5 minutes
-                
-                # Clean up old typing status (older than 30 seconds)
-                cutoff_time = datetime.utcnow() - timedelta(seconds=30)
-                
-                for room_id in list(self.typing_status.keys()):
-                    for user_id in list(self.typing_status[room_id].keys()):
-                        if user_id not in self.connection_heartbeats:
-                            del self.typing_status[room_id][user_id]
-                        elif self.connection_heartbeats[user_id] < cutoff_time:
-                            # Auto-stop typing for inactive users
-                            if self.typing_status[room_id][user_id]:
-                                await self.update_typing_status(user_id, room_id, False)
-                    
-                    # Clean empty rooms
-                    if not self.typing_status[room_id]:
-                        del self.typing_status[room_id]
-                
-                logger.debug("Completed periodic cleanup")
-                
-            except Exception as e:
-                logger.error(f"Error in periodic cleanup: {e}")
+    def mark_read(self, user_id: int, room_id: int, message_id: int):
+        """Queue a read watermark; it is written and broadcast with the next flush"""
+        self.receipts.mark_read(room_id, user_id, message_id)
+    
+    async def _broadcast_read_receipt(self, room_id: int, reader_id: int, message_id: int):
+        """Broadcast one coalesced receipt: reader has read everything up to message_id"""
+        receipt_message = {
+            "type": "read_receipt",
+            "data": {
+                "room_id": room_id,
+                "message_id": message_id,
+                "last_read_message_id": message_id,
+                "reader_id": reader_id
+            }
+        }
+        await self.broadcast_to_room(room_id, receipt_message, exclude_user_id=reader_id)
+    
+    async def _send_ping(self, user_id: int):
+        """Send a server-initiated ping; a failed send means the connection is dead"""
+        websocket = self.user_connections.get(user_id)
+        if websocket is None:
+            return
+        
+        try:
+            await websocket.send_text(json.dumps({
+                "type": "ping",
+                "data": {"timestamp": datetime.utcnow().isoformat()}
+            }))
+        except Exception as e:
+            logger.warning(f"Failed to ping user {user_id}: {e}")
+            await self.disconnect_user(user_id)
     
     async def _heartbeat_checker(self):
-        """Check for stale connections based on heartbeat"""
+        """Drive the timing wheels: drop stale connections, ping idle ones, expire typing"""
         while True:
             try:
-                await asyncio.sleep(60)  # Check every minute
-                
-                cutoff_time = datetime.utcnow() - timedelta(minutes=5)  # 5 minute timeout
-                stale_users = []
+                await asyncio.sleep(TICK_SECONDS)
                 
-                for user_id, last_heartbeat in self.connection_heartbeats.items():
-                    if last_heartbeat < cutoff_time:
-                        stale_users.append(user_id)
+                to_ping, stale_users = self.heartbeats.due()
                 
                 # Disconnect stale users
                 for user_id in stale_users:
                     logger.warning(f"Disconnecting stale user {user_id}")
                     await self.disconnect_user(user_id)
                 
+                # Ping connections that have been quiet for a ping interval
+                if to_ping:
+                    await asyncio.gather(*(self._send_ping(user_id) for user_id in to_ping))
+                
+                # Auto-stop typing indicators that were never cleared
+                for room_id, user_id in self._typing_expiry.advance():
+                    if self.typing_status.get(room_id, {}).get(user_id):
+                        await self.update_typing_status(user_id, room_id, False)
+                
             except Exception as e:
                 logger.error(f"Error in heartbeat checker: {e}")
 
@@ -0,0 +1,193 @@
+"""
+Heartbeat scheduling for WebSocket connections
+Hashed timing wheels on monotonic time: activity is an O(1) dict write and each
+tick only visits the slot that is due instead of scanning every connection
+"""
+
+import random
+import time
+from typing import Callable, Dict, Hashable, List, Optional, Set, Tuple
+
+# Server sends a ping after this much silence on a connection (seconds)
+PING_INTERVAL_SECONDS = 30
+# Connections without any activity for this long are dropped (seconds)
+IDLE_TIMEOUT_SECONDS = 300
+# Typing indicators are cleared automatically after this long (seconds)
+TYPING_TIMEOUT_SECONDS = 30
+# Resolution of the wheels (seconds)
+TICK_SECONDS = 1.0
+
+
+class TimingWheel:
+    """
+    Hashed timing wheel for activity timeouts.
+
+    touch() only records the activity time. When a slot comes due its keys are
+    checked against their real deadline and either expire or move to the slot
+    of their new deadline, so each key is revisited about once per timeout.
+    """
+
+    def __init__(
+        self,
+        timeout: float,
+        tick: float = TICK_SECONDS,
+        slots: int = 512,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.timeout = timeout
+        self.tick = tick
+        self._size = slots
+        self._clock = clock
+
+        self._slots: List[Set[Hashable]] = [set() for _ in range(slots)]
+        # {key: slot index}
+        self._slot_of: Dict[Hashable, int] = {}
+        # {key: monotonic time of last activity}
+        self._last_activity: Dict[Hashable, float] = {}
+
+        # Last tick that has been processed
+        self._cursor = self._tick_of(clock())
+
+    def __len__(self) -> int:
+        return len(self._last_activity)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._last_activity
+
+    def add(self, key: Hashable, now: Optional[float] = None):
+        """Start (or restart) tracking a key"""
+        now = self._clock() if now is None else now
+        self._last_activity[key] = now
+        self._schedule(key, now + self.timeout)
+
+    def touch(self, key: Hashable, now: Optional[float] = None):
+        """Record activity for a tracked key - O(1), the slot is fixed up lazily"""
+        if key in self._last_activity:
+            self._last_activity[key] = self._clock() if now is None else now
+
+    def remove(self, key: Hashable):
+        """Stop tracking a key"""
+        self._last_activity.pop(key, None)
+        slot = self._slot_of.pop(key, None)
+        if slot is not None:
+            self._slots[slot].discard(key)
+
+    def last_activity(self, key: Hashable) -> Optional[float]:
+        """Monotonic time of the last recorded activity"""
+        return self._last_activity.get(key)
+
+    def advance(self, now: Optional[float] = None, renew: bool = False) -> List[Hashable]:
+        """
+        Process all slots up to now and return the expired keys.
+        Expired keys are removed, or restarted from now when renew is set.
+        """
+        now = self._clock() if now is None else now
+        target = self._tick_of(now)
+        expired = []
+
+        # After a long stall one full revolution still visits every key
+        steps = min(target - self._cursor, self._size)
+        start = self._cursor
+        # Move the cursor first so keys rescheduled below land in a future tick
+        self._cursor = max(self._cursor, target)
+
+        slots, slot_of, last_activity = self._slots, self._slot_of, self._last_activity
+        timeout, tick, size = self.timeout, self.tick, self._size
+        floor = self._cursor + 1
+        renew_slot = max(int((now + timeout) // tick), floor) % size
+        for step in range(1, steps + 1):
+            slot = (start + step) % size
+            bucket = slots[slot]
+            if not bucket:
+                continue
+            slots[slot] = set()
+
+            for key in bucket:
+                deadline = last_activity[key] + timeout
+                if deadline <= now:
+                    expired.append(key)
+                    if renew:
+                        last_activity[key] = now
+                        slots[renew_slot].add(key)
+                        slot_of[key] = renew_slot
+                    else:
+                        del last_activity[key]
+                        del slot_of[key]
+                else:
+                    # The bucket is already detached, so no discard is needed
+                    new_slot = max(int(deadline // tick), floor) % size
+                    slots[new_slot].add(key)
+                    slot_of[key] = new_slot
+
+        return expired
+
+    def _tick_of(self, t: float) -> int:
+        return int(t // self.tick)
+
+    def _schedule(self, key: Hashable, deadline: float):
+        # Never schedule into a tick that has already been processed
+        tick = max(self._tick_of(deadline), self._cursor + 1)
+        slot = tick % self._size
+
+        old = self._slot_of.get(key)
+        if old is not None:
+            self._slots[old].discard(key)
+        self._slots[slot].add(key)
+        self._slot_of[key] = slot
+
+
+class HeartbeatScheduler:
+    """Idle timeouts and server-initiated ping scheduling for connections"""
+
+    def __init__(
+        self,
+        ping_interval: float = PING_INTERVAL_SECONDS,
+        idle_timeout: float = IDLE_TIMEOUT_SECONDS,
+        tick: float = TICK_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._clock = clock
+        self._ping = TimingWheel(ping_interval, tick, clock=clock)
+        self._idle = TimingWheel(idle_timeout, tick, clock=clock)
+
+    def __len__(self) -> int:
+        return len(self._idle)
+
+    def register(self, key: Hashable):
+        """Start tracking a new connection"""
+        now = self._clock()
+        # Spread the first ping so a reconnect storm is not pinged in a single tick
+        self._ping.add(key, now - random.random() * self._ping.timeout)
+        self._idle.add(key, now)
+
+    def unregister(self, key: Hashable):
+        """Stop tracking a connection"""
+        self._ping.remove(key)
+        self._idle.remove(key)
+
+    def touch(self, key: Hashable):
+        """Record activity on a connection - O(1)"""
+        now = self._clock()
+        self._ping.touch(key, now)
+        self._idle.touch(key, now)
+
+    def last_activity(self, key: Hashable) -> Optional[float]:
+        """Monotonic time of the last activity on a connection"""
+        return self._idle.last_activity(key)
+
+    def due(self, now: Optional[float] = None) -> Tuple[List[Hashable], List[Hashable]]:
+        """
+        Advance the wheels.
+        Returns (connections to ping, stale connections to drop).
+        """
+        now = self._clock() if now is None else now
+
+        stale = self._idle.advance(now)
+        for key in stale:
+            self._ping.remove(key)
+
+        # Due keys get their next ping scheduled; pings do not count as activity
+        # for the idle timeout
+        to_ping = self._ping.advance(now, renew=True)
+
+        return to_ping, stale
@@ -1,4 +1,5 @@
 from sqlmodel import SQLModel, Field, Relationship
+from sqlalchemy import Index, text
 from typing import Optional, List
 from datetime import datetime
 from enum import Enum
@@ -33,6 +34,10 @@ class ChatRoom(SQLModel, table=True):
 
 class ChatMessage(SQLModel, table=True):
     __tablename__ = "chat_messages"
+    # Index cho history theo cursor (before_id / after_id) trong từng room
+    __table_args__ = (
+        Index("ix_chat_messages_room_id_id", "room_id", text("id DESC")),
+    )
     
     id: Optional[int] = Field(default=None, primary_key=True)
     room_id: int = Field(foreign_key="chat_rooms.id")
@@ -63,4 +68,13 @@ class OnlineStatus(SQLModel, table=True):
     is_online: bool = Field(default=False)
     last_seen: datetime = Field(default_factory=datetime.utcnow)
     device_info: Optional[str] = None  # Device identifier for mobile
-    updated_at: datetime = Field(default_factory=datetime.utcnow)
\ No newline at end of file
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+class ChatReadState(SQLModel, table=True):
+    """Read watermark per (room, user): every message up to last_read_message_id has been read"""
+    __tablename__ = "chat_read_states"
+
+    room_id: int = Field(primary_key=True, foreign_key="chat_rooms.id")
+    user_id: int = Field(primary_key=True, foreign_key="users.id")
+    last_read_message_id: int = Field(default=0)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
@@ -0,0 +1,197 @@
+"""
+Presence registry for mobile chat
+Keeps user online state in memory, debounces connect/disconnect flaps and
+writes OnlineStatus rows to the database in periodic bulk upserts
+"""
+
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, Optional, Set
+from datetime import datetime
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert
+from sqlmodel import Session, select, or_
+from api.chat.model import OnlineStatus, ChatRoom
+from api.db.session import engine
+
+logger = logging.getLogger(__name__)
+
+# Disconnects followed by a reconnect within this window are not announced (seconds)
+STATUS_DEBOUNCE_SECONDS = 5
+# Interval between bulk OnlineStatus upserts (seconds)
+STATUS_FLUSH_INTERVAL = 2
+
+StatusCallback = Callable[[int, bool], Awaitable[None]]
+
+
+class PresenceRegistry:
+    """In-memory presence state with a cached user -> rooms index"""
+
+    def __init__(
+        self,
+        debounce_seconds: float = STATUS_DEBOUNCE_SECONDS,
+        flush_interval: float = STATUS_FLUSH_INTERVAL,
+    ):
+        self.debounce_seconds = debounce_seconds
+        self.flush_interval = flush_interval
+
+        # Users whose online status has been announced
+        self._online: Set[int] = set()
+
+        # {user_id: {room_id}} - rooms the user participates in
+        self._user_rooms: Dict[int, Set[int]] = {}
+
+        # {user_id: timer} - offline transitions waiting for the debounce window
+        self._pending_offline: Dict[int, asyncio.TimerHandle] = {}
+
+        # {user_id: row} - OnlineStatus changes waiting for the next flush
+        self._dirty: Dict[int, dict] = {}
+
+        self._on_status_change: Optional[StatusCallback] = None
+        self._flush_task: Optional[asyncio.Task] = None
+
+    def set_status_callback(self, callback: StatusCallback):
+        """Register the coroutine used to broadcast settled status changes"""
+        self._on_status_change = callback
+
+    async def start(self):
+        """Start the periodic flush task"""
+        if not self._flush_task:
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        """Stop the flush task and write out any buffered changes"""
+        if self._flush_task:
+            self._flush_task.cancel()
+            self._flush_task = None
+        for handle in self._pending_offline.values():
+            handle.cancel()
+        for user_id in list(self._pending_offline.keys()):
+            self._pending_offline.pop(user_id)
+            self._online.discard(user_id)
+            self._queue_write(user_id, False)
+        await self.flush()
+
+    def mark_online(self, user_id: int, device_info: Optional[str] = None) -> bool:
+        """
+        Record a new connection for a user.
+        Returns True when the status changed and should be broadcast.
+        """
+        pending = self._pending_offline.pop(user_id, None)
+        if pending:
+            # Reconnected inside the debounce window - the offline was never announced
+            pending.cancel()
+
+        if user_id in self._online:
+            return False
+
+        self._online.add(user_id)
+        self._queue_write(user_id, True, device_info)
+        return True
+
+    def mark_offline(self, user_id: int):
+        """Schedule an offline transition once the debounce window has passed"""
+        if user_id not in self._online or user_id in self._pending_offline:
+            return
+
+        loop = asyncio.get_running_loop()
+        self._pending_offline[user_id] = loop.call_later(
+            self.debounce_seconds, self._settle_offline, user_id
+        )
+
+    def is_online(self, user_id: int) -> bool:
+        """Check the announced online status of a user"""
+        return user_id in self._online
+
+    def get_user_rooms(self, user_id: int) -> Set[int]:
+        """Get IDs of all rooms a user participates in (loaded once, then cached)"""
+        rooms = self._user_rooms.get(user_id)
+        if rooms is None:
+            rooms = self._load_user_rooms(user_id)
+            self._user_rooms[user_id] = rooms
+        return rooms
+
+    def add_room(self, room_id: int, user1_id: int, user2_id: int):
+        """Keep the cached index in sync when a room is created"""
+        for user_id in (user1_id, user2_id):
+            if user_id in self._user_rooms:
+                self._user_rooms[user_id].add(room_id)
+
+    async def flush(self):
+        """Write buffered OnlineStatus changes in a single bulk upsert"""
+        if not self._dirty:
+            return
+
+        batch = self._dirty
+        self._dirty = {}
+
+        try:
+            await asyncio.to_thread(self._write_batch, list(batch.values()))
+        except Exception as e:
+            logger.error(f"Failed to flush online status for {len(batch)} users: {e}")
+            # Put the rows back unless a newer change arrived meanwhile
+            for user_id, row in batch.items():
+                self._dirty.setdefault(user_id, row)
+
+    def _queue_write(self, user_id: int, is_online: bool, device_info: Optional[str] = None):
+        now = datetime.utcnow()
+        self._dirty[user_id] = {
+            "user_id": user_id,
+            "is_online": is_online,
+            "last_seen": now,
+            "updated_at": now,
+            "device_info": device_info,
+        }
+
+    def _settle_offline(self, user_id: int):
+        self._pending_offline.pop(user_id, None)
+        self._online.discard(user_id)
+        self._queue_write(user_id, False)
+        asyncio.ensure_future(self._announce_offline(user_id))
+
+    async def _announce_offline(self, user_id: int):
+        try:
+            if self._on_status_change:
+                await self._on_status_change(user_id, False)
+        finally:
+            # Room index is only needed while the user is connected
+            if user_id not in self._online:
+                self._user_rooms.pop(user_id, None)
+
+    def _load_user_rooms(self, user_id: int) -> Set[int]:
+        with Session(engine) as session:
+            room_ids = session.exec(
+                select(ChatRoom.id).where(
+                    or_(ChatRoom.user1_id == user_id, ChatRoom.user2_id == user_id)
+                )
+            ).all()
+        return set(room_ids)
+
+    def _write_batch(self, rows: list):
+        stmt = insert(OnlineStatus).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[OnlineStatus.user_id],
+            set_={
+                "is_online": stmt.excluded.is_online,
+                "last_seen": stmt.excluded.last_seen,
+                "updated_at": stmt.excluded.updated_at,
+                "device_info": func.coalesce(stmt.excluded.device_info, OnlineStatus.device_info),
+            },
+        )
+        with Session(engine) as session:
+            session.execute(stmt)
+            session.commit()
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.sleep(self.flush_interval)
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error in presence flush loop: {e}")
+
+
+# Global presence registry instance
+presence_registry = PresenceRegistry()
@@ -0,0 +1,160 @@
+"""
+Read receipts for mobile chat
+Receipts are "read up to message X" watermarks per (room, user). Bursts of
+receipts are coalesced and written with one upsert plus one status update per
+watermark, and broadcast as a single frame per (room, user)
+"""
+
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+from datetime import datetime
+from sqlalchemy import func, update, and_, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlmodel import Session
+from api.chat.model import ChatReadState, ChatMessage, MessageStatus
+from api.db.session import engine
+
+logger = logging.getLogger(__name__)
+
+# Receipts arriving within this window are merged into one write and one broadcast (seconds)
+RECEIPT_FLUSH_DELAY = 0.5
+
+ReceiptCallback = Callable[[int, int, int], Awaitable[None]]
+
+
+def clamp_watermarks(
+    session: Session, watermarks: Dict[Tuple[int, int], int]
+) -> Dict[Tuple[int, int], int]:
+    """
+    Clamp client-reported watermarks to the newest message of each room.
+    A forged or mistyped id would otherwise be kept forever by GREATEST and mark
+    every future message in the room as read. Rooms without messages are dropped.
+    """
+    room_ids = {room_id for room_id, _ in watermarks}
+    latest = dict(session.execute(
+        select(ChatMessage.room_id, func.max(ChatMessage.id))
+        .where(ChatMessage.room_id.in_(room_ids))
+        .group_by(ChatMessage.room_id)
+    ).all())
+    return {
+        (room_id, user_id): min(message_id, latest[room_id])
+        for (room_id, user_id), message_id in watermarks.items()
+        if room_id in latest
+    }
+
+
+def advance_read_watermarks(
+    session: Session, watermarks: Dict[Tuple[int, int], int]
+) -> Dict[Tuple[int, int], int]:
+    """
+    Move read watermarks forward (never backward) and mark the covered messages as read.
+    watermarks: {(room_id, user_id): last_read_message_id}
+    Returns the watermarks actually written (clamped to existing messages).
+    Does not commit.
+    """
+    watermarks = clamp_watermarks(session, watermarks) if watermarks else {}
+    if not watermarks:
+        return watermarks
+
+    now = datetime.utcnow()
+    rows = [
+        {
+            "room_id": room_id,
+            "user_id": user_id,
+            "last_read_message_id": message_id,
+            "updated_at": now,
+        }
+        for (room_id, user_id), message_id in watermarks.items()
+    ]
+    stmt = insert(ChatReadState).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[ChatReadState.room_id, ChatReadState.user_id],
+        set_={
+            "last_read_message_id": func.greatest(
+                ChatReadState.last_read_message_id, stmt.excluded.last_read_message_id
+            ),
+            "updated_at": stmt.excluded.updated_at,
+        },
+    )
+    session.execute(stmt)
+
+    # Keep ChatMessage.status in sync for clients that still read it
+    for (room_id, user_id), message_id in watermarks.items():
+        session.execute(
+            update(ChatMessage)
+            .where(
+                and_(
+                    ChatMessage.room_id == room_id,
+                    ChatMessage.sender_id != user_id,
+                    ChatMessage.id <= message_id,
+                    ChatMessage.status != MessageStatus.read,
+                )
+            )
+            .values(status=MessageStatus.read)
+        )
+    return watermarks
+
+
+class ReadReceiptBuffer:
+    """Coalesces read receipts before writing and broadcasting them"""
+
+    def __init__(self, flush_delay: float = RECEIPT_FLUSH_DELAY):
+        self.flush_delay = flush_delay
+
+        # {(room_id, user_id): highest message_id reported as read}
+        self._pending: Dict[Tuple[int, int], int] = {}
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+
+        self._on_receipt: Optional[ReceiptCallback] = None
+
+    def set_receipt_callback(self, callback: ReceiptCallback):
+        """Register the coroutine used to broadcast (room_id, reader_id, last_read_message_id)"""
+        self._on_receipt = callback
+
+    def mark_read(self, room_id: int, user_id: int, message_id: int):
+        """Record that user_id has read room_id up to message_id"""
+        key = (room_id, user_id)
+        if message_id <= self._pending.get(key, 0):
+            return
+        self._pending[key] = message_id
+
+        if not self._flush_handle:
+            loop = asyncio.get_running_loop()
+            self._flush_handle = loop.call_later(
+                self.flush_delay, lambda: asyncio.ensure_future(self.flush())
+            )
+
+    async def flush(self):
+        """Write pending watermarks in one transaction and broadcast one receipt each"""
+        if self._flush_handle:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if not self._pending:
+            return
+
+        batch = self._pending
+        self._pending = {}
+
+        try:
+            batch = await asyncio.to_thread(self._write_batch, batch)
+        except Exception as e:
+            logger.error(f"Failed to write {len(batch)} read receipts: {e}")
+            return
+
+        if self._on_receipt:
+            for (room_id, user_id), message_id in batch.items():
+                try:
+                    await self._on_receipt(room_id, user_id, message_id)
+                except Exception as e:
+                    logger.error(f"Failed to broadcast read receipt for room {room_id}: {e}")
+
+    def _write_batch(self, batch: Dict[Tuple[int, int], int]) -> Dict[Tuple[int, int], int]:
+        with Session(engine) as session:
+            written = advance_read_watermarks(session, batch)
+            session.commit()
+        return written
+
+
+# Global read receipt buffer instance
+read_receipt_buffer = ReadReceiptBuffer()
@@ -4,13 +4,16 @@ from sqlmodel import Session, select, or_, and_, func, desc
 from api.auth.dependency import get_current_user
 from api.db.session import get_session
 from api.user.model import User
-from api.chat.model import ChatRoom, ChatMessage, OnlineStatus, MessageType, MessageStatus
+from api.chat.model import ChatRoom, ChatMessage, ChatReadState, OnlineStatus, MessageType, MessageStatus
 from api.chat.scheme import (
     ChatRoomCreate, ChatRoomRead, ChatMessageRead, ChatMessageCreate, 
     ChatMessageUpdate, WebSocketMessage, MessageData, TypingData, 
     ReadReceiptData, UserStatusData, OnlineStatusRead
 )
 from api.chat.connection_manager import connection_manager
+from api.media.storage import save_upload, publish_files
+from api.media.assets import record_assets
+from api.media.processing import process_image, probe_audio_duration
 from jose import jwt, JWTError
 from api.auth.constants import SECRET_KEY, ALGOGRYTHYM
 from api.auth.token_blacklist import is_token_blacklisted
@@ -22,6 +25,11 @@ import asyncio
 
 router = APIRouter()
 
+CHAT_UPLOAD_TYPES = ("file", "image", "voice")
+CHAT_MAX_UPLOAD_SIZE = 50 * 1024 * 1024  # 50MB
+# Max missed messages pushed over the socket on join_room; the rest is fetched over REST
+JOIN_ROOM_CATCH_UP_LIMIT = 50
+
 async def authenticate_websocket(token: str) -> Optional[User]:
     """Authenticate WebSocket connection using JWT token"""
     try:
@@ -43,6 +51,38 @@ async def authenticate_websocket(token: str) -> Optional[User]:
         return None
 
 
+def fetch_room_history(
+    session: Session,
+    room_id: int,
+    before_id: Optional[int] = None,
+    after_id: Optional[int] = None,
+    limit: int = 50,
+) -> List[ChatMessage]:
+    """
+    Keyset pagination over a room's messages using the (room_id, id DESC) index.
+    - before_id: older page ending right before this message
+    - after_id: messages newer than this one (delta since the client's last seen ID)
+    - neither: the latest page
+    Messages are returned oldest first.
+    """
+    query = (
+        select(ChatMessage)
+        .where(ChatMessage.room_id == room_id)
+        .where(ChatMessage.is_deleted == False)
+    )
+
+    if after_id is not None:
+        query = query.where(ChatMessage.id > after_id)
+        if before_id is not None:
+            query = query.where(ChatMessage.id < before_id)
+        return session.exec(query.order_by(ChatMessage.id).limit(limit)).all()
+
+    if before_id is not None:
+        query = query.where(ChatMessage.id < before_id)
+    messages = session.exec(query.order_by(desc(ChatMessage.id)).limit(limit)).all()
+    return list(reversed(messages))
+
+
 
 @router.websocket("/ws/chat")
 async def websocket_chat(websocket: WebSocket, token: str = Query(...)):
@@ -71,30 +111,44 @@ async def websocket_chat(websocket: WebSocket, token: str = Query(...)):
         while True:
             # Receive message from client
             data = await websocket.receive_text()
+            # Any frame from the client counts as activity
+            await connection_manager.heartbeat(user_id)
             try:
                 message = json.loads(data)
                 message_type = message.get("type")
                 message_data = message.get("data", {})
                 
-                if message_type == "join_room":
+                if message_type == "ping":
+                    # Client-initiated keepalive
+                    await websocket.send_text(json.dumps({
+                        "type": "pong",
+                        "data": {"timestamp": datetime.utcnow().isoformat()}
+                    }))
+                
+                elif message_type == "pong":
+                    # Reply to a server ping - activity already recorded above
+                    pass
+                
+                elif message_type == "join_room":
                     # Join a specific chat room
                     room_id = message_data.get("room_id")
+                    # Reconnecting clients send the last message they have to get only the delta
+                    last_message_id = message_data.get("last_message_id")
                     if room_id:
                         # Join room through connection manager
                         success = await connection_manager.join_room(user_id, room_id)
                         
                         if success:
                             
-                            # Send recent messages
-                            messages = session.exec(
-                                select(ChatMessage)
-                                .where(ChatMessage.room_id == room_id)
-                                .where(ChatMessage.is_deleted == False)
-                                .order_by(desc(ChatMessage.timestamp))
-                                .limit(50)
-                            ).all()
+                            # Send recent messages (or only the missed ones)
+                            messages = fetch_room_history(
+                                session, room_id, after_id=last_message_id,
+                                limit=JOIN_ROOM_CATCH_UP_LIMIT + 1 if last_message_id is not None else JOIN_ROOM_CATCH_UP_LIMIT
+                            )
+                            has_more = len(messages) > JOIN_ROOM_CATCH_UP_LIMIT
+                            messages = messages[:JOIN_ROOM_CATCH_UP_LIMIT]
                             
-                            for msg in reversed(messages):
+                            for msg in messages:
                                 msg_data = {
                                     "type": "message",
                                     "data": {
@@ -117,6 +171,18 @@ async def websocket_chat(websocket: WebSocket, token: str = Query(...)):
                                     }
                                 }
                                 await websocket.send_text(json.dumps(msg_data))
+                            
+                            if has_more:
+                                # Delta larger than one frame batch: client continues with
+                                # GET /rooms/{room_id}/messages?after_id=... (or /sync) from last_message_id
+                                await websocket.send_text(json.dumps({
+                                    "type": "sync_required",
+                                    "data": {
+                                        "room_id": room_id,
+                                        "last_message_id": messages[-1].id,
+                                        "has_more": True
+                                    }
+                                }))
                 
                 elif message_type == "message":
                     # Send a new message
@@ -197,29 +263,24 @@ async def websocket_chat(websocket: WebSocket, token: str = Query(...)):
                         await connection_manager.update_typing_status(user_id, room_id, is_typing)
                 
                 elif message_type == "read_receipt":
-                    # Handle read receipt
+                    # Handle read receipt: "read up to message_id" watermark
                     room_id = message_data.get("room_id")
                     message_id = message_data.get("message_id")
                     
-                    if room_id and message_id:
-                        # Update message status to read
-                        message = session.exec(
-                            select(ChatMessage).where(ChatMessage.id == message_id)
-                        ).first()
-                        
-                        if message and message.sender_id != user_id:
-                            message.status = MessageStatus.read
-                            session.commit()
-                            
-                            receipt_data = {
-                                "type": "read_receipt",
-                                "data": {
-                                    "room_id": room_id,
-                                    "message_id": message_id,
-                                    "reader_id": user_id
-                                }
-                            }
-                            await connection_manager.broadcast_to_room(room_id, receipt_data, exclude_user_id=user_id)
+                    try:
+                        room_id, message_id = int(room_id), int(message_id)
+                    except (TypeError, ValueError):
+                        await websocket.send_text(json.dumps({
+                            "type": "error",
+                            "data": {"message": "Invalid room_id or message_id"}
+                        }))
+                        continue
+
+                    if room_id > 0 and message_id > 0:
+                        # Watermark is clamped to the room's newest message when written
+                        if room_id in connection_manager.presence.get_user_rooms(user_id):
+                            # Coalesced with other receipts into one write and one broadcast
+                            connection_manager.mark_read(user_id, room_id, message_id)
                 
             except json.JSONDecodeError:
                 await websocket.send_text(json.dumps({
@@ -236,7 +297,8 @@ async def websocket_chat(websocket: WebSocket, token: str = Query(...)):
         pass
     finally:
         # Cleanup on disconnect through connection manager
-        await connection_manager.disconnect_user(user_id)
+        # (skipped if this socket was already replaced by a reconnect)
+        await connection_manager.disconnect_user(user_id, websocket)
 
 # REST API Endpoints
 
@@ -255,6 +317,30 @@ def get_chat_rooms(
         ).order_by(desc(ChatRoom.last_activity))
     ).all()
     
+    # Unread counts for all rooms in one query, derived from the read watermarks
+    unread_counts = {}
+    if rooms:
+        unread_counts = dict(session.exec(
+            select(ChatMessage.room_id, func.count(ChatMessage.id))
+            .join(
+                ChatReadState,
+                and_(
+                    ChatReadState.room_id == ChatMessage.room_id,
+                    ChatReadState.user_id == current_user.id
+                ),
+                isouter=True
+            )
+            .where(
+                and_(
+                    ChatMessage.room_id.in_([room.id for room in rooms]),
+                    ChatMessage.sender_id != current_user.id,
+                    ChatMessage.is_deleted == False,
+                    ChatMessage.id > func.coalesce(ChatReadState.last_read_message_id, 0)
+                )
+            )
+            .group_by(ChatMessage.room_id)
+        ).all())
+    
     enhanced_rooms = []
     for room in rooms:
         # Get other user info
@@ -273,18 +359,6 @@ def get_chat_rooms(
             if last_msg and not last_msg.is_deleted:
                 last_message = ChatMessageRead.from_orm(last_msg)
         
-        # Count unread messages
-        unread_count = session.exec(
-            select(func.count(ChatMessage.id)).where(
-                and_(
-                    ChatMessage.room_id == room.id,
-                    ChatMessage.sender_id != current_user.id,
-                    ChatMessage.status != MessageStatus.read,
-                    ChatMessage.is_deleted == False
-                )
-            )
-        ).first()
-        
         room_data = ChatRoomRead(
             id=room.id,
             user1_id=room.user1_id,
@@ -297,7 +371,7 @@ def get_chat_rooms(
             other_user_name=f"{other_user.first_name or ''} {other_user.last_name or ''}".strip() or other_user.username,
             other_user_avatar=other_user.avatar,
             other_user_online=online_status.is_online if online_status else False,
-            unread_count=unread_count or 0,
+            unread_count=unread_counts.get(room.id, 0),
             last_message=last_message
         )
         enhanced_rooms.append(room_data)
@@ -335,6 +409,9 @@ def create_chat_room(
     session.add(room)
     session.commit()
     session.refresh(room)
+    
+    # Keep presence room index in sync for connected users
+    connection_manager.presence.add_room(room.id, room.user1_id, room.user2_id)
     return room
 
 @router.get("/rooms/{room_id}/messages", response_model=List[ChatMessageRead])
@@ -343,9 +420,11 @@ def get_room_messages(
     current_user: Annotated[User, Depends(get_current_user)],
     session: Session = Depends(get_session),
     limit: int = Query(50, ge=1, le=100),
-    offset: int = Query(0, ge=0),
+    before_id: Optional[int] = Query(None, ge=1, description="Load older messages before this message ID"),
+    after_id: Optional[int] = Query(None, ge=0, description="Load newer messages after this message ID"),
+    offset: int = Query(0, ge=0, deprecated=True, description="Use before_id instead"),
 ):
-    """Get messages for a specific room with pagination"""
+    """Get messages for a specific room with cursor pagination (oldest first)"""
     # Verify user has access to this room
     room = session.exec(
         select(ChatRoom).where(
@@ -362,58 +441,106 @@ def get_room_messages(
     if not room:
         raise HTTPException(status_code=404, detail="Room not found or access denied")
     
+    if offset and before_id is None and after_id is None:
+        # Legacy offset pagination for older app versions
+        messages = session.exec(
+            select(ChatMessage)
+            .where(ChatMessage.room_id == room_id)
+            .where(ChatMessage.is_deleted == False)
+            .order_by(desc(ChatMessage.id))
+            .offset(offset)
+            .limit(limit)
+        ).all()
+        return [ChatMessageRead.from_orm(msg) for msg in reversed(messages)]
+    
+    messages = fetch_room_history(session, room_id, before_id=before_id, after_id=after_id, limit=limit)
+    return [ChatMessageRead.from_orm(msg) for msg in messages]
+
+@router.get("/sync")
+def sync_messages(
+    current_user: Annotated[User, Depends(get_current_user)],
+    session: Session = Depends(get_session),
+    last_message_id: int = Query(..., ge=0, description="Last message ID the client has seen"),
+    limit: int = Query(200, ge=1, le=500),
+):
+    """
+    Delta sync for reconnecting mobile clients.
+    Returns messages from all of the user's rooms newer than last_message_id (oldest first).
+    Call again with the returned last_message_id while has_more is true.
+    """
+    room_ids = select(ChatRoom.id).where(
+        or_(
+            ChatRoom.user1_id == current_user.id,
+            ChatRoom.user2_id == current_user.id
+        )
+    )
+    
     messages = session.exec(
         select(ChatMessage)
-        .where(ChatMessage.room_id == room_id)
+        .where(ChatMessage.room_id.in_(room_ids))
+        .where(ChatMessage.id > last_message_id)
         .where(ChatMessage.is_deleted == False)
-        .order_by(desc(ChatMessage.timestamp))
-        .offset(offset)
-        .limit(limit)
+        .order_by(ChatMessage.id)
+        .limit(limit + 1)
     ).all()
     
-    return [ChatMessageRead.from_orm(msg) for msg in reversed(messages)]
+    has_more = len(messages) > limit
+    messages = messages[:limit]
+    
+    return {
+        "messages": [ChatMessageRead.from_orm(msg) for msg in messages],
+        "last_message_id": messages[-1].id if messages else last_message_id,
+        "has_more": has_more
+    }
 
 @router.post("/upload")
 async def upload_file(
     current_user: Annotated[User, Depends(get_current_user)],
+    session: Session = Depends(get_session),
     file: UploadFile = File(...),
     type: str = Form("file")  # file, image, voice
 ):
     """Upload file for chat (image, voice, document)"""
+    if type not in CHAT_UPLOAD_TYPES:
+        raise HTTPException(status_code=400, detail=f"Invalid upload type, must be one of {', '.join(CHAT_UPLOAD_TYPES)}")
     
-    # Validate file type and size
-    max_size = 50 * 1024 * 1024  # 50MB
-    if file.size and file.size > max_size:
-        raise HTTPException(status_code=400, detail="File too large (max 50MB)")
-    
-    # Create directory based on type
-    upload_dir = f"static/chat/{type}s"
-    os.makedirs(upload_dir, exist_ok=True)
-    
-    # Generate unique filename
-    file_ext = os.path.splitext(file.filename)[1]
-    unique_filename = f"{uuid.uuid4().hex}{file_ext}"
-    file_path = f"{upload_dir}/{unique_filename}"
-    
-    # Save file
-    with open(file_path, "wb") as f:
-        content = await file.read()
-        f.write(content)
+    # Stream to disk in chunks off the event loop; files are named by content hash
+    stored = await save_upload(file, f"chat/{type}s", CHAT_MAX_UPLOAD_SIZE, f"chat_{type}")
     
-    file_url = f"/{file_path}"
+    result = {
+        "file_url": stored.url,
+        "file_name": file.filename,
+        "file_size": stored.size,
+        "content_hash": stored.content_hash,
+        "thumbnail_url": None
+    }
     
-    # Generate thumbnail for images
-    thumbnail_url = None
     if type == "image":
-        # TODO: Implement thumbnail generation
-        thumbnail_url = file_url  # For now, same as original
+        # Thumbnail and downscaled variants are generated in the media process pool
+        media = await process_image(stored.path)
+        result.update({
+            "thumbnail_url": media.get("thumbnail_url") or stored.url,
+            "width": media.get("width"),
+            "height": media.get("height"),
+            "variants": media.get("variants", {})
+        })
+    elif type == "voice":
+        result["duration"] = await probe_audio_duration(stored.path)
     
-    return {
-        "file_url": file_url,
-        "file_name": file.filename,
-        "file_size": len(content),
-        "thumbnail_url": thumbnail_url
-    }
+    # Publish file + thumbnail lên media backend; asset không được tin nhắn nào dùng sẽ bị GC xoá
+    keys = await publish_files([stored.path, *(media.get("paths", []) if type == "image" else [])])
+    record_assets(session, [{
+        "content_hash": stored.content_hash,
+        "preset": f"chat_{type}",
+        "url": stored.url,
+        "keys": keys,
+        "width": result.get("width"),
+        "height": result.get("height"),
+        "variants": [],
+    }])
+    session.commit()
+    
+    return result
 
 @router.patch("/messages/{message_id}")
 def update_message(
@@ -0,0 +1,19 @@
+"""
+Quy ước load relationship
+Các collection lớn (Order.items, Product.attributes, Cart.items) không được lazy load:
+với DB_RAISE_ON_LAZY_LOAD, truy cập khi chưa load sẽ raise thay vì âm thầm chạy thêm một query cho mỗi dòng.
+Endpoint cần dữ liệu con phải khai báo rõ bằng selectinload(...), endpoint danh sách
+chỉ cần số lượng thì dùng aggregate subquery.
+
+    from sqlalchemy.orm import selectinload
+    session.exec(select(Order).options(selectinload(Order.items)))
+"""
+
+from decouple import config as decouple_config
+
+# Bật (DB_RAISE_ON_LAZY_LOAD=true) ở dev / CI để phát hiện chỗ thiếu eager load;
+# production giữ lazy load mặc định để một chỗ bị sót không thành lỗi 500
+RAISE_ON_LAZY_LOAD = decouple_config("DB_RAISE_ON_LAZY_LOAD", default=False, cast=bool)
+
+# sa_relationship_kwargs cho các collection theo quy ước trên
+NO_LAZY_COLLECTION = {"lazy": "raise_on_sql" if RAISE_ON_LAZY_LOAD else "select"}
@@ -0,0 +1,14 @@
+"""
+Projection cho listing chỉ đọc
+Query chọn đúng các cột cần dùng và trả về dict, không tạo ORM object
+(không identity map, không change tracking, không relationship).
+"""
+
+from typing import List
+from sqlalchemy.sql import Executable
+from sqlmodel import Session
+
+
+def fetch_dicts(session: Session, statement: Executable) -> List[dict]:
+    """Chạy select(Model.a, Model.b, ...) hoặc text(...) và trả về list dict theo tên cột"""
+    return [dict(row) for row in session.execute(statement).mappings()]
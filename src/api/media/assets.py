@@ -0,0 +1,187 @@
+"""
+Media asset: đếm tham chiếu và garbage collector
+File lưu theo nội dung nên nhiều dòng (sản phẩm, shop, tin nhắn...) có thể dùng chung
+một asset. Thay vì tăng/giảm bộ đếm ở từng endpoint ghi, GC định kỳ đếm lại số dòng
+đang tham chiếu url của mỗi asset trong một câu lệnh. Asset có ref_count = 0 được đánh
+dấu orphaned_at và chỉ bị xoá (row + file trên backend) sau MEDIA_GC_GRACE_HOURS -
+file vừa upload nhưng entity chưa lưu (ví dụ file chat chưa gửi tin nhắn) vẫn an toàn.
+
+Upload trùng nội dung dùng lại file đã có trên đĩa, nên phải tránh GC xoá file đó ngay
+sau khi upload thấy nó tồn tại: upload giữ asset (claim_asset) trước khi kiểm tra file,
+còn GC xoá file trong một transaction giữ khoá _FILE_LOCK_KEY độc quyền và bỏ qua asset
+vừa được giữ lại. Upload hoặc thấy asset trước khi GC kiểm tra lại (file được giữ), hoặc
+chờ GC xoá xong rồi mới kiểm tra file (thấy file mất và ghi lại).
+"""
+
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional, Tuple
+from sqlalchemy import bindparam, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlmodel import Session
+from api.media.backends import get_media_backend
+from api.media.config import MEDIA_GC_INTERVAL_SECONDS, MEDIA_GC_GRACE_HOURS
+from api.media.model import MediaAsset
+
+logger = logging.getLogger(__name__)
+
+# Số asset tối đa xoá mỗi lượt
+MEDIA_GC_BATCH_SIZE = 500
+
+_GC_LOCK_KEY = 420049
+# Shared: upload giữ asset; exclusive: GC xoá file
+_FILE_LOCK_KEY = 420050
+
+# Các cột lưu URL media
+MEDIA_REFERENCES = (
+    ("product", "cover"),
+    ("attribute", "image"),
+    ("shop", "avatar"),
+    ("users", "avatar"),
+    ("chat_messages", "file_url"),
+)
+
+_REFS = " UNION ALL ".join(
+    f"SELECT {column} AS url FROM {table} WHERE {column} IS NOT NULL" for table, column in MEDIA_REFERENCES
+)
+
+# Chỉ ghi các dòng có ref_count / trạng thái orphan thay đổi
+_REFRESH_REF_COUNTS_QUERY = text(f"""
+    WITH counts AS (
+        SELECT url, COUNT(*) AS n FROM ({_REFS}) refs GROUP BY url
+    )
+    UPDATE media_asset m
+    SET ref_count = COALESCE(c.n, 0),
+        orphaned_at = CASE WHEN c.n IS NULL THEN COALESCE(m.orphaned_at, :now) ELSE NULL END
+    FROM media_asset m2
+    LEFT JOIN counts c ON c.url = m2.url
+    WHERE m2.content_hash = m.content_hash AND m2.preset = m.preset
+    AND (m.ref_count, m.orphaned_at IS NULL) IS DISTINCT FROM (COALESCE(c.n, 0), c.n IS NOT NULL)
+""")
+
+_DELETE_ORPHANS_QUERY = text("""
+    DELETE FROM media_asset
+    WHERE (content_hash, preset) IN (
+        SELECT content_hash, preset FROM media_asset
+        WHERE ref_count = 0 AND orphaned_at < :cutoff
+        ORDER BY orphaned_at
+        LIMIT :limit
+    )
+    RETURNING content_hash, preset, keys
+""")
+
+_EXISTING_ASSETS_QUERY = text("""
+    SELECT content_hash, preset FROM media_asset
+    WHERE content_hash IN :hashes
+""").bindparams(bindparam("hashes", expanding=True))
+
+
+def claim_asset(content_hash: str, preset: str, url: str, keys: List[str]):
+    """
+    Giữ asset trước khi dùng lại file cùng nội dung đã có trên đĩa (commit ngay, session riêng).
+    Tạo row nếu chưa có và bỏ đánh dấu orphan; record_assets ghi đủ thông tin sau khi xử lý xong.
+    Chạy trong thread, không gọi trực tiếp trong event loop.
+    """
+    from api.db.session import engine
+
+    with Session(engine) as session:
+        session.execute(text("SELECT pg_advisory_xact_lock_shared(:key)"), {"key": _FILE_LOCK_KEY})
+        statement = pg_insert(MediaAsset).values(
+            content_hash=content_hash, preset=preset, url=url, keys=keys,
+            variants=[], created_at=datetime.utcnow(),
+        )
+        session.execute(statement.on_conflict_do_update(
+            index_elements=["content_hash", "preset"],
+            set_={"orphaned_at": None},
+        ))
+        session.commit()
+
+
+def record_assets(session: Session, rows: Iterable[dict]):
+    """
+    Ghi media_asset (chưa commit). Asset đã có (kể cả row do claim_asset tạo) được cập
+    nhật theo kết quả xử lý và bỏ đánh dấu orphan.
+    rows: content_hash, preset, url, keys, width, height, variants
+    """
+    now = datetime.utcnow()
+    values = {(row["content_hash"], row["preset"]): {**row, "created_at": now} for row in rows}
+    if not values:
+        return
+    statement = pg_insert(MediaAsset).values(list(values.values()))
+    session.execute(statement.on_conflict_do_update(
+        index_elements=["content_hash", "preset"],
+        set_={
+            "url": statement.excluded.url,
+            "keys": statement.excluded["keys"],
+            "width": statement.excluded.width,
+            "height": statement.excluded.height,
+            "variants": statement.excluded.variants,
+            "orphaned_at": None,
+        },
+    ))
+
+
+def collect_garbage(session: Session) -> Tuple[int, int]:
+    """
+    Đếm lại tham chiếu và xoá asset mồ côi quá hạn (một worker mỗi lượt).
+    Trả về (số asset thay đổi ref_count, số asset đã xoá).
+    """
+    locked = session.execute(
+        text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": _GC_LOCK_KEY}
+    ).scalar()
+    if not locked:
+        session.rollback()
+        return 0, 0
+
+    now = datetime.utcnow()
+    refreshed = session.execute(_REFRESH_REF_COUNTS_QUERY, {"now": now}).rowcount
+    deleted = session.execute(_DELETE_ORPHANS_QUERY, {
+        "cutoff": now - timedelta(hours=MEDIA_GC_GRACE_HOURS),
+        "limit": MEDIA_GC_BATCH_SIZE,
+    }).all()
+    session.commit()
+
+    # Xoá file sau khi commit: lỗi xoá file chỉ để lại file thừa, không để lại row trỏ tới file đã mất
+    if deleted:
+        _delete_files(session, deleted)
+    return refreshed, len(deleted)
+
+
+def _delete_files(session: Session, deleted: List[Tuple[str, str, Optional[List[str]]]]):
+    # Chặn claim_asset trong lúc kiểm tra lại và xoá file
+    session.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _FILE_LOCK_KEY})
+    reclaimed = {
+        (row[0], row[1])
+        for row in session.execute(_EXISTING_ASSETS_QUERY, {"hashes": list({row[0] for row in deleted})})
+    }
+    get_media_backend().delete(
+        key
+        for content_hash, preset, keys in deleted
+        if (content_hash, preset) not in reclaimed
+        for key in keys or []
+    )
+    session.commit()
+
+
+def _collect_once():
+    from api.db.session import engine
+
+    with Session(engine) as session:
+        return collect_garbage(session)
+
+
+async def media_gc_periodically():
+    """Background task chạy GC mỗi MEDIA_GC_INTERVAL_SECONDS"""
+    while True:
+        try:
+            refreshed, deleted = await asyncio.to_thread(_collect_once)
+            logger.info(f"Media GC: {refreshed} ref counts updated, {deleted} orphaned assets deleted")
+        except Exception as e:
+            logger.error(f"Error during media GC: {e}")
+
+        await asyncio.sleep(MEDIA_GC_INTERVAL_SECONDS)
+
+
+def start_media_gc():
+    asyncio.create_task(media_gc_periodically())
@@ -0,0 +1,98 @@
+"""
+Backend lưu media
+File luôn được ghi và xử lý (thumbnail, bản thu nhỏ) trong MEDIA_ROOT trước, sau đó
+publish lên backend theo key = đường dẫn tương đối trong MEDIA_ROOT
+(ví dụ products/<sha256>_w640.jpg). Key theo nội dung nên object không bao giờ bị ghi đè.
+- LocalBackend: MEDIA_ROOT chính là nơi lưu, publish không cần làm gì
+- S3Backend: upload lên bucket rồi xoá bản trong MEDIA_ROOT
+"""
+
+import logging
+import mimetypes
+import os
+import threading
+from typing import Iterable, Optional
+from api.media.config import (
+    MEDIA_ROOT, MEDIA_BACKEND, MEDIA_S3_BUCKET, MEDIA_S3_ENDPOINT_URL, MEDIA_S3_PUBLIC_URL
+)
+
+logger = logging.getLogger(__name__)
+
+# Object theo nội dung không đổi - client / CDN cache vĩnh viễn
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+class LocalBackend:
+    """File nằm trong MEDIA_ROOT, được app mount tại /static"""
+    def __init__(self, root: str = MEDIA_ROOT, base_url: str = "/static"):
+        self.root = root
+        self.base_url = base_url
+
+    def url(self, key: str) -> str:
+        return f"{self.base_url}/{key}"
+
+    def put_file(self, key: str, local_path: str):
+        target = os.path.join(self.root, key)
+        if os.path.abspath(target) != os.path.abspath(local_path):
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(local_path, target)
+
+    def delete(self, keys: Iterable[str]):
+        for key in keys:
+            try:
+                os.remove(os.path.join(self.root, key))
+            except FileNotFoundError:
+                pass
+
+
+class S3Backend:
+    """Bucket S3-compatible (AWS S3, MinIO, R2...)"""
+    def __init__(self, bucket: str, public_url: str, endpoint_url: Optional[str] = None):
+        import boto3
+        self.bucket = bucket
+        self.base_url = public_url.rstrip("/")
+        self._client = boto3.client("s3", endpoint_url=endpoint_url or None)
+
+    def url(self, key: str) -> str:
+        return f"{self.base_url}/{key}"
+
+    def put_file(self, key: str, local_path: str):
+        content_type = mimetypes.guess_type(key)[0] or "application/octet-stream"
+        self._client.upload_file(local_path, self.bucket, key, ExtraArgs={
+            "ContentType": content_type,
+            "CacheControl": IMMUTABLE_CACHE_CONTROL,
+        })
+        os.remove(local_path)
+
+    def delete(self, keys: Iterable[str]):
+        keys = list(keys)
+        # delete_objects nhận tối đa 1000 key mỗi lần
+        for start in range(0, len(keys), 1000):
+            self._client.delete_objects(Bucket=self.bucket, Delete={
+                "Objects": [{"Key": key} for key in keys[start:start + 1000]],
+                "Quiet": True,
+            })
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_media_backend():
+    """Backend theo MEDIA_BACKEND, tạo khi cần lần đầu"""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = _create_backend()
+    return _backend
+
+
+def _create_backend():
+    if MEDIA_BACKEND == "s3":
+        if not MEDIA_S3_BUCKET or not MEDIA_S3_PUBLIC_URL:
+            raise RuntimeError("MEDIA_BACKEND=s3 requires MEDIA_S3_BUCKET and MEDIA_S3_PUBLIC_URL")
+        return S3Backend(MEDIA_S3_BUCKET, MEDIA_S3_PUBLIC_URL, MEDIA_S3_ENDPOINT_URL)
+    if MEDIA_BACKEND != "local":
+        logger.warning(f"Unknown MEDIA_BACKEND {MEDIA_BACKEND!r}; using local storage")
+    return LocalBackend()
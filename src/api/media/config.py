@@ -0,0 +1,29 @@
+from decouple import config as decouple_config
+
+# Thư mục gốc chứa file upload (được mount tại /static)
+MEDIA_ROOT = decouple_config("MEDIA_ROOT", default="static")
+
+# Số process dùng để xử lý ảnh (thumbnail, resize)
+MEDIA_WORKERS = decouple_config("MEDIA_WORKERS", default=2, cast=int)
+
+# Kích thước mỗi chunk khi ghi file upload xuống đĩa (bytes)
+UPLOAD_CHUNK_SIZE = decouple_config("UPLOAD_CHUNK_SIZE", default=1024 * 1024, cast=int)
+
+# Nơi lưu file đã xử lý: "local" (MEDIA_ROOT, phục vụ tại /static) hoặc "s3" (bucket
+# S3-compatible, cần package boto3; chạy local với MinIO qua MEDIA_S3_ENDPOINT_URL)
+MEDIA_BACKEND = decouple_config("MEDIA_BACKEND", default="local")
+MEDIA_S3_BUCKET = decouple_config("MEDIA_S3_BUCKET", default="")
+MEDIA_S3_ENDPOINT_URL = decouple_config("MEDIA_S3_ENDPOINT_URL", default="")
+# URL public của bucket (CDN hoặc endpoint/bucket), không có "/" cuối
+MEDIA_S3_PUBLIC_URL = decouple_config("MEDIA_S3_PUBLIC_URL", default="")
+
+# Garbage collector: chu kỳ chạy và thời gian chờ trước khi xoá asset không còn được tham chiếu
+MEDIA_GC_INTERVAL_SECONDS = decouple_config("MEDIA_GC_INTERVAL_SECONDS", default=3600, cast=int)
+MEDIA_GC_GRACE_HOURS = decouple_config("MEDIA_GC_GRACE_HOURS", default=24, cast=int)
+
+# Cache-Control max-age (giây) cho file tĩnh tên không theo nội dung (favicon, file cũ dạng uuid).
+# File tên theo SHA-256 luôn được cache immutable 1 năm.
+STATIC_MAX_AGE = decouple_config("STATIC_MAX_AGE", default=3600, cast=int)
+# Prefix location internal của nginx, ví dụ "/_static". Khi đặt, app chỉ trả header
+# X-Accel-Redirect và nginx gửi nội dung file (sendfile, range) thay cho worker Python.
+STATIC_ACCEL_REDIRECT_PREFIX = decouple_config("STATIC_ACCEL_REDIRECT_PREFIX", default="")
@@ -0,0 +1,132 @@
+"""
+Image pipeline dùng chung cho ảnh sản phẩm, biến thể, avatar shop và avatar user
+Upload được ghi xuống đĩa theo chunk ngoài event loop (save_upload), sau đó process pool
+tạo bản WebP + JPEG ở các chiều rộng cố định của preset và bỏ EXIF. Giá trị lưu vào
+model là URL bản JPEG lớn nhất; URL các bản khác suy ra được từ URL đó (image_variants)
+nên response không cần query thêm. Các file được publish lên media backend và ghi vào
+media_asset (api/media/assets.py) để garbage collector xoá khi không còn được dùng.
+"""
+
+import os
+import re
+from dataclasses import dataclass
+from typing import Iterable, List, Optional, Tuple
+from fastapi import HTTPException, UploadFile
+from sqlmodel import Session
+from api.media.assets import record_assets
+from api.media.backends import get_media_backend
+from api.media.config import MEDIA_ROOT
+from api.media.processing import generate_variants
+from api.media.storage import StoredFile, media_url, publish_files, save_upload
+
+
+@dataclass(frozen=True)
+class ImagePreset:
+    name: str
+    subdir: str                 # Thư mục trong MEDIA_ROOT
+    widths: Tuple[int, ...]     # Chiều rộng các bản (px), tăng dần
+    max_size: int               # Kích thước upload tối đa (bytes)
+
+
+PRODUCT_IMAGE = ImagePreset("product", "products", (320, 640, 1280), 10 * 1024 * 1024)
+ATTRIBUTE_IMAGE = ImagePreset("attribute", "attribute_images", (160, 320, 640), 10 * 1024 * 1024)
+SHOP_AVATAR = ImagePreset("shop_avatar", "shop_avatars", (96, 256, 512), 5 * 1024 * 1024)
+USER_AVATAR = ImagePreset("avatar", "avatars", (96, 256, 512), 5 * 1024 * 1024)
+
+_PRESETS_BY_SUBDIR = {
+    preset.subdir: preset for preset in (PRODUCT_IMAGE, ATTRIBUTE_IMAGE, SHOP_AVATAR, USER_AVATAR)
+}
+_VARIANT_KEY = re.compile(r"^(?P<subdir>.+)/(?P<hash>[0-9a-f]{64})_w\d+\.jpg$")
+
+
+class InvalidImageError(Exception):
+    """File upload không phải ảnh đọc được"""
+
+
+@dataclass
+class StoredImage:
+    url: str                    # Bản JPEG lớn nhất - lưu vào model
+    content_hash: str
+    preset: str
+    width: int                  # Kích thước ảnh gốc
+    height: int
+    variants: List[dict]        # [{"width", "webp", "jpg"}]
+    keys: List[str]             # Key của mọi file trong media backend
+
+
+def _variant_list(subdir: str, content_hash: str, widths: Iterable[int]) -> List[dict]:
+    backend = get_media_backend()
+    key = f"{subdir}/{content_hash}"
+    return [{
+        "width": width,
+        "webp": backend.url(f"{key}_w{width}.webp"),
+        "jpg": backend.url(f"{key}_w{width}.jpg"),
+    } for width in widths]
+
+
+def image_variants(url: Optional[str]) -> Optional[List[dict]]:
+    """
+    URL các bản thu nhỏ của ảnh đã qua pipeline, None với ảnh cũ / URL ngoài.
+    Client chọn bản có width gần nhất với kích thước hiển thị.
+    """
+    base = get_media_backend().base_url + "/"
+    if not url or not url.startswith(base):
+        return None
+    match = _VARIANT_KEY.match(url[len(base):])
+    if not match:
+        return None
+    preset = _PRESETS_BY_SUBDIR.get(match.group("subdir"))
+    if preset is None:
+        return None
+    return _variant_list(preset.subdir, match.group("hash"), preset.widths)
+
+
+async def process_stored_image(stored: StoredFile, preset: ImagePreset) -> StoredImage:
+    """Tạo các bản của file đã lưu bằng save_upload / store_stream; raise InvalidImageError nếu không đọc được"""
+    stem = os.path.join(MEDIA_ROOT, preset.subdir, stored.content_hash)
+    result = await generate_variants(stored.path, stem, preset.widths)
+    if result is None:
+        if os.path.exists(stored.path):
+            os.remove(stored.path)
+        raise InvalidImageError(stored.path)
+
+    largest = result["variants"][preset.widths[-1]]["jpg"]
+    keys = await publish_files(
+        path for paths in result["variants"].values() for path in paths.values()
+    )
+    return StoredImage(
+        url=media_url(largest),
+        content_hash=stored.content_hash,
+        preset=preset.name,
+        width=result["width"],
+        height=result["height"],
+        variants=_variant_list(preset.subdir, stored.content_hash, preset.widths),
+        keys=keys,
+    )
+
+
+def record_images(session: Session, images: Iterable[StoredImage]):
+    """Ghi media_asset cho các ảnh, commit cùng entity dùng ảnh"""
+    record_assets(session, [{
+        "content_hash": image.content_hash,
+        "preset": image.preset,
+        "url": image.url,
+        "keys": image.keys,
+        "width": image.width,
+        "height": image.height,
+        "variants": image.variants,
+    } for image in images])
+
+
+async def save_image(file: UploadFile, preset: ImagePreset, session: Session) -> StoredImage:
+    """
+    Lưu ảnh upload qua pipeline và ghi media_asset vào session (chưa commit).
+    Raise HTTPException 400 nếu file quá lớn hoặc không phải ảnh.
+    """
+    stored = await save_upload(file, preset.subdir, preset.max_size, preset.name)
+    try:
+        image = await process_stored_image(stored, preset)
+    except InvalidImageError:
+        raise HTTPException(status_code=400, detail="Uploaded file is not a valid image")
+    record_images(session, [image])
+    return image
@@ -0,0 +1,27 @@
+from sqlmodel import SQLModel, Field
+from sqlalchemy import Column, JSON
+from typing import List, Optional
+from datetime import datetime
+
+class MediaAsset(SQLModel, table=True):
+    """
+    File media lưu theo nội dung, khoá theo SHA-256 của file upload và preset (cùng một
+    ảnh dùng làm avatar và ảnh sản phẩm có hai bộ bản thu nhỏ).
+    url là giá trị được lưu vào Product.cover, Shop.avatar, ChatMessage.file_url...
+    ref_count do garbage collector (api/media/assets.py) đếm lại từ các bảng đó.
+    """
+    __tablename__ = "media_asset"
+
+    content_hash: str = Field(primary_key=True, max_length=64)
+    preset: str = Field(primary_key=True)  # product, attribute, shop_avatar, avatar, chat_image...
+    url: str = Field(index=True)
+    # Key của mọi file thuộc asset trong media backend (bản gốc, thumbnail, bản thu nhỏ)
+    keys: List[str] = Field(default_factory=list, sa_column=Column(JSON, nullable=False))
+    width: Optional[int] = None
+    height: Optional[int] = None
+    # [{"width", "webp", "jpg"}] - URL của các bản thu nhỏ
+    variants: List[dict] = Field(default_factory=list, sa_column=Column(JSON, nullable=False))
+    ref_count: int = Field(default=0)
+    # Lần đầu GC thấy asset không còn được tham chiếu; None khi đang được dùng
+    orphaned_at: Optional[datetime] = Field(default=None, index=True)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
@@ -0,0 +1,216 @@
+"""
+Xử lý media trong process pool
+Tạo thumbnail và các bản thu nhỏ cho ảnh, đọc kích thước ảnh và thời lượng audio.
+Các hàm worker là hàm top-level để có thể pickle sang process khác.
+"""
+
+import asyncio
+import logging
+import os
+import wave
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional, Sequence
+from api.media.config import MEDIA_WORKERS
+from api.media.storage import media_url
+
+logger = logging.getLogger(__name__)
+
+# Cạnh dài nhất của thumbnail (px)
+THUMBNAIL_SIZE = 320
+# Chiều rộng các bản thu nhỏ (px); chỉ tạo khi ảnh gốc lớn hơn
+CHAT_IMAGE_WIDTHS = (1280,)
+JPEG_QUALITY = 82
+WEBP_QUALITY = 80
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """Process pool dùng chung, tạo khi cần lần đầu"""
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=MEDIA_WORKERS)
+    return _pool
+
+
+def shutdown_process_pool():
+    """Dừng process pool khi tắt app"""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+async def process_image(
+    path: str,
+    widths: Sequence[int] = CHAT_IMAGE_WIDTHS,
+    thumbnail_size: Optional[int] = THUMBNAIL_SIZE,
+) -> dict:
+    """
+    Tạo thumbnail / bản thu nhỏ cho ảnh trong process pool.
+    Trả về {"width", "height", "thumbnail_url", "variants": {width: url}, "paths": [file đã tạo]}.
+    Ảnh lỗi hoặc thiếu Pillow thì trả về dict rỗng, upload vẫn thành công.
+    """
+    loop = asyncio.get_running_loop()
+    try:
+        result = await loop.run_in_executor(
+            get_process_pool(), _process_image, path, tuple(widths), thumbnail_size
+        )
+    except Exception as e:
+        logger.warning(f"Image processing failed for {path}: {e}")
+        return {}
+
+    return {
+        "width": result["width"],
+        "height": result["height"],
+        "thumbnail_url": media_url(result["thumbnail"]) if result["thumbnail"] else None,
+        "variants": {width: media_url(p) for width, p in result["variants"].items()},
+        "paths": [p for p in (result["thumbnail"], *result["variants"].values()) if p],
+    }
+
+
+async def generate_variants(source_path: str, stem: str, widths: Sequence[int]) -> Optional[dict]:
+    """
+    Tạo bản WebP + JPEG (không EXIF) cho từng chiều rộng trong process pool, tên file
+    `{stem}_w{width}.webp|.jpg`. Ảnh nhỏ hơn width thì giữ nguyên kích thước.
+    File gốc bị xoá sau khi tạo xong. Trả về {"width", "height", "variants": {width: {format: path}}},
+    None nếu không đọc được ảnh.
+    """
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(
+            get_process_pool(), _generate_variants, source_path, stem, tuple(widths)
+        )
+    except Exception as e:
+        logger.warning(f"Image variant generation failed for {source_path}: {e}")
+        return None
+
+
+async def probe_audio_duration(path: str) -> Optional[int]:
+    """Thời lượng file audio (giây), None nếu không đọc được"""
+    try:
+        return await asyncio.to_thread(_audio_duration, path)
+    except Exception as e:
+        logger.warning(f"Audio probing failed for {path}: {e}")
+        return None
+
+
+def _variant_path(path: str, suffix: str) -> str:
+    stem, _ = os.path.splitext(path)
+    return f"{stem}_{suffix}.jpg"
+
+
+def _save_jpeg(image, path: str):
+    # Ghi file tạm rồi rename để request khác không đọc được file ghi dở
+    tmp_path = f"{path}.part"
+    if image.mode in ("RGBA", "LA", "P"):
+        # JPEG không có alpha - đặt lên nền trắng thay vì để vùng trong suốt thành màu đen
+        from PIL import Image
+        image = image.convert("RGBA")
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel("A"))
+        image = background
+    elif image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    # Không truyền exif / icc_profile - metadata của ảnh gốc (GPS, máy chụp) không được ghi lại
+    image.save(tmp_path, "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+    os.replace(tmp_path, path)
+
+
+def _save_webp(image, path: str):
+    tmp_path = f"{path}.part"
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if "A" in image.getbands() or image.mode == "P" else "RGB")
+    image.save(tmp_path, "WEBP", quality=WEBP_QUALITY, method=4)
+    os.replace(tmp_path, path)
+
+
+def _process_image(path: str, widths: tuple, thumbnail_size: Optional[int]) -> dict:
+    from PIL import Image, ImageOps
+
+    with Image.open(path) as source:
+        image = ImageOps.exif_transpose(source)
+        width, height = image.size
+
+        variants: Dict[int, str] = {}
+        for target in sorted(widths):
+            if target >= width:
+                continue
+            variant_path = _variant_path(path, f"w{target}")
+            # Tên file theo hash nội dung nên bản đã tạo trước đó vẫn đúng
+            if not os.path.exists(variant_path):
+                resized = image.resize(
+                    (target, max(1, round(height * target / width))), Image.LANCZOS
+                )
+                _save_jpeg(resized, variant_path)
+            variants[target] = variant_path
+
+        thumbnail_path = None
+        if thumbnail_size:
+            thumbnail_path = _variant_path(path, "thumb")
+            if not os.path.exists(thumbnail_path):
+                thumb = image.copy()
+                thumb.thumbnail((thumbnail_size, thumbnail_size), Image.LANCZOS)
+                _save_jpeg(thumb, thumbnail_path)
+
+    return {
+        "width": width,
+        "height": height,
+        "thumbnail": thumbnail_path,
+        "variants": variants,
+    }
+
+
+def _variant_paths(stem: str, width: int) -> Dict[str, str]:
+    return {"webp": f"{stem}_w{width}.webp", "jpg": f"{stem}_w{width}.jpg"}
+
+
+def _generate_variants(source_path: str, stem: str, widths: tuple) -> dict:
+    from PIL import Image, ImageOps
+
+    variants = {width: _variant_paths(stem, width) for width in sorted(widths)}
+    try:
+        source = Image.open(source_path)
+    except FileNotFoundError:
+        # Upload trùng nội dung đang được request khác xử lý xong và xoá file gốc
+        largest = variants[max(variants)]["jpg"]
+        if all(os.path.exists(p) for paths in variants.values() for p in paths.values()):
+            with Image.open(largest) as existing:
+                width, height = existing.size
+            return {"width": width, "height": height, "variants": variants}
+        raise
+
+    with source:
+        image = ImageOps.exif_transpose(source)
+        width, height = image.size
+        for target, paths in variants.items():
+            if all(os.path.exists(p) for p in paths.values()):
+                continue
+            resized = image
+            if target < width:
+                resized = image.resize((target, max(1, round(height * target / width))), Image.LANCZOS)
+            _save_webp(resized, paths["webp"])
+            _save_jpeg(resized, paths["jpg"])
+
+    # Chỉ giữ các bản đã xử lý (không còn EXIF) trong thư mục public
+    if os.path.exists(source_path):
+        os.remove(source_path)
+    return {"width": width, "height": height, "variants": variants}
+
+
+def _audio_duration(path: str) -> Optional[int]:
+    try:
+        import mutagen
+    except ImportError:
+        mutagen = None
+
+    if mutagen is not None:
+        audio = mutagen.File(path)
+        if audio is not None and audio.info is not None:
+            return round(audio.info.length)
+
+    if path.lower().endswith(".wav"):
+        with wave.open(path, "rb") as wav:
+            return round(wav.getnframes() / float(wav.getframerate()))
+
+    return None
@@ -0,0 +1,119 @@
+"""
+Phục vụ file tĩnh / media tại /static
+StaticFiles của Starlette với:
+- Cache-Control immutable 1 năm cho file tên theo SHA-256 (nội dung không bao giờ đổi),
+  max-age STATIC_MAX_AGE cho file khác
+- Range / 206 cho seek audio, video (FileResponse)
+- File nén sẵn (.br / .gz cạnh file gốc, tạo bằng scripts/precompress_static.py) cho các
+  loại file text khi client chấp nhận
+- STATIC_ACCEL_REDIRECT_PREFIX: trả X-Accel-Redirect để nginx gửi nội dung file bằng
+  sendfile. Đây là cách duy nhất để worker không phải đọc file: ở chế độ mặc định
+  FileResponse (starlette 0.46 + uvicorn, không có http.response.pathsend) đọc và gửi
+  từng chunk qua worker, kể cả file chat lớn. Cấu hình nginx tương ứng:
+
+      location /_static/ {
+          internal;
+          alias /code/static/;
+          sendfile on;
+      }
+"""
+
+import hashlib
+import mimetypes
+import os
+import re
+from email.utils import formatdate
+from typing import Optional, Tuple
+from urllib.parse import quote
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from api.media.backends import IMMUTABLE_CACHE_CONTROL
+from api.media.config import STATIC_MAX_AGE, STATIC_ACCEL_REDIRECT_PREFIX
+
+# <sha256>.ext, <sha256>_w640.jpg, <sha256>_thumb.jpg
+_CONTENT_HASHED = re.compile(r"^[0-9a-f]{64}(?:_[a-z0-9]+)?\.[a-z0-9]+$")
+
+# Chỉ các loại này có bản nén sẵn - ảnh / audio đã nén, không kiểm tra thêm file
+COMPRESSIBLE_EXTENSIONS = {".css", ".js", ".json", ".svg", ".txt", ".html", ".xml", ".map"}
+# Thứ tự ưu tiên khi client chấp nhận nhiều encoding
+_PRECOMPRESSED = (("br", ".br"), ("gzip", ".gz"))
+
+
+def static_cache_control(path: str) -> str:
+    """Cache-Control theo tên file"""
+    if _CONTENT_HASHED.match(os.path.basename(path)):
+        return IMMUTABLE_CACHE_CONTROL
+    return f"public, max-age={STATIC_MAX_AGE}"
+
+
+def _stat_headers(stat_result: os.stat_result) -> dict:
+    # Cùng cách tính ETag / Last-Modified với FileResponse để 304 nhất quán giữa hai chế độ
+    etag_base = f"{stat_result.st_mtime}-{stat_result.st_size}"
+    return {
+        "ETag": f'"{hashlib.md5(etag_base.encode(), usedforsecurity=False).hexdigest()}"',
+        "Last-Modified": formatdate(stat_result.st_mtime, usegmt=True),
+    }
+
+
+class MediaStaticFiles(StaticFiles):
+    def __init__(self, *args, accel_redirect_prefix: str = STATIC_ACCEL_REDIRECT_PREFIX, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.accel_redirect_prefix = accel_redirect_prefix.rstrip("/")
+
+    def file_response(self, full_path, stat_result: os.stat_result, scope, status_code: int = 200) -> Response:
+        request_headers = Headers(scope=scope)
+        full_path = os.fspath(full_path)
+        compressible = os.path.splitext(full_path)[1].lower() in COMPRESSIBLE_EXTENSIONS
+
+        if self.accel_redirect_prefix:
+            response = self._accel_redirect_response(full_path, stat_result, status_code)
+        else:
+            precompressed = self._find_precompressed(full_path, request_headers) if compressible else None
+            if precompressed:
+                path, encoding, compressed_stat = precompressed
+                response = FileResponse(
+                    path,
+                    status_code=status_code,
+                    media_type=mimetypes.guess_type(full_path)[0] or "text/plain",
+                    stat_result=compressed_stat,
+                    headers={"Content-Encoding": encoding},
+                )
+            else:
+                response = FileResponse(full_path, status_code=status_code, stat_result=stat_result)
+
+        if compressible:
+            response.headers["Vary"] = "Accept-Encoding"
+        response.headers["Cache-Control"] = static_cache_control(full_path)
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
+
+    def _find_precompressed(
+        self, full_path: str, request_headers: Headers
+    ) -> Optional[Tuple[str, str, os.stat_result]]:
+        # Range áp dụng trên bản gốc - không trả bản nén cho request có Range
+        if "range" in request_headers:
+            return None
+        accepted = {
+            value.split(";")[0].strip().lower()
+            for value in request_headers.get("accept-encoding", "").split(",")
+        }
+        for encoding, suffix in _PRECOMPRESSED:
+            if encoding not in accepted:
+                continue
+            try:
+                return full_path + suffix, encoding, os.stat(full_path + suffix)
+            except FileNotFoundError:
+                continue
+        return None
+
+    def _accel_redirect_response(self, full_path: str, stat_result: os.stat_result, status_code: int) -> Response:
+        relative = os.path.relpath(full_path, self.directory).replace(os.sep, "/")
+        response = Response(
+            status_code=status_code,
+            media_type=mimetypes.guess_type(full_path)[0] or "application/octet-stream",
+            headers={"X-Accel-Redirect": quote(f"{self.accel_redirect_prefix}/{relative}")},
+        )
+        response.headers.update(_stat_headers(stat_result))
+        return response
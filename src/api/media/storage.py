@@ -0,0 +1,135 @@
+"""
+Lưu file upload xuống đĩa
+Đọc/ghi theo chunk trong thread pool (không block event loop), tính SHA-256 trong
+lúc ghi và đặt tên file theo nội dung để các file giống nhau chỉ lưu một lần.
+File được ghi vào MEDIA_ROOT; publish_files đưa file đã xử lý xong lên media backend
+(api/media/backends.py) và URL public do backend quyết định.
+"""
+
+import asyncio
+import hashlib
+import os
+import re
+import tempfile
+from dataclasses import dataclass
+from typing import BinaryIO, Iterable, List, Optional
+from fastapi import HTTPException, UploadFile
+from api.media.assets import claim_asset
+from api.media.backends import get_media_backend
+from api.media.config import MEDIA_ROOT, UPLOAD_CHUNK_SIZE
+
+_SAFE_EXT = re.compile(r"^\.[a-z0-9]{1,10}$")
+
+
+@dataclass
+class StoredFile:
+    path: str           # Đường dẫn trên đĩa, ví dụ static/chat/images/<sha256>.jpg
+    url: str            # URL public, ví dụ /static/chat/images/<sha256>.jpg
+    content_hash: str   # SHA-256 của nội dung
+    size: int           # Kích thước (bytes)
+    is_duplicate: bool  # File cùng nội dung đã tồn tại trước đó
+
+
+def media_key(path: str) -> str:
+    """Key của file trong media backend (đường dẫn tương đối trong MEDIA_ROOT)"""
+    return os.path.relpath(path, MEDIA_ROOT).replace(os.sep, "/")
+
+
+def media_url(path: str) -> str:
+    """Chuyển đường dẫn trên đĩa thành URL public"""
+    return get_media_backend().url(media_key(path))
+
+
+async def publish_files(paths: Iterable[str]) -> List[str]:
+    """Đưa các file đã xử lý xong lên media backend, trả về key của chúng"""
+    paths = list(paths)
+    return await asyncio.to_thread(_publish, paths)
+
+
+def _publish(paths: List[str]) -> List[str]:
+    backend = get_media_backend()
+    keys = []
+    for path in paths:
+        key = media_key(path)
+        backend.put_file(key, path)
+        keys.append(key)
+    return keys
+
+
+def safe_extension(filename: str) -> str:
+    """Lấy đuôi file an toàn (chữ thường, chỉ gồm chữ và số)"""
+    ext = os.path.splitext(filename or "")[1].lower()
+    return ext if _SAFE_EXT.match(ext) else ""
+
+
+async def save_upload(file: UploadFile, subdir: str, max_size: int, preset: Optional[str] = None) -> StoredFile:
+    """
+    Ghi UploadFile xuống MEDIA_ROOT/subdir theo từng chunk, tên file là SHA-256 của nội dung.
+    preset: tên media asset sẽ ghi cho file, giữ asset trước khi dùng lại file trùng nội dung.
+    Raise HTTPException 400 nếu file vượt quá max_size.
+    """
+    if file.size and file.size > max_size:
+        raise HTTPException(status_code=400, detail=f"File too large (max {max_size // (1024 * 1024)}MB)")
+
+    directory = os.path.join(MEDIA_ROOT, subdir)
+    ext = safe_extension(file.filename)
+    await file.seek(0)
+    return await asyncio.to_thread(_write_stream, file.file, directory, ext, max_size, preset)
+
+
+def _write_stream(
+    source: BinaryIO, directory: str, ext: str, max_size: int, preset: Optional[str] = None
+) -> StoredFile:
+    os.makedirs(directory, exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = source.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_size:
+                    raise HTTPException(
+                        status_code=400,
+                        detail=f"File too large (max {max_size // (1024 * 1024)}MB)"
+                    )
+                digest.update(chunk)
+                out.write(chunk)
+
+        content_hash = digest.hexdigest()
+        path = os.path.join(directory, f"{content_hash}{ext}")
+        if preset:
+            # Giữ asset trước khi kiểm tra file có sẵn - GC không xoá file đang được dùng lại
+            claim_asset(content_hash, preset, media_url(path), [media_key(path)])
+        is_duplicate = os.path.exists(path)
+        if is_duplicate:
+            os.remove(tmp_path)
+        else:
+            os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    return StoredFile(
+        path=path,
+        url=media_url(path),
+        content_hash=content_hash,
+        size=size,
+        is_duplicate=is_duplicate,
+    )
+
+
+def store_stream(
+    source: BinaryIO, subdir: str, filename: str, max_size: int, preset: Optional[str] = None
+) -> StoredFile:
+    """
+    Bản đồng bộ của save_upload cho file không đến từ request (ví dụ ảnh trong file zip).
+    Chạy trong thread (asyncio.to_thread), không gọi trực tiếp trong event loop.
+    """
+    directory = os.path.join(MEDIA_ROOT, subdir)
+    return _write_stream(source, directory, safe_extension(filename), max_size, preset)
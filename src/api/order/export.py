@@ -0,0 +1,79 @@
+"""
+Export đơn hàng dạng stream (CSV / NDJSON)
+Query chạy bằng server-side cursor và được đọc theo từng lô, mỗi lô được ghi ra thành
+một chunk của StreamingResponse - bộ nhớ không phụ thuộc số lượng đơn hàng.
+"""
+
+import csv
+import io
+from datetime import datetime
+from enum import Enum
+from typing import Any, Callable, Dict, Iterator, Optional, Sequence
+import orjson
+from fastapi.responses import StreamingResponse
+from sqlmodel import Session
+
+# Số dòng đọc từ cursor cho mỗi chunk
+EXPORT_CHUNK_SIZE = 1000
+
+EXPORT_MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def _csv_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    return "" if value is None else value
+
+
+def stream_export(
+    statement,
+    params: Optional[Dict[str, Any]],
+    columns: Sequence[str],
+    fmt: str,
+    transform: Optional[Callable[[dict], dict]] = None,
+) -> Iterator[bytes]:
+    """
+    Generator chạy `statement` với session riêng (session của request đã đóng khi
+    response bắt đầu stream) và trả về các chunk CSV/NDJSON theo `columns`.
+    """
+    from api.db.session import engine
+
+    if fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        # BOM để Excel nhận đúng UTF-8 (tên tiếng Việt)
+        buffer.write("\ufeff")
+        writer.writerow(columns)
+        yield buffer.getvalue().encode("utf-8")
+
+    with Session(engine) as session:
+        # yield_per: server-side cursor, mỗi lần fetch EXPORT_CHUNK_SIZE dòng
+        result = session.execute(
+            statement, params or {}, execution_options={"yield_per": EXPORT_CHUNK_SIZE}
+        )
+        for partition in result.mappings().partitions():
+            rows = [transform(dict(row)) if transform else row for row in partition]
+            if fmt == "csv":
+                buffer.seek(0)
+                buffer.truncate()
+                writer.writerows([[_csv_value(row[column]) for column in columns] for row in rows])
+                yield buffer.getvalue().encode("utf-8")
+            else:
+                yield b"".join(
+                    orjson.dumps({column: row[column] for column in columns}, default=str) + b"\n"
+                    for row in rows
+                )
+
+
+def export_response(chunks: Iterator[bytes], fmt: str, basename: str) -> StreamingResponse:
+    filename = f"{basename}_{datetime.utcnow():%Y%m%d_%H%M%S}.{fmt}"
+    return StreamingResponse(
+        chunks,
+        media_type=EXPORT_MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
@@ -1,10 +1,12 @@
 from sqlmodel import SQLModel, Field, Relationship
+from sqlalchemy import Index
 from typing import Optional, List, TYPE_CHECKING
 from datetime import datetime
 from enum import Enum
 import random
 import string
 import uuid
+from api.db.loading import NO_LAZY_COLLECTION
 
 # Forward references to avoid circular imports
 if TYPE_CHECKING:
@@ -52,6 +54,11 @@ class OrderStatus:
 
 class OrderItem(SQLModel, table=True):
     __tablename__ = "order_items"
+    __table_args__ = (
+        Index("ix_order_items_order_id", "order_id"),
+        # Trending engine tính lại điểm theo sản phẩm
+        Index("ix_order_items_product_id", "product_id"),
+    )
     
     id: Optional[int] = Field(default=None, primary_key=True)
     order_id: int = Field(foreign_key="orders.id")
@@ -70,6 +77,23 @@ class OrderItem(SQLModel, table=True):
     product: Optional["Product"] = Relationship(back_populates="order_items")
     attribute: Optional["Attribute"] = Relationship()
 
+class OrderShop(SQLModel, table=True):
+    """
+    Liên kết đơn hàng - shop, tạo lúc checkout (một dòng cho mỗi shop có hàng trong đơn).
+    Danh sách đơn và thống kê phía seller quét index (shop_id, created_at) thay vì
+    join orders -> order_items -> product rồi DISTINCT.
+    """
+    __tablename__ = "order_shops"
+    __table_args__ = (
+        Index("ix_order_shops_shop_id_created_at", "shop_id", "created_at"),
+    )
+    
+    order_id: int = Field(primary_key=True, foreign_key="orders.id")
+    shop_id: int = Field(primary_key=True, foreign_key="shop.id")
+    item_count: int = Field(default=0)  # Tổng số lượng sản phẩm của shop trong đơn
+    subtotal: float = Field(default=0.0)  # Tổng tiền hàng của shop trong đơn
+    created_at: datetime = Field(default_factory=datetime.utcnow)  # = orders.created_at
+
 def generate_order_number() -> str:
     """Generate unique order number format: ORD-YYYYMMDD-XXXXXX with UUID suffix"""
     date_part = datetime.now().strftime("%Y%m%d")
@@ -104,7 +128,7 @@ class Order(SQLModel, table=True):
     
     # Timestamp fields - match database schema
     created_at: datetime = Field(default_factory=datetime.utcnow)
-    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow, index=True)  # Trending: đơn mới / đổi trạng thái
     confirmed_at: Optional[datetime] = None
     shipped_at: Optional[datetime] = None
     delivered_at: Optional[datetime] = None
@@ -116,7 +140,7 @@ class Order(SQLModel, table=True):
     
     # Re-enable relationships
     user: Optional["User"] = Relationship(back_populates="orders")
-    items: List[OrderItem] = Relationship(back_populates="order")
+    items: List[OrderItem] = Relationship(back_populates="order", sa_relationship_kwargs=NO_LAZY_COLLECTION)
     # Temporarily disable payments relationship to avoid circular dependency issues
     # payments: List["Payment"] = Relationship(back_populates="order")
     
@@ -1,11 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlmodel import Session, select, and_
-from sqlalchemy import text
+from sqlalchemy import text, bindparam
+from sqlalchemy.orm import selectinload
 from typing import List, Optional, Union
 from api.auth.dependency import get_current_user
 from api.auth.auth import get_session
 from api.auth.permission import require_admin_or_approver
-from api.order.model import Order, OrderItem, OrderStatus, generate_order_number
+from api.order.model import Order, OrderItem, OrderShop, OrderStatus, generate_order_number
 from api.attribute.model import Attribute
 from api.product.model import Product
 from api.order.scheme import (
@@ -16,10 +17,20 @@ from api.order.scheme import (
     AdminOrderStats, AdminOrderStatusUpdateRequest, AdminOrderFilter
 )
 from api.user.model import User
+from api.shop.metrics import shop_metrics, get_order_shop_ids
+from api.db.projection import fetch_dicts
+from api.order.export import stream_export, export_response
 from datetime import datetime
 
 router = APIRouter()
 
+
+def _get_order_with_items(session: Session, order_id: int) -> Optional[Order]:
+    """Order kèm items cho OrderRead (Order.items không cho lazy load)"""
+    return session.get(
+        Order, order_id, options=[selectinload(Order.items)], populate_existing=True
+    )
+
 def calculate_shipping_fee(total_price: float, shipping_address: str) -> float:
     """
     Tính phí vận chuyển dựa trên tổng giá trị đơn hàng và địa chỉ
@@ -48,12 +59,22 @@ def create_order(
         total_price = 0.0
         order_items_data = []
 
+        # Khoá các biến thể tới khi commit (theo thứ tự id để tránh deadlock): tồn kho và
+        # version được tính từ giá trị đã đọc, bulk update đồng thời phải chờ thay vì bị ghi đè
+        attributes = {
+            attribute.attribute_id: attribute
+            for attribute in session.exec(
+                select(Attribute)
+                .where(Attribute.attribute_id.in_({item.attribute_id for item in order_data.items}))
+                .order_by(Attribute.attribute_id)
+                .with_for_update()
+            ).all()
+        }
+
         # Validate và tính toán từng item trong đơn hàng
         for item in order_data.items:
             # Lấy product attribute
-            attribute = session.exec(
-                select(Attribute).where(Attribute.attribute_id == item.attribute_id)
-            ).first()
+            attribute = attributes.get(item.attribute_id)
             if not attribute:
                 raise HTTPException(
                     status_code=404, 
@@ -157,13 +178,31 @@ def create_order(
 
             # Trừ tồn kho
             item_data['attribute'].quantity -= item_data['quantity']
+            item_data['attribute'].version += 1
             session.add(item_data['attribute'])
 
+        # Liên kết đơn hàng với từng shop (dùng cho danh sách đơn / thống kê của seller)
+        order_shops = {}
+        for item_data in order_items_data:
+            shop_id = item_data['product'].shop_id
+            link = order_shops.get(shop_id)
+            if link is None:
+                link = order_shops[shop_id] = OrderShop(
+                    order_id=order_id,
+                    shop_id=shop_id,
+                    created_at=order.created_at
+                )
+            link.item_count += item_data['quantity']
+            link.subtotal += item_data['price'] * item_data['quantity']
+        session.add_all(order_shops.values())
+
         session.commit()
         
-        # Refresh order object để return
-        session.refresh(order)
-        return order
+        # Thống kê của các shop có hàng trong đơn cần tính lại
+        shop_metrics.invalidate(order_shops.keys())
+        
+        # Load lại order kèm items để return
+        return _get_order_with_items(session, order_id)
 
     except HTTPException:
         session.rollback()
@@ -196,8 +235,24 @@ def list_orders(
             # If not integer, try to convert from status name to ID
             status_filter_int = OrderStatus.get_id(status_filter.lower())
     
-    # Base query
-    query = select(Order).where(Order.user_id == current_user.id)
+    # Số dòng sản phẩm của mỗi đơn - subquery tương quan dùng index order_items(order_id),
+    # không load OrderItem (Order.items không cho lazy load)
+    item_count = (
+        select(func.count(OrderItem.id))
+        .where(OrderItem.order_id == Order.id)
+        .correlate(Order)
+        .scalar_subquery()
+    )
+    
+    # Base query - chỉ lấy các cột của OrderSummary, không tạo Order object
+    query = select(
+        Order.id,
+        Order.order_number,
+        Order.status,
+        Order.total_amount,
+        Order.created_at,
+        item_count.label("total_items")
+    ).where(Order.user_id == current_user.id)
     
     # Filter by status if provided
     if status_filter_int:
@@ -214,7 +269,7 @@ def list_orders(
     offset = (page - 1) * limit
     query = query.offset(offset).limit(limit)
     
-    orders = session.exec(query).all()
+    summaries = fetch_dicts(session, query)
     
     # Calculate pagination metadata
     total_pages = (total + limit - 1) // limit
@@ -222,49 +277,27 @@ def list_orders(
     has_prev = page > 1
     
     # Convert to summary format
-    summaries = []
-    for order in orders:
-        total_items = len(order.items) if order.items else 0
-        summaries.append(OrderSummary(
-            id=order.id,
-            order_number=order.order_number,
-            status=order.get_status_name(),  # Use helper method to get status name
-            total_items=total_items,
-            total_amount=order.total_amount or 0.0,
-            created_at=order.created_at
-        ))
+    for summary in summaries:
+        summary["status"] = OrderStatus.get_name(summary["status"])
+        summary["total_amount"] = summary["total_amount"] or 0.0
     
-    return OrderListResponse(
-        items=summaries,
-        total=total,
-        page=page,
-        limit=limit,
-        total_pages=total_pages,
-        has_next=has_next,
-        has_prev=has_prev
-    )
+    return {
+        "items": summaries,
+        "total": total,
+        "page": page,
+        "limit": limit,
+        "total_pages": total_pages,
+        "has_next": has_next,
+        "has_prev": has_prev
+    }
 
-@router.get("/shop-orders", response_model=ShopOrderListResponse)
-def get_shop_orders(
-    current_user: User = Depends(get_current_user),
-    session: Session = Depends(get_session),
-    status_filter: Optional[str] = Query(None, description="Filter by status"),
-    page: int = Query(1, ge=1, description="Trang hiện tại"),
-    limit: int = Query(10, ge=1, le=100, description="Số lượng đơn hàng mỗi trang"),
-    date_from: Optional[str] = Query(None, description="Lọc từ ngày (YYYY-MM-DD)"),
-    date_to: Optional[str] = Query(None, description="Lọc đến ngày (YYYY-MM-DD)")
+def _shop_order_filters(
+    shop_id: int,
+    status_filter: Optional[str],
+    date_from: Optional[str],
+    date_to: Optional[str]
 ):
-    """Lấy tất cả đơn hàng của shop với thống kê chi tiết"""
-    from sqlmodel import func, col
-    from sqlalchemy import text
-    from api.shop.model import Shop
-    from datetime import datetime, timedelta
-    
-    # Kiểm tra user có shop không
-    shop = session.exec(select(Shop).where(Shop.user_id == current_user.id)).first()
-    if not shop:
-        raise HTTPException(status_code=404, detail="Shop not found for current user")
-    
+    """Điều kiện WHERE (SQL trên order_shops os / orders o) cho danh sách và export đơn của shop"""
     # Convert status filter to integer if provided
     status_filter_int = None
     if status_filter:
@@ -290,69 +323,75 @@ def get_shop_orders(
         except ValueError:
             raise HTTPException(status_code=400, detail="Invalid date_to format. Use YYYY-MM-DD")
     
-    # Query để lấy tất cả orders có chứa sản phẩm của shop này
-    base_query = text("""
-        SELECT DISTINCT o.*
-        FROM orders o
-        JOIN order_items oi ON o.id = oi.order_id
-        JOIN product p ON oi.product_id = p.product_id
-        WHERE p.shop_id = :shop_id
-    """)
-    
-    # Build dynamic WHERE clauses
-    where_clauses = ["p.shop_id = :shop_id"]
-    params = {"shop_id": shop.id}
+    # Đơn hàng của shop lấy từ order_shops: range scan trên index (shop_id, created_at),
+    # mỗi đơn chỉ có một dòng nên không cần DISTINCT
+    where_clauses = ["os.shop_id = :shop_id"]
+    params = {"shop_id": shop_id}
     
     if status_filter_int:
         where_clauses.append("o.status = :status")
         params["status"] = status_filter_int
     
     if date_from_dt:
-        where_clauses.append("o.created_at >= :date_from")
+        where_clauses.append("os.created_at >= :date_from")
         params["date_from"] = date_from_dt
     
     if date_to_dt:
-        where_clauses.append("o.created_at <= :date_to")
+        where_clauses.append("os.created_at <= :date_to")
         params["date_to"] = date_to_dt
     
-    # Main query with pagination
+    return where_clauses, params, status_filter_int
+
+@router.get("/shop-orders", response_model=ShopOrderListResponse)
+def get_shop_orders(
+    current_user: User = Depends(get_current_user),
+    session: Session = Depends(get_session),
+    status_filter: Optional[str] = Query(None, description="Filter by status"),
+    page: int = Query(1, ge=1, description="Trang hiện tại"),
+    limit: int = Query(10, ge=1, le=100, description="Số lượng đơn hàng mỗi trang"),
+    date_from: Optional[str] = Query(None, description="Lọc từ ngày (YYYY-MM-DD)"),
+    date_to: Optional[str] = Query(None, description="Lọc đến ngày (YYYY-MM-DD)"),
+    include_stats: bool = Query(True, description="Kèm thống kê shop (tắt khi cuộn trang để giảm tải)")
+):
+    """Lấy tất cả đơn hàng của shop với thống kê chi tiết"""
+    from api.shop.model import Shop
+    
+    # Kiểm tra user có shop không
+    shop = session.exec(select(Shop).where(Shop.user_id == current_user.id)).first()
+    if not shop:
+        raise HTTPException(status_code=404, detail="Shop not found for current user")
+    
+    where_clauses, params, status_filter_int = _shop_order_filters(shop.id, status_filter, date_from, date_to)
+    
+    # Main query with pagination - top-N theo index (shop_id, created_at), dừng sau LIMIT dòng
     main_query = text(f"""
-        SELECT DISTINCT o.*, 
-               COALESCE(CONCAT(u.first_name, ' ', u.last_name), u.username, u.email) as customer_full_name,
-               COUNT(oi.id) as total_items_in_order
-        FROM orders o
-        JOIN order_items oi ON o.id = oi.order_id
-        JOIN product p ON oi.product_id = p.product_id
-        JOIN users u ON o.user_id = u.id
+        SELECT o.*
+        FROM order_shops os
+        JOIN orders o ON o.id = os.order_id
         WHERE {' AND '.join(where_clauses)}
-        GROUP BY o.id, u.first_name, u.last_name, u.username, u.email
-        ORDER BY o.created_at DESC
+        ORDER BY os.created_at DESC
         LIMIT :limit OFFSET :offset
     """)
     
-    # Count query
+    # Tổng số đơn đếm riêng trên order_shops (chỉ join orders khi lọc theo status)
     count_query = text(f"""
-        SELECT COUNT(DISTINCT o.id)
-        FROM orders o
-        JOIN order_items oi ON o.id = oi.order_id
-        JOIN product p ON oi.product_id = p.product_id
+        SELECT COUNT(*)
+        FROM order_shops os
+        {'JOIN orders o ON o.id = os.order_id' if status_filter_int else ''}
         WHERE {' AND '.join(where_clauses)}
     """)
     
     # Execute queries
+    total_count = session.execute(count_query, params).scalar()
     offset = (page - 1) * limit
-    params.update({"limit": limit, "offset": offset})
-    
-    orders_result = session.execute(main_query, params).fetchall()
-    total_count = session.execute(count_query, params).fetchone()[0]
-    
-    # Prepare response data
-    shop_orders = []
+    orders_result = session.execute(main_query, {**params, "limit": limit, "offset": offset}).fetchall() if offset < total_count else []
     
-    for order_row in orders_result:
-        # Lấy thông tin chi tiết các sản phẩm của shop trong đơn hàng này
+    # Sản phẩm của shop trong tất cả đơn của trang - một query, gom nhóm theo order_id
+    items_by_order = {}
+    if orders_result:
         shop_items_query = text("""
-            SELECT p.name as product_name, 
+            SELECT oi.order_id,
+                   p.name as product_name, 
                    oi.quantity, 
                    oi.unit_price,
                    a.color,
@@ -360,19 +399,27 @@ def get_shop_orders(
             FROM order_items oi
             JOIN product p ON oi.product_id = p.product_id
             LEFT JOIN attribute a ON oi.attribute_id = a.attribute_id
-            WHERE oi.order_id = :order_id AND p.shop_id = :shop_id
-        """)
+            WHERE oi.order_id IN :order_ids AND p.shop_id = :shop_id
+            ORDER BY oi.order_id, oi.id
+        """).bindparams(bindparam("order_ids", expanding=True))
         
         shop_items_result = session.execute(shop_items_query, {
-            "order_id": order_row.id,
+            "order_ids": [order_row.id for order_row in orders_result],
             "shop_id": shop.id
         }).fetchall()
         
+        for item in shop_items_result:
+            items_by_order.setdefault(item.order_id, []).append(item)
+    
+    # Prepare response data
+    shop_orders = []
+    
+    for order_row in orders_result:
         shop_items = []
         shop_subtotal = 0.0
         total_shop_items = 0
         
-        for item in shop_items_result:
+        for item in items_by_order.get(order_row.id, []):
             # Convert decimal to float to avoid type mismatch
             unit_price = float(item.unit_price) if item.unit_price else 0.0
             item_total = unit_price * item.quantity
@@ -417,58 +464,8 @@ def get_shop_orders(
         
         shop_orders.append(shop_order)
     
-    # Tính toán thống kê cho get_shop_orders
-    now = datetime.utcnow()
-    today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
-    week_start = today_start - timedelta(days=today_start.weekday())
-    month_start = today_start.replace(day=1)
-    
-    stats_query = text("""
-        SELECT 
-            COUNT(DISTINCT o.id) as total_orders,
-            COUNT(DISTINCT CASE WHEN o.status = 1 THEN o.id END) as pending_orders,
-            COUNT(DISTINCT CASE WHEN o.status = 2 THEN o.id END) as confirmed_orders,
-            COUNT(DISTINCT CASE WHEN o.status = 3 THEN o.id END) as processing_orders,
-            COUNT(DISTINCT CASE WHEN o.status = 4 THEN o.id END) as shipped_orders,
-            COUNT(DISTINCT CASE WHEN o.status = 5 THEN o.id END) as delivered_orders,
-            COUNT(DISTINCT CASE WHEN o.status = 6 THEN o.id END) as cancelled_orders,
-            COUNT(DISTINCT CASE WHEN o.status = 7 THEN o.id END) as refunded_orders,
-            COUNT(DISTINCT CASE WHEN o.status = 8 THEN o.id END) as returned_orders,
-            COALESCE(SUM(CASE WHEN o.status = 5 THEN oi.total_price END), 0) as total_revenue,
-            COALESCE(SUM(CASE WHEN o.status IN (1,2,3,4) THEN oi.total_price END), 0) as pending_revenue,
-            COUNT(DISTINCT CASE WHEN o.created_at >= :today_start THEN o.id END) as orders_today,
-            COUNT(DISTINCT CASE WHEN o.created_at >= :week_start THEN o.id END) as orders_this_week,
-            COUNT(DISTINCT CASE WHEN o.created_at >= :month_start THEN o.id END) as orders_this_month
-        FROM orders o
-        JOIN order_items oi ON o.id = oi.order_id
-        JOIN product p ON oi.product_id = p.product_id
-        WHERE p.shop_id = :shop_id
-    """)
-    
-    stats_result = session.execute(stats_query, {
-        "shop_id": shop.id,
-        "today_start": today_start,
-        "week_start": week_start,
-        "month_start": month_start
-    }).fetchone()
-    
-    stats = ShopOrderStats(
-        total_orders=stats_result.total_orders or 0,
-        pending_orders=stats_result.pending_orders or 0,
-        confirmed_orders=stats_result.confirmed_orders or 0,
-        processing_orders=stats_result.processing_orders or 0,
-        shipped_orders=stats_result.shipped_orders or 0,
-        delivered_orders=stats_result.delivered_orders or 0,
-        cancelled_orders=stats_result.cancelled_orders or 0,
-        refunded_orders=stats_result.refunded_orders or 0,
-        returned_orders=stats_result.returned_orders or 0,
-        total_revenue=float(stats_result.total_revenue or 0),
-        pending_revenue=float(stats_result.pending_revenue or 0),
-        orders_today=stats_result.orders_today or 0,
-        orders_this_week=stats_result.orders_this_week or 0,
-        orders_this_month=stats_result.orders_this_month or 0,
-        pending_ratings=0  # TODO: Tính toán số rating cần trả lời
-    )
+    # Thống kê của shop (snapshot cache, tính lại khi đơn hàng đổi trạng thái)
+    stats = shop_metrics.get(session, shop.id) if include_stats else None
     
     # Pagination metadata
     total_pages = (total_count + limit - 1) // limit
@@ -486,92 +483,62 @@ def get_shop_orders(
         has_prev=has_prev
     )
 
+SHOP_ORDER_EXPORT_COLUMNS = [
+    "order_id", "order_number", "status", "item_count", "shop_subtotal", "order_total",
+    "recipient_name", "phone_number", "shipping_address", "created_at"
+]
+
+@router.get("/shop-orders/export")
+def export_shop_orders(
+    current_user: User = Depends(get_current_user),
+    session: Session = Depends(get_session),
+    format: str = Query("csv", pattern="^(csv|ndjson)$", description="csv hoặc ndjson"),
+    status_filter: Optional[str] = Query(None, description="Filter by status"),
+    date_from: Optional[str] = Query(None, description="Lọc từ ngày (YYYY-MM-DD)"),
+    date_to: Optional[str] = Query(None, description="Lọc đến ngày (YYYY-MM-DD)")
+):
+    """Export toàn bộ đơn hàng của shop (cùng filter với /shop-orders), stream theo từng lô"""
+    from api.shop.model import Shop
+    
+    shop = session.exec(select(Shop).where(Shop.user_id == current_user.id)).first()
+    if not shop:
+        raise HTTPException(status_code=404, detail="Shop not found for current user")
+    
+    where_clauses, params, _ = _shop_order_filters(shop.id, status_filter, date_from, date_to)
+    export_query = text(f"""
+        SELECT o.id AS order_id, o.order_number, o.status,
+               os.item_count, os.subtotal AS shop_subtotal, o.total_amount AS order_total,
+               o.recipient_name, o.phone_number, o.shipping_address, o.created_at
+        FROM order_shops os
+        JOIN orders o ON o.id = os.order_id
+        WHERE {' AND '.join(where_clauses)}
+        ORDER BY os.created_at DESC
+    """)
+    
+    def transform(row: dict) -> dict:
+        row["status"] = OrderStatus.get_name(row["status"])
+        return row
+    
+    return export_response(
+        stream_export(export_query, params, SHOP_ORDER_EXPORT_COLUMNS, format, transform),
+        format,
+        f"shop_{shop.id}_orders"
+    )
+
 @router.get("/shop-stats", response_model=ShopOrderStats)
 def get_shop_stats(
     current_user: User = Depends(get_current_user),
     session: Session = Depends(get_session)
 ):
     """Lấy thống kê tổng quan đơn hàng của shop (không bao gồm danh sách chi tiết)"""
-    from sqlalchemy import text
     from api.shop.model import Shop
-    from datetime import datetime, timedelta
     
     # Kiểm tra user có shop không
     shop = session.exec(select(Shop).where(Shop.user_id == current_user.id)).first()
     if not shop:
         raise HTTPException(status_code=404, detail="Shop not found for current user")
     
-    # Tính toán thống kê
-    now = datetime.utcnow()
-    today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
-    week_start = today_start - timedelta(days=today_start.weekday())
-    month_start = today_start.replace(day=1)
-    
-    stats_query = text("""
-        SELECT 
-            COUNT(DISTINCT o.id) as total_orders,
-            COUNT(DISTINCT CASE WHEN o.status = 1 THEN o.id END) as pending_orders,
-            COUNT(DISTINCT CASE WHEN o.status = 2 THEN o.id END) as confirmed_orders,
-            COUNT(DISTINCT CASE WHEN o.status = 3 THEN o.id END) as processing_orders,
-            COUNT(DISTINCT CASE WHEN o.status = 4 THEN o.id END) as shipped_orders,
-            COUNT(DISTINCT CASE WHEN o.status = 5 THEN o.id END) as delivered_orders,
-            COUNT(DISTINCT CASE WHEN o.status = 6 THEN o.id END) as cancelled_orders,
-            COUNT(DISTINCT CASE WHEN o.status = 7 THEN o.id END) as refunded_orders,
-            COUNT(DISTINCT CASE WHEN o.status = 8 THEN o.id END) as returned_orders,
-            COALESCE(SUM(CASE WHEN o.status = 5 THEN oi.total_price END), 0) as total_revenue,
-            COALESCE(SUM(CASE WHEN o.status IN (1,2,3,4) THEN oi.total_price END), 0) as pending_revenue,
-            COUNT(DISTINCT CASE WHEN o.created_at >= :today_start THEN o.id END) as orders_today,
-            COUNT(DISTINCT CASE WHEN o.created_at >= :week_start THEN o.id END) as orders_this_week,
-            COUNT(DISTINCT CASE WHEN o.created_at >= :month_start THEN o.id END) as orders_this_month
-        FROM orders o
-        JOIN order_items oi ON o.id = oi.order_id
-        JOIN product p ON oi.product_id = p.product_id
-        WHERE p.shop_id = :shop_id
-    """)
-    
-    stats_result = session.execute(stats_query, {
-        "shop_id": shop.id,
-        "today_start": today_start,
-        "week_start": week_start,
-        "month_start": month_start
-    }).fetchone()
-    
-    # TODO: Tính số lượng ratings cần trả lời
-    # Có thể thêm query để đếm số ratings chưa có phản hồi từ shop
-    pending_ratings_query = text("""
-        SELECT COUNT(*) 
-        FROM shop_ratings sr
-        WHERE sr.shop_id = :shop_id 
-        AND sr.id NOT IN (
-            SELECT rating_id FROM shop_rating_responses 
-            WHERE rating_id = sr.id
-        )
-    """)
-    
-    try:
-        pending_ratings_result = session.execute(pending_ratings_query, {"shop_id": shop.id}).fetchone()
-        pending_ratings_count = pending_ratings_result[0] if pending_ratings_result else 0
-    except:
-        # Nếu bảng shop_rating_responses chưa tồn tại thì skip
-        pending_ratings_count = 0
-    
-    return ShopOrderStats(
-        total_orders=stats_result.total_orders or 0,
-        pending_orders=stats_result.pending_orders or 0,
-        confirmed_orders=stats_result.confirmed_orders or 0,
-        processing_orders=stats_result.processing_orders or 0,
-        shipped_orders=stats_result.shipped_orders or 0,
-        delivered_orders=stats_result.delivered_orders or 0,
-        cancelled_orders=stats_result.cancelled_orders or 0,
-        refunded_orders=stats_result.refunded_orders or 0,
-        returned_orders=stats_result.returned_orders or 0,
-        total_revenue=float(stats_result.total_revenue or 0),
-        pending_revenue=float(stats_result.pending_revenue or 0),
-        orders_today=stats_result.orders_today or 0,
-        orders_this_week=stats_result.orders_this_week or 0,
-        orders_this_month=stats_result.orders_this_month or 0,
-        pending_ratings=pending_ratings_count
-    )
+    return shop_metrics.get(session, shop.id)
 
 # ===========================
 # ORDER ID ENDPOINTS (đặt cuối để tránh conflict với specific routes)
@@ -584,7 +551,7 @@ def get_order(
     session: Session = Depends(get_session)
 ):
     """Lấy chi tiết đơn hàng"""
-    order = session.get(Order, order_id)
+    order = _get_order_with_items(session, order_id)
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     
@@ -622,8 +589,7 @@ def update_order(
     order.updated_at = datetime.utcnow()
     session.add(order)
     session.commit()
-    session.refresh(order)
-    return order
+    return _get_order_with_items(session, order_id)
 
 @router.patch("/{order_id}/status")
 def update_order_status(
@@ -688,6 +654,7 @@ def update_order_status(
     
     session.add(order)
     session.commit()
+    shop_metrics.invalidate_orders(session, [order.id])
     
     return {
         "message": f"Order status updated from {old_status_name} to {new_status_name}",
@@ -723,10 +690,21 @@ def cancel_order(
     try:
         # Hoàn lại inventory
         items = session.exec(select(OrderItem).where(OrderItem.order_id == order_id)).all()
+        # Khoá các biến thể tới khi commit (cùng lý do với create_order)
+        attributes = {
+            attribute.attribute_id: attribute
+            for attribute in session.exec(
+                select(Attribute)
+                .where(Attribute.attribute_id.in_({item.attribute_id for item in items}))
+                .order_by(Attribute.attribute_id)
+                .with_for_update()
+            ).all()
+        }
         for item in items:
-            attribute = session.get(Attribute, item.attribute_id)
+            attribute = attributes.get(item.attribute_id)
             if attribute:
                 attribute.quantity += item.quantity
+                attribute.version += 1
                 session.add(attribute)
 
         # Update order status to cancelled
@@ -744,6 +722,7 @@ def cancel_order(
         session.add(order)
         
         session.commit()
+        shop_metrics.invalidate_orders(session, [order.id])
         
         # Return success message with status info
         return {
@@ -780,14 +759,20 @@ def delete_order(
         )
 
     try:
-        # Xóa order items trước
+        # Các shop có hàng trong đơn - lấy trước khi xóa items
+        affected_shop_ids = get_order_shop_ids(session, [order_id])
+        
+        # Xóa order items và liên kết shop trước
         items = session.exec(select(OrderItem).where(OrderItem.order_id == order_id)).all()
         for item in items:
             session.delete(item)
+        for link in session.exec(select(OrderShop).where(OrderShop.order_id == order_id)).all():
+            session.delete(link)
 
         # Xóa order
         session.delete(order)
         session.commit()
+        shop_metrics.invalidate(affected_shop_ids)
         
         return {"message": f"Order {order_id} deleted successfully"}
 
@@ -800,30 +785,18 @@ def delete_order(
 
 # ==================== ADMIN ORDER MANAGEMENT ====================
 
-@router.get("/admin/orders", response_model=AdminOrderListResponse)
-def get_admin_orders(
-    current_user: User = Depends(require_admin_or_approver),
-    session: Session = Depends(get_session),
-    page: int = Query(1, ge=1, description="Trang hiện tại"),
-    limit: int = Query(10, ge=1, le=100, description="Số lượng order mỗi trang"),
-    status: Optional[str] = Query(None, description="Filter theo status order"),
-    payment_status: Optional[str] = Query(None, description="Filter theo payment status"),
-    date_from: Optional[str] = Query(None, description="Lọc từ ngày (YYYY-MM-DD)"),
-    date_to: Optional[str] = Query(None, description="Lọc đến ngày (YYYY-MM-DD)"),
-    customer_search: Optional[str] = Query(None, description="Tìm kiếm khách hàng"),
-    order_number: Optional[str] = Query(None, description="Tìm kiếm theo số order"),
-    min_amount: Optional[float] = Query(None, description="Giá trị đơn hàng tối thiểu"),
-    max_amount: Optional[float] = Query(None, description="Giá trị đơn hàng tối đa"),
-):
-    """Lấy danh sách tất cả đơn hàng cho admin với filter và pagination"""
-    from sqlmodel import func, or_
-    from datetime import datetime
-    from api.payment.model import Payment, PaymentMethod
-    
-    # Simplified approach: Get orders first, then get payment info separately
-    base_query = select(Order)
+def _admin_order_conditions(
+    status: Optional[str],
+    date_from: Optional[str],
+    date_to: Optional[str],
+    customer_search: Optional[str],
+    order_number: Optional[str],
+    min_amount: Optional[float],
+    max_amount: Optional[float]
+) -> list:
+    """Điều kiện lọc Order cho danh sách và export đơn hàng của admin"""
+    from sqlmodel import or_
     
-    # Apply filters
     conditions = []
     
     # Status filter
@@ -869,6 +842,36 @@ def get_admin_orders(
     if max_amount is not None:
         conditions.append(Order.total_amount <= max_amount)
     
+    return conditions
+
+@router.get("/admin/orders", response_model=AdminOrderListResponse)
+def get_admin_orders(
+    current_user: User = Depends(require_admin_or_approver),
+    session: Session = Depends(get_session),
+    page: int = Query(1, ge=1, description="Trang hiện tại"),
+    limit: int = Query(10, ge=1, le=100, description="Số lượng order mỗi trang"),
+    status: Optional[str] = Query(None, description="Filter theo status order"),
+    payment_status: Optional[str] = Query(None, description="Filter theo payment status"),
+    date_from: Optional[str] = Query(None, description="Lọc từ ngày (YYYY-MM-DD)"),
+    date_to: Optional[str] = Query(None, description="Lọc đến ngày (YYYY-MM-DD)"),
+    customer_search: Optional[str] = Query(None, description="Tìm kiếm khách hàng"),
+    order_number: Optional[str] = Query(None, description="Tìm kiếm theo số order"),
+    min_amount: Optional[float] = Query(None, description="Giá trị đơn hàng tối thiểu"),
+    max_amount: Optional[float] = Query(None, description="Giá trị đơn hàng tối đa"),
+):
+    """Lấy danh sách tất cả đơn hàng cho admin với filter và pagination"""
+    from sqlmodel import func, or_
+    from datetime import datetime
+    from api.payment.model import Payment, PaymentMethod
+    
+    # Simplified approach: Get orders first, then get payment info separately
+    base_query = select(Order)
+    
+    # Apply filters
+    conditions = _admin_order_conditions(
+        status, date_from, date_to, customer_search, order_number, min_amount, max_amount
+    )
+    
     # Apply conditions
     if conditions:
         base_query = base_query.where(and_(*conditions))
@@ -941,6 +944,87 @@ def get_admin_orders(
         has_prev=has_prev
     )
 
+ADMIN_ORDER_EXPORT_COLUMNS = [
+    "order_id", "order_number", "user_id", "customer_name", "customer_phone", "status",
+    "subtotal", "shipping_fee", "discount_amount", "total_amount",
+    "payment_status", "payment_method", "created_at", "updated_at"
+]
+
+@router.get("/admin/orders/export")
+def export_admin_orders(
+    current_user: User = Depends(require_admin_or_approver),
+    format: str = Query("csv", pattern="^(csv|ndjson)$", description="csv hoặc ndjson"),
+    status: Optional[str] = Query(None, description="Filter theo status order"),
+    payment_status: Optional[str] = Query(None, description="Filter theo payment status"),
+    date_from: Optional[str] = Query(None, description="Lọc từ ngày (YYYY-MM-DD)"),
+    date_to: Optional[str] = Query(None, description="Lọc đến ngày (YYYY-MM-DD)"),
+    customer_search: Optional[str] = Query(None, description="Tìm kiếm khách hàng"),
+    order_number: Optional[str] = Query(None, description="Tìm kiếm theo số order"),
+    min_amount: Optional[float] = Query(None, description="Giá trị đơn hàng tối thiểu"),
+    max_amount: Optional[float] = Query(None, description="Giá trị đơn hàng tối đa"),
+):
+    """
+    Export đơn hàng cho admin (cùng filter với /admin/orders), stream theo từng lô.
+    Payment status / method lấy bằng subquery trong cùng query thay vì query theo từng đơn.
+    """
+    from sqlmodel import func, or_
+    from api.payment.model import Payment, PaymentMethod
+    
+    first_payment = (
+        select(Payment.id)
+        .where(Payment.order_id == Order.id)
+        .order_by(Payment.id)
+        .limit(1)
+        .correlate(Order)
+        .scalar_subquery()
+    )
+    payment_status_col = (
+        select(Payment.status).where(Payment.id == first_payment).scalar_subquery()
+    )
+    payment_method_col = (
+        select(PaymentMethod.type)
+        .join(Payment, Payment.payment_method_id == PaymentMethod.id)
+        .where(Payment.id == first_payment)
+        .scalar_subquery()
+    )
+    
+    conditions = _admin_order_conditions(
+        status, date_from, date_to, customer_search, order_number, min_amount, max_amount
+    )
+    if payment_status == "pending":
+        conditions.append(or_(payment_status_col == None, payment_status_col == "pending"))
+    elif payment_status:
+        conditions.append(payment_status_col == payment_status)
+    
+    export_query = select(
+        Order.id.label("order_id"),
+        Order.order_number,
+        Order.user_id,
+        Order.recipient_name.label("customer_name"),
+        Order.phone_number.label("customer_phone"),
+        Order.status,
+        Order.subtotal,
+        Order.shipping_fee,
+        Order.discount_amount,
+        Order.total_amount,
+        func.coalesce(payment_status_col, "pending").label("payment_status"),
+        payment_method_col.label("payment_method"),
+        Order.created_at,
+        Order.updated_at
+    ).order_by(Order.created_at.desc())
+    if conditions:
+        export_query = export_query.where(and_(*conditions))
+    
+    def transform(row: dict) -> dict:
+        row["status"] = OrderStatus.get_name(row["status"])
+        return row
+    
+    return export_response(
+        stream_export(export_query, None, ADMIN_ORDER_EXPORT_COLUMNS, format, transform),
+        format,
+        "orders"
+    )
+
 @router.get("/admin/orders/{order_id}", response_model=AdminOrderRead)
 def get_admin_order_detail(
     order_id: int,
@@ -1060,6 +1144,7 @@ def update_admin_order_status(
     session.add(order)
     session.commit()
     session.refresh(order)
+    shop_metrics.invalidate_orders(session, [order.id])
     
     # TODO: Implement notification to customer if status_update.notify_customer is True
     
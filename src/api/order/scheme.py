@@ -206,7 +206,7 @@ class ShopOrderStats(BaseModel):
 class ShopOrderListResponse(BaseModel):
     """Response cho danh sách đơn hàng của shop"""
     items: List[OrderForShop]
-    stats: ShopOrderStats
+    stats: Optional[ShopOrderStats] = None  # None khi include_stats=false
     total: int
     page: int
     limit: int
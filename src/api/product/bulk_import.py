@@ -0,0 +1,536 @@
+"""
+Import sản phẩm hàng loạt cho seller
+File nguồn là CSV (mỗi dòng một biến thể, các dòng cùng product_ref gộp thành một sản
+phẩm) hoặc JSON (mảng sản phẩm, mỗi sản phẩm có mảng attributes), kèm file zip ảnh tuỳ
+chọn. Job chạy nền theo từng lô IMPORT_BATCH_SIZE sản phẩm:
+  1. validate các dòng (lỗi ghi theo từng dòng, sản phẩm có lỗi bị bỏ qua cả sản phẩm)
+  2. lưu ảnh được tham chiếu từ zip qua image pipeline (api/media/images.py, preset ảnh sản phẩm)
+  3. insert nhiều dòng Product rồi Attribute trong một câu lệnh mỗi bảng, cập nhật tiến độ
+     của job trong cùng transaction
+Listing cache chỉ invalidate một lần khi job kết thúc.
+"""
+
+import asyncio
+import csv
+import json
+import logging
+import math
+import os
+import tempfile
+import zipfile
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set, Tuple
+from decouple import config as decouple_config
+from fastapi import HTTPException, UploadFile
+from sqlalchemy import insert, update
+from sqlmodel import Session
+from api.attribute.model import Attribute
+from api.media.config import UPLOAD_CHUNK_SIZE
+from api.media.images import PRODUCT_IMAGE, StoredImage, process_stored_image, record_images
+from api.media.storage import StoredFile, safe_extension, store_stream
+from api.product.model import Product, ProductImportJob, ImportJobStatus
+
+logger = logging.getLogger(__name__)
+
+# Số sản phẩm mỗi lô (validate + insert + commit)
+IMPORT_BATCH_SIZE = decouple_config("PRODUCT_IMPORT_BATCH_SIZE", default=500, cast=int)
+IMPORT_MAX_FILE_SIZE = 20 * 1024 * 1024
+IMPORT_MAX_ARCHIVE_SIZE = 500 * 1024 * 1024
+IMPORT_MAX_IMAGE_SIZE = 10 * 1024 * 1024
+# Số lỗi tối đa lưu lại cho một job (các lỗi sau vẫn được đếm trong failed_products)
+IMPORT_MAX_ERRORS = 1000
+
+IMPORT_FORMATS = {".csv": "csv", ".json": "json"}
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp", ".gif"}
+# Ảnh đã có URL thì giữ nguyên, không cần có trong zip
+EXTERNAL_IMAGE_PREFIXES = ("http://", "https://", "/static/")
+
+CSV_COLUMNS = (
+    "product_ref", "name", "description", "price", "sub_category_id", "cover",
+    "sku", "color", "size", "variant_price", "quantity", "image",
+)
+_VARIANT_CSV_COLUMNS = {"sku": "sku", "color": "color", "size": "size", "variant_price": "price",
+                        "quantity": "quantity", "image": "image"}
+
+
+class ImportFileError(Exception):
+    """File nguồn không đọc được - cả job thất bại"""
+
+
+@dataclass
+class ImportVariant:
+    row: int
+    field_prefix: str  # "" với CSV, "attributes[i]." với JSON
+    sku: Optional[str]
+    color: Optional[str]
+    size: Optional[str]
+    price: float
+    quantity: int
+    image: Optional[str]
+
+
+@dataclass
+class ImportProduct:
+    row: int
+    name: str
+    description: Optional[str]
+    price: Optional[float]
+    sub_category_id: int
+    cover: Optional[str]
+    variants: List[ImportVariant] = field(default_factory=list)
+
+    def image_refs(self):
+        """(row, field, tên ảnh) của cover và ảnh các biến thể"""
+        if self.cover:
+            yield self.row, "cover", self.cover
+        for variant in self.variants:
+            if variant.image:
+                yield variant.row, f"{variant.field_prefix}image", variant.image
+
+
+def _error(row: int, field_name: str, message: str) -> dict:
+    return {"row": row, "field": field_name, "message": message}
+
+
+# ---------------------------------------------------------------------------
+# Đọc file nguồn -> bản ghi thô {"row", "fields", "variants": [{"row", "prefix", "fields"}]}
+# ---------------------------------------------------------------------------
+
+def parse_source(path: str, source_format: str) -> List[dict]:
+    try:
+        if source_format == "csv":
+            return _parse_csv(path)
+        return _parse_json(path)
+    except (UnicodeDecodeError, csv.Error, json.JSONDecodeError) as e:
+        raise ImportFileError(f"Cannot read {source_format.upper()} file: {e}")
+
+
+def _parse_csv(path: str) -> List[dict]:
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.DictReader(f)
+        if not reader.fieldnames or "name" not in reader.fieldnames:
+            raise ImportFileError(f"CSV header must include: {', '.join(CSV_COLUMNS)}")
+
+        products: Dict[str, dict] = {}
+        for row in reader:
+            line = reader.line_num
+            ref = _clean(row.get("product_ref")) or _clean(row.get("name")) or f"#{line}"
+            product = products.get(ref)
+            if product is None:
+                product = products[ref] = {"row": line, "fields": row, "variants": []}
+            variant = {key: row.get(column) for column, key in _VARIANT_CSV_COLUMNS.items()}
+            # Dòng chỉ có thông tin sản phẩm (không có biến thể)
+            if any(_clean(value) for value in variant.values()):
+                product["variants"].append({"row": line, "prefix": "", "fields": variant})
+        return list(products.values())
+
+
+def _parse_json(path: str) -> List[dict]:
+    with open(path, encoding="utf-8-sig") as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = data.get("products")
+    if not isinstance(data, list):
+        raise ImportFileError('JSON must be an array of products or {"products": [...]}')
+
+    products = []
+    for index, item in enumerate(data, start=1):
+        if not isinstance(item, dict):
+            item = {}
+        attributes = item.get("attributes") or []
+        if not isinstance(attributes, list):
+            attributes = []
+        products.append({
+            "row": index,
+            "fields": item,
+            "variants": [
+                {"row": index, "prefix": f"attributes[{i}].", "fields": attr if isinstance(attr, dict) else {}}
+                for i, attr in enumerate(attributes)
+            ],
+        })
+    return products
+
+
+# ---------------------------------------------------------------------------
+# Validate
+# ---------------------------------------------------------------------------
+
+def _clean(value: Any) -> Optional[str]:
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def _to_int(value: str) -> int:
+    number = float(value)
+    if not number.is_integer():
+        raise ValueError(value)
+    return int(number)
+
+
+def _number(value: Any, cast, row: int, field_name: str, errors: List[dict], required: bool = False):
+    text = _clean(value)
+    if text is None:
+        if required:
+            errors.append(_error(row, field_name, "Required"))
+        return None
+    try:
+        number = cast(text)
+    except ValueError:
+        errors.append(_error(row, field_name, f"Invalid number: {text}"))
+        return None
+    if not math.isfinite(number) or number < 0:
+        errors.append(_error(row, field_name, "Must be a non-negative number"))
+        return None
+    return number
+
+
+def _text(value: Any, row: int, field_name: str, errors: List[dict],
+          required: bool = False, max_length: Optional[int] = 255) -> Optional[str]:
+    text = _clean(value)
+    if text is None and required:
+        errors.append(_error(row, field_name, "Required"))
+    elif text is not None and max_length and len(text) > max_length:
+        errors.append(_error(row, field_name, f"Longer than {max_length} characters"))
+        return None
+    return text
+
+
+def _image(value: Any, row: int, field_name: str, errors: List[dict],
+           archive_members: Optional[Dict[str, zipfile.ZipInfo]]) -> Optional[str]:
+    name = _clean(value)
+    if name is None or name.startswith(EXTERNAL_IMAGE_PREFIXES):
+        return name
+    if safe_extension(name) not in IMAGE_EXTENSIONS:
+        errors.append(_error(row, field_name, f"Unsupported image type: {name}"))
+    elif archive_members is None:
+        errors.append(_error(row, field_name, f"Image {name} requires an image archive"))
+    elif name not in archive_members:
+        errors.append(_error(row, field_name, f"Image {name} not found in archive"))
+    return name
+
+
+def _variant(raw_variant: dict, product_price: Optional[float], errors: List[dict],
+             archive_members: Optional[Dict[str, zipfile.ZipInfo]]) -> ImportVariant:
+    row, prefix, fields = raw_variant["row"], raw_variant["prefix"], raw_variant["fields"]
+    error_count = len(errors)
+    price = _number(fields.get("price"), float, row, f"{prefix}price", errors)
+    if price is None and len(errors) == error_count:
+        # Biến thể không có giá riêng thì dùng giá sản phẩm
+        price = product_price
+        if price is None:
+            errors.append(_error(row, f"{prefix}price", "Required when product has no price"))
+    return ImportVariant(
+        row=row,
+        field_prefix=prefix,
+        sku=_text(fields.get("sku"), row, f"{prefix}sku", errors, max_length=64),
+        color=_text(fields.get("color"), row, f"{prefix}color", errors),
+        size=_text(fields.get("size"), row, f"{prefix}size", errors),
+        price=price,
+        quantity=_number(fields.get("quantity"), _to_int, row, f"{prefix}quantity", errors, required=True),
+        image=_image(fields.get("image"), row, f"{prefix}image", errors, archive_members),
+    )
+
+
+def validate_batch(
+    raw_products: List[dict],
+    sub_categories: Dict[int, dict],
+    archive_members: Optional[Dict[str, zipfile.ZipInfo]],
+) -> Tuple[List[ImportProduct], List[dict], int]:
+    """
+    Validate một lô bản ghi thô.
+    Trả về (sản phẩm hợp lệ, lỗi theo dòng, số sản phẩm bị bỏ qua).
+    """
+    valid: List[ImportProduct] = []
+    errors: List[dict] = []
+    failed = 0
+    for raw in raw_products:
+        row, fields = raw["row"], raw["fields"]
+        product_errors: List[dict] = []
+
+        sub_category_id = _number(fields.get("sub_category_id"), _to_int, row, "sub_category_id",
+                                  product_errors, required=True)
+        if sub_category_id is not None and sub_category_id not in sub_categories:
+            product_errors.append(_error(row, "sub_category_id", f"Sub category {sub_category_id} not found"))
+
+        product = ImportProduct(
+            row=row,
+            name=_text(fields.get("name"), row, "name", product_errors, required=True),
+            description=_text(fields.get("description"), row, "description", product_errors, max_length=None),
+            price=_number(fields.get("price"), float, row, "price", product_errors),
+            sub_category_id=sub_category_id,
+            cover=_image(fields.get("cover"), row, "cover", product_errors, archive_members),
+        )
+        for raw_variant in raw["variants"]:
+            product.variants.append(_variant(raw_variant, product.price, product_errors, archive_members))
+
+        if product_errors:
+            errors.extend(product_errors)
+            failed += 1
+        else:
+            valid.append(product)
+    return valid, errors, failed
+
+
+# ---------------------------------------------------------------------------
+# Ảnh
+# ---------------------------------------------------------------------------
+
+def archive_members(archive: zipfile.ZipFile) -> Dict[str, zipfile.ZipInfo]:
+    """Ảnh trong zip, tra được theo đường dẫn đầy đủ hoặc theo tên file"""
+    members: Dict[str, zipfile.ZipInfo] = {}
+    for info in archive.infolist():
+        if info.is_dir():
+            continue
+        members.setdefault(os.path.basename(info.filename), info)
+        members[info.filename] = info
+    return members
+
+
+def _extract_images(
+    archive: zipfile.ZipFile, members: Dict[str, zipfile.ZipInfo], names: Set[str]
+) -> Dict[str, Optional[StoredFile]]:
+    stored: Dict[str, Optional[StoredFile]] = {}
+    for name in names:
+        info = members[name]
+        try:
+            if info.file_size > IMPORT_MAX_IMAGE_SIZE:
+                raise ValueError(f"larger than {IMPORT_MAX_IMAGE_SIZE // (1024 * 1024)}MB")
+            with archive.open(info) as source:
+                stored[name] = store_stream(
+                    source, PRODUCT_IMAGE.subdir, info.filename, IMPORT_MAX_IMAGE_SIZE, PRODUCT_IMAGE.name
+                )
+        except Exception as e:
+            logger.warning(f"Cannot extract import image {name}: {e}")
+            stored[name] = None
+    return stored
+
+
+async def store_images(
+    archive: zipfile.ZipFile, members: Dict[str, zipfile.ZipInfo], names: Set[str]
+) -> Dict[str, Optional[StoredImage]]:
+    """
+    Giải nén ảnh (tuần tự trong một thread - ZipFile không dùng chung giữa các thread),
+    sau đó tạo các bản thu nhỏ song song trong process pool.
+    Trả về {tên ảnh: StoredImage}, None nếu ảnh lỗi.
+    """
+    stored = await asyncio.to_thread(_extract_images, archive, members, names)
+    valid = {name: item for name, item in stored.items() if item is not None}
+    results = await asyncio.gather(
+        *(process_stored_image(item, PRODUCT_IMAGE) for item in valid.values()), return_exceptions=True
+    )
+
+    images: Dict[str, Optional[StoredImage]] = {name: None for name in stored}
+    for name, result in zip(valid, results):
+        if isinstance(result, StoredImage):
+            images[name] = result
+    return images
+
+
+def _drop_failed_images(
+    products: List[ImportProduct], images: Dict[str, Optional[StoredImage]], errors: List[dict]
+) -> Tuple[List[ImportProduct], int]:
+    kept: List[ImportProduct] = []
+    failed = 0
+    for product in products:
+        image_errors = [
+            _error(row, field_name, f"Image {name} is not a valid image")
+            for row, field_name, name in product.image_refs()
+            if name in images and images[name] is None
+        ]
+        if image_errors:
+            errors.extend(image_errors)
+            failed += 1
+        else:
+            kept.append(product)
+    return kept, failed
+
+
+# ---------------------------------------------------------------------------
+# Ghi database
+# ---------------------------------------------------------------------------
+
+def _update_job(job_id: int, **values):
+    from api.db.session import engine
+
+    with Session(engine) as session:
+        session.execute(update(ProductImportJob).where(ProductImportJob.id == job_id).values(**values))
+        session.commit()
+
+
+def _commit_batch(
+    job_id: int,
+    shop_id: int,
+    products: List[ImportProduct],
+    images: Dict[str, Optional[StoredImage]],
+    progress: dict,
+) -> Tuple[int, int]:
+    """Insert một lô Product + Attribute và cập nhật tiến độ job trong cùng transaction"""
+    from api.db.session import engine
+
+    def url(name: Optional[str]) -> Optional[str]:
+        if not name:
+            return None
+        # Ảnh trong zip -> URL sau pipeline, URL ngoài giữ nguyên
+        return images[name].url if images.get(name) else name
+
+    now = datetime.utcnow()
+    created_attributes = 0
+    with Session(engine) as session:
+        if products:
+            # Multi-row INSERT ... RETURNING, id trả về đúng thứ tự các dòng truyền vào
+            product_ids = session.execute(
+                insert(Product).returning(Product.product_id, sort_by_parameter_order=True),
+                [{
+                    "shop_id": shop_id,
+                    "sub_category_id": product.sub_category_id,
+                    "name": product.name,
+                    "description": product.description,
+                    "price": product.price,
+                    "cover": url(product.cover),
+                    "create_at": now,
+                } for product in products],
+            ).scalars().all()
+
+            attribute_rows = [{
+                "product_id": product_id,
+                "sku": variant.sku,
+                "color": variant.color,
+                "size": variant.size,
+                "price": variant.price,
+                "quantity": variant.quantity,
+                "image": url(variant.image),
+                "create_at": now,
+                "version": 1,
+            } for product_id, product in zip(product_ids, products) for variant in product.variants]
+            if attribute_rows:
+                session.execute(insert(Attribute), attribute_rows)
+            created_attributes = len(attribute_rows)
+            record_images(session, {
+                images[name].content_hash: images[name]
+                for product in products for _, _, name in product.image_refs() if images.get(name)
+            }.values())
+
+        session.execute(update(ProductImportJob).where(ProductImportJob.id == job_id).values(
+            processed_products=progress["processed_products"],
+            created_products=progress["created_products"] + len(products),
+            created_attributes=progress["created_attributes"] + created_attributes,
+            failed_products=progress["failed_products"],
+            errors=progress["errors"][:IMPORT_MAX_ERRORS],
+        ))
+        session.commit()
+    return len(products), created_attributes
+
+
+def _load_sub_categories() -> Dict[int, dict]:
+    from api.db.session import engine
+    from api.category.taxonomy import taxonomy_cache
+
+    with Session(engine) as session:
+        return taxonomy_cache.get(session).sub_categories
+
+
+# ---------------------------------------------------------------------------
+# Upload + job
+# ---------------------------------------------------------------------------
+
+async def spool_upload(file: UploadFile, max_size: int) -> str:
+    """
+    Ghi file upload ra file tạm (ngoài MEDIA_ROOT - file nguồn không public).
+    Raise HTTPException 400 nếu vượt quá max_size.
+    """
+    if file.size and file.size > max_size:
+        raise HTTPException(status_code=400, detail=f"File too large (max {max_size // (1024 * 1024)}MB)")
+    await file.seek(0)
+    return await asyncio.to_thread(_spool, file.file, safe_extension(file.filename), max_size)
+
+
+def _spool(source, suffix: str, max_size: int) -> str:
+    fd, path = tempfile.mkstemp(prefix="product_import_", suffix=suffix)
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while chunk := source.read(UPLOAD_CHUNK_SIZE):
+                size += len(chunk)
+                if size > max_size:
+                    raise HTTPException(
+                        status_code=400,
+                        detail=f"File too large (max {max_size // (1024 * 1024)}MB)"
+                    )
+                out.write(chunk)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path
+
+
+async def run_import_job(
+    job_id: int, shop_id: int, source_path: str, source_format: str, archive_path: Optional[str]
+):
+    """Background task chạy một job import (gọi qua BackgroundTasks sau khi trả response)"""
+    from api.product.cache import invalidate_product_listings
+    from api.db.session import engine
+
+    progress = {"processed_products": 0, "created_products": 0, "created_attributes": 0,
+                "failed_products": 0, "errors": []}
+    placements = set()
+    archive = None
+    try:
+        await asyncio.to_thread(_update_job, job_id, status=ImportJobStatus.RUNNING.value,
+                                started_at=datetime.utcnow())
+        raw_products = await asyncio.to_thread(parse_source, source_path, source_format)
+        members = None
+        if archive_path:
+            try:
+                archive = zipfile.ZipFile(archive_path)
+            except zipfile.BadZipFile:
+                raise ImportFileError("Image archive is not a valid zip file")
+            members = archive_members(archive)
+        sub_categories = await asyncio.to_thread(_load_sub_categories)
+        await asyncio.to_thread(_update_job, job_id, total_products=len(raw_products))
+
+        for start in range(0, len(raw_products), IMPORT_BATCH_SIZE):
+            batch = raw_products[start:start + IMPORT_BATCH_SIZE]
+            products, errors, failed = validate_batch(batch, sub_categories, members)
+
+            image_names = {name for product in products for _, _, name in product.image_refs()
+                           if members is not None and name in members}
+            if image_names:
+                images = await store_images(archive, members, image_names)
+                products, image_failed = _drop_failed_images(products, images, errors)
+                failed += image_failed
+            else:
+                images = {}
+
+            progress["processed_products"] += len(batch)
+            progress["failed_products"] += failed
+            progress["errors"].extend(errors)
+            created, created_attributes = await asyncio.to_thread(
+                _commit_batch, job_id, shop_id, products, images, progress
+            )
+            progress["created_products"] += created
+            progress["created_attributes"] += created_attributes
+            placements.update((shop_id, product.sub_category_id) for product in products)
+
+        await asyncio.to_thread(_update_job, job_id, status=ImportJobStatus.COMPLETED.value,
+                                finished_at=datetime.utcnow())
+    except Exception as e:
+        if isinstance(e, ImportFileError):
+            message = str(e)
+        else:
+            logger.exception(f"Product import job {job_id} failed")
+            message = "Import failed, products created before the error are kept"
+        await asyncio.to_thread(_update_job, job_id, status=ImportJobStatus.FAILED.value,
+                                message=message, finished_at=datetime.utcnow())
+    finally:
+        if archive is not None:
+            archive.close()
+        for path in (source_path, archive_path):
+            if path and os.path.exists(path):
+                os.remove(path)
+
+    if placements:
+        with Session(engine) as session:
+            invalidate_product_listings(session, placements)
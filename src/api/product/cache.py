@@ -0,0 +1,58 @@
+"""
+Tag của response cache cho listing sản phẩm
+Entry được gắn tag theo phạm vi hẹp nhất của filter (shop > sub_category > category);
+listing không giới hạn phạm vi (homepage, trending, featured, search) gắn tag chung.
+Ghi product/attribute/approval thì invalidate tag chung + tag của shop/sub_category/category
+chứa sản phẩm đó, listing của shop/danh mục khác vẫn giữ cache.
+"""
+
+from typing import Iterable, List, Optional, Tuple
+from sqlmodel import Session
+from api.cache.response_cache import product_listing_cache
+from api.category.taxonomy import taxonomy_cache
+
+ALL_PRODUCTS_TAG = "products:all"
+
+
+def shop_tag(shop_id: int) -> str:
+    return f"shop:{shop_id}"
+
+
+def subcat_tag(sub_category_id: int) -> str:
+    return f"subcat:{sub_category_id}"
+
+
+def category_tag(category_id: int) -> str:
+    return f"category:{category_id}"
+
+
+def listing_tags(
+    shop_id: Optional[int] = None,
+    sub_category_id: Optional[int] = None,
+    category_id: Optional[int] = None,
+    **_,
+) -> List[str]:
+    """Tag của một listing theo filter của nó"""
+    if shop_id:
+        return [shop_tag(shop_id)]
+    if sub_category_id:
+        return [subcat_tag(sub_category_id)]
+    if category_id:
+        return [category_tag(category_id)]
+    return [ALL_PRODUCTS_TAG]
+
+
+def invalidate_product_listings(session: Session, placements: Iterable[Tuple[int, int]]):
+    """
+    Invalidate listing chứa sản phẩm ở các vị trí (shop_id, sub_category_id) - truyền cả
+    vị trí cũ và mới khi sản phẩm đổi shop/sub_category. Gọi sau commit.
+    """
+    sub_categories = taxonomy_cache.get(session).sub_categories
+    tags = {ALL_PRODUCTS_TAG}
+    for shop_id, sub_category_id in placements:
+        tags.add(shop_tag(shop_id))
+        tags.add(subcat_tag(sub_category_id))
+        sub = sub_categories.get(sub_category_id)
+        if sub is not None:
+            tags.add(category_tag(sub["category_id"]))
+    product_listing_cache.invalidate_tags(tags)
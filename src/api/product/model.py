@@ -1,6 +1,9 @@
 from sqlmodel import SQLModel, Field, Relationship
+from sqlalchemy import Column, JSON, UniqueConstraint
 from typing import Optional, List, TYPE_CHECKING
 from datetime import datetime
+from enum import Enum
+from api.db.loading import NO_LAZY_COLLECTION
 
 # Forward references to avoid circular imports
 if TYPE_CHECKING:
@@ -32,5 +35,59 @@ class Product(SQLModel, table=True):
         back_populates="approved_products",
         sa_relationship_kwargs={"foreign_keys": "Product.approver_id"}
     )
-    attributes: List["Attribute"] = Relationship(back_populates="product")
+    attributes: List["Attribute"] = Relationship(back_populates="product", sa_relationship_kwargs=NO_LAZY_COLLECTION)
     order_items: List["OrderItem"] = Relationship(back_populates="product")
+
+class ProductTrending(SQLModel, table=True):
+    """
+    Bảng xếp hạng trending tính sẵn bởi background job (api/product/trending.py).
+    Đọc một trang = quét index rank, không tính điểm lúc request.
+    """
+    __tablename__ = "product_trending"
+    # Job đánh số lại rank của mọi dòng trong một transaction - kiểm tra unique lúc commit
+    __table_args__ = (
+        UniqueConstraint("rank", name="product_trending_rank_key", deferrable=True, initially="DEFERRED"),
+    )
+
+    product_id: int = Field(primary_key=True, foreign_key="product.product_id")
+    rank: int  # 1 = trending nhất
+    score: float = Field(default=0.0)
+    activity_score: float = Field(default=0.0)  # Phần điểm từ đơn hàng / giỏ hàng, giảm dần theo thời gian
+    last_activity_at: Optional[datetime] = None  # Hoạt động gần nhất trong cửa sổ tính điểm
+    order_quantity: int = Field(default=0)  # Số lượng bán trong cửa sổ tính điểm
+    cart_adds: int = Field(default=0)  # Số lượt thêm vào giỏ trong cửa sổ tính điểm
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class ImportJobStatus(str, Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+class ProductImportJob(SQLModel, table=True):
+    """
+    Job import sản phẩm hàng loạt (api/product/bulk_import.py).
+    Tiến độ tính theo số sản phẩm trong file; lỗi từng dòng lưu trong errors.
+    """
+    __tablename__ = "product_import_job"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    shop_id: int = Field(foreign_key="shop.id", index=True)
+    user_id: int = Field(foreign_key="users.id")
+    status: str = Field(default=ImportJobStatus.PENDING)
+    source_format: str  # csv / json
+    source_filename: Optional[str] = None
+
+    total_products: int = Field(default=0)
+    processed_products: int = Field(default=0)
+    created_products: int = Field(default=0)
+    created_attributes: int = Field(default=0)
+    failed_products: int = Field(default=0)
+    # [{"row", "field", "message"}] - row là số dòng CSV (header = 1) hoặc vị trí trong mảng JSON (từ 1)
+    errors: List[dict] = Field(default_factory=list, sa_column=Column(JSON, nullable=False))
+    message: Optional[str] = None  # Lỗi làm hỏng cả job (file không đọc được...)
+
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
@@ -0,0 +1,65 @@
+"""
+Read model cho listing sản phẩm
+Listing chỉ chọn các cột hiển thị (select(Product.product_id, Product.name, ...)) và map
+từng dòng vào dataclass slots - không tạo entity Product (identity map, change tracking,
+relationship), ít bộ nhớ và nhanh hơn khi trả về nhiều dòng.
+"""
+
+from dataclasses import dataclass
+from datetime import datetime
+from typing import List, Optional
+from sqlalchemy import Select
+from sqlmodel import Session, select
+from api.product.model import Product
+from api.media.images import image_variants
+
+# Các cột của một dòng listing, đúng thứ tự field của ProductListItem
+PRODUCT_LIST_COLUMNS = (
+    Product.product_id,
+    Product.name,
+    Product.description,
+    Product.price,
+    Product.cover,
+    Product.shop_id,
+    Product.sub_category_id,
+    Product.is_approved,
+    Product.create_at,
+)
+
+
+@dataclass(slots=True, frozen=True)
+class ProductListItem:
+    product_id: int
+    name: str
+    description: Optional[str]
+    price: Optional[float]
+    cover: Optional[str]
+    shop_id: int
+    sub_category_id: int
+    is_approved: Optional[bool]
+    create_at: Optional[datetime]
+
+    def to_dict(self) -> dict:
+        """Dict trả về cho client (create_at dạng ISO như các listing hiện có)"""
+        return {
+            "product_id": self.product_id,
+            "name": self.name,
+            "description": self.description,
+            "price": self.price,
+            "cover": self.cover,
+            "cover_variants": image_variants(self.cover),
+            "shop_id": self.shop_id,
+            "sub_category_id": self.sub_category_id,
+            "is_approved": self.is_approved,
+            "create_at": self.create_at.isoformat() if self.create_at else None,
+        }
+
+
+def select_product_list():
+    """select(...) các cột listing - thêm where/order_by/limit như select(Product)"""
+    return select(*PRODUCT_LIST_COLUMNS)
+
+
+def fetch_product_list(session: Session, query: Select) -> List[ProductListItem]:
+    """Chạy query tạo từ select_product_list() và map từng dòng vào ProductListItem"""
+    return [ProductListItem(*row) for row in session.execute(query)]
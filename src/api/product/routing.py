@@ -1,9 +1,9 @@
 import os
-from fastapi import APIRouter, Depends, HTTPException, Form, UploadFile, File
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Form, UploadFile, File, Query
 from sqlmodel import Session, select
 from typing import List, Annotated, Optional
-from .model import Product
-from .scheme import ProductRead
+from .model import Product, ProductImportJob
+from .scheme import ProductRead, ProductImportJobRead, ProductImportErrorsResponse
 from api.db.pagination import PaginatedResponse
 from api.auth.dependency import get_current_user
 from api.auth.permission import require_seller_or_approver, ensure_resource_access, require_admin_or_approver
@@ -11,8 +11,17 @@ from api.auth.auth import get_session
 from api.shop.model import Shop
 from api.user.model import User
 from api.attribute.model import Attribute
+from api.category.taxonomy import taxonomy_cache
+from api.cache.http import cache_control, PRODUCT_MAX_AGE
+from api.cache.response_cache import cached_response, product_listing_cache
+from api.product.cache import listing_tags, invalidate_product_listings
+from api.product.trending import get_trending_page
+from api.product.read_model import select_product_list, fetch_product_list
+from api.media.images import save_image, image_variants, PRODUCT_IMAGE
+from api.product.bulk_import import (
+    IMPORT_FORMATS, IMPORT_MAX_FILE_SIZE, IMPORT_MAX_ARCHIVE_SIZE, spool_upload, run_import_job
+)
 from pydantic import BaseModel
-import uuid
 
 
 router = APIRouter()
@@ -22,7 +31,8 @@ class ProductApprovalRequest(BaseModel):
     approval_note: str = None
 
 # 📄 Read all with pagination and filtering
-@router.get("/", response_model=dict)
+@router.get("/", response_model=dict, dependencies=[Depends(cache_control(PRODUCT_MAX_AGE))])
+@cached_response(product_listing_cache, "products", listing_tags, case_insensitive=("search",))
 def get_products(
     page: int = 1,
     limit: int = 10,
@@ -43,7 +53,7 @@ def get_products(
     from sqlmodel import or_, and_, func
     
     # Tạo base query
-    query = select(Product)
+    query = select_product_list()
     
     # Apply filters
     filters = []
@@ -62,11 +72,8 @@ def get_products(
     if sub_category_id:
         filters.append(Product.sub_category_id == sub_category_id)
     elif category_id:
-        # Nếu có category_id, filter theo tất cả sub_category thuộc category đó
-        from api.sub_category.model import SubCategory
-        sub_categories = session.exec(
-            select(SubCategory.id).where(SubCategory.category_id == category_id)
-        ).all()
+        # Nếu có category_id, filter theo tất cả sub_category thuộc category đó (từ taxonomy cache)
+        sub_categories = taxonomy_cache.get_sub_category_ids(session, category_id)
         if sub_categories:
             filters.append(Product.sub_category_id.in_(sub_categories))
     
@@ -110,7 +117,7 @@ def get_products(
     query = query.offset(offset).limit(limit)
     
     # Execute query
-    products = session.exec(query).all()
+    products = fetch_product_list(session, query)
     
     # Calculate pagination metadata
     total_pages = (total + limit - 1) // limit
@@ -118,19 +125,7 @@ def get_products(
     has_prev = page > 1
     
     # Convert products to dict to avoid model serialization issues
-    items = []
-    for product in products:
-        items.append({
-            "product_id": product.product_id,
-            "name": product.name,
-            "description": product.description,
-            "price": product.price,
-            "cover": product.cover,
-            "shop_id": product.shop_id,
-            "sub_category_id": product.sub_category_id,
-            "is_approved": product.is_approved,
-            "create_at": product.create_at.isoformat() if product.create_at else None
-        })
+    items = [product.to_dict() for product in products]
     
     return {
         "items": items,
@@ -149,37 +144,44 @@ def get_pending_products(
     session: Session = Depends(get_session),
 ):
     """Lấy danh sách product chưa được approve (dành cho admin và approver)"""
-    products = session.exec(
-        select(Product).where(Product.is_approved == None)
-    ).all()
-    return products
+    # ProductRead chỉ cần các cột listing - không load entity
+    products = fetch_product_list(
+        session, select_product_list().where(Product.is_approved == None)
+    )
+    return [product.to_dict() for product in products]
 
 # 📈 Get trending products (must be before /{product_id})
-@router.get("/trending", response_model=dict)
+@router.get("/trending", response_model=dict, dependencies=[Depends(cache_control(PRODUCT_MAX_AGE))])
+@cached_response(product_listing_cache, "trending", listing_tags)
 def get_trending_products(
     page: int = 1,
     limit: int = 10,
     session: Session = Depends(get_session)
 ):
     """
-    Lấy sản phẩm trending (dựa trên ngày tạo gần đây)
+    Lấy sản phẩm trending theo bảng xếp hạng tính sẵn (lượt bán, thêm giỏ, theo dõi shop
+    có giảm dần theo thời gian). Chưa có bảng xếp hạng thì lấy sản phẩm mới nhất.
     """
     from sqlmodel import func
     
-    # Count total trending products
-    count_query = select(func.count(Product.product_id)).where(Product.is_approved == True)
-    total = session.exec(count_query).one()
-    
-    # Query products by latest created
-    query = (
-        select(Product)
-        .where(Product.is_approved == True)
-        .order_by(Product.create_at.desc())
-        .offset((page - 1) * limit)
-        .limit(limit)
-    )
-    
-    products = session.exec(query).all()
+    offset = (page - 1) * limit
+    products, total = get_trending_page(session, offset, limit)
+    
+    if not total:
+        # Count total trending products
+        count_query = select(func.count(Product.product_id)).where(Product.is_approved == True)
+        total = session.exec(count_query).one()
+        
+        # Query products by latest created
+        query = (
+            select_product_list()
+            .where(Product.is_approved == True)
+            .order_by(Product.create_at.desc())
+            .offset(offset)
+            .limit(limit)
+        )
+        
+        products = fetch_product_list(session, query)
     
     # Calculate pagination metadata
     total_pages = (total + limit - 1) // limit
@@ -187,18 +189,7 @@ def get_trending_products(
     has_prev = page > 1
     
     # Convert to dict
-    items = []
-    for product in products:
-        items.append({
-            "product_id": product.product_id,
-            "name": product.name,
-            "description": product.description,
-            "price": product.price,
-            "cover": product.cover,
-            "shop_id": product.shop_id,
-            "sub_category_id": product.sub_category_id,
-            "create_at": product.create_at.isoformat() if product.create_at else None
-        })
+    items = [product.to_dict() for product in products]
     
     return {
         "items": items,
@@ -211,34 +202,27 @@ def get_trending_products(
     }
 
 # ⭐ Get featured products (must be before /{product_id})
-@router.get("/featured", response_model=dict)
+@router.get("/featured", response_model=dict, dependencies=[Depends(cache_control(PRODUCT_MAX_AGE))])
+@cached_response(product_listing_cache, "featured", listing_tags)
 def get_featured_products(
     limit: int = 8,
     session: Session = Depends(get_session)
 ):
     """
-    Lấy sản phẩm nổi bật cho homepage mobile
+    Lấy sản phẩm nổi bật cho homepage mobile: top trending, thiếu thì bổ sung sản phẩm mới nhất
     """
-    products = session.exec(
-        select(Product)
-        .where(Product.is_approved == True)
-        .order_by(Product.create_at.desc())
-        .limit(limit)
-    ).all()
+    products, _ = get_trending_page(session, 0, limit)
+    
+    if len(products) < limit:
+        query = select_product_list().where(Product.is_approved == True)
+        if products:
+            query = query.where(Product.product_id.not_in([p.product_id for p in products]))
+        products += fetch_product_list(
+            session, query.order_by(Product.create_at.desc()).limit(limit - len(products))
+        )
     
     # Convert to dict
-    items = []
-    for product in products:
-        items.append({
-            "product_id": product.product_id,
-            "name": product.name,
-            "description": product.description,
-            "price": product.price,
-            "cover": product.cover,
-            "shop_id": product.shop_id,
-            "sub_category_id": product.sub_category_id,
-            "create_at": product.create_at.isoformat() if product.create_at else None
-        })
+    items = [product.to_dict() for product in products]
     
     return {
         "items": items,
@@ -461,6 +445,7 @@ def get_products_by_status(
             "description": product.description,
             "price": product.price,
             "cover": product.cover,
+            "cover_variants": image_variants(product.cover),
             "shop_id": product.shop_id,
             "sub_category_id": product.sub_category_id,
             "is_approved": product.is_approved,
@@ -545,6 +530,7 @@ def get_product_stock_detail(
             "price": attr.price,
             "quantity": attr.quantity,
             "image": attr.image,
+            "image_variants": image_variants(attr.image),
             "create_at": attr.create_at.isoformat() if attr.create_at else None
         })
 
@@ -554,6 +540,7 @@ def get_product_stock_detail(
         "description": product.description,
         "price": product.price,
         "cover": product.cover,
+        "cover_variants": image_variants(product.cover),
         "shop_id": product.shop_id,
         "sub_category_id": product.sub_category_id,
         "is_approved": product.is_approved,
@@ -571,7 +558,7 @@ def get_product_stock_detail(
     }
 
 # 🔍 Read by ID
-@router.get("/{product_id}", response_model=ProductRead)
+@router.get("/{product_id}", response_model=ProductRead, dependencies=[Depends(cache_control(PRODUCT_MAX_AGE))])
 def get_product(product_id: int, session: Session = Depends(get_session)):
     product = session.get(Product, product_id)
     if not product:
@@ -597,15 +584,7 @@ async def create_product(
     # Xử lý ảnh
     image_path = None
     if cover:
-        ext = os.path.splitext(cover.filename)[1]
-        filename = f"product_{uuid.uuid4().hex}{ext}"
-        save_path = f"static/products/{filename}"
-
-        os.makedirs(os.path.dirname(save_path), exist_ok=True)
-        with open(save_path, "wb") as f:
-            f.write(await cover.read())
-
-        image_path = f"/static/products/{filename}"
+        image_path = (await save_image(cover, PRODUCT_IMAGE, session)).url
 
     # Tạo product
     product = Product(
@@ -619,6 +598,7 @@ async def create_product(
     session.add(product)
     session.commit()
     session.refresh(product)
+    invalidate_product_listings(session, [(product.shop_id, product.sub_category_id)])
     return product
 
 @router.put("/{product_id}", response_model=ProductRead)
@@ -643,6 +623,7 @@ async def update_product(
     
     # Kiểm tra user có quyền sửa product này không (owner hoặc approver)
     ensure_resource_access(current_user, shop.user_id, "product")
+    old_placement = (product.shop_id, product.sub_category_id)
 
     # Cập nhật các trường
     if name is not None:
@@ -656,19 +637,12 @@ async def update_product(
 
     # Cập nhật ảnh nếu có
     if cover:
-        ext = os.path.splitext(cover.filename)[1]
-        filename = f"product_{uuid.uuid4().hex}{ext}"
-        save_path = f"static/products/{filename}"
-
-        os.makedirs(os.path.dirname(save_path), exist_ok=True)
-        with open(save_path, "wb") as f:
-            f.write(await cover.read())
-
-        product.cover = f"/static/products/{filename}"
+        product.cover = (await save_image(cover, PRODUCT_IMAGE, session)).url
 
     session.add(product)
     session.commit()
     session.refresh(product)
+    invalidate_product_listings(session, [old_placement, (product.shop_id, product.sub_category_id)])
     return product
 
 @router.patch("/{product_id}/approve", response_model=ProductRead)
@@ -691,9 +665,96 @@ def approve_product(
     session.add(product)
     session.commit()
     session.refresh(product)
+    invalidate_product_listings(session, [(product.shop_id, product.sub_category_id)])
     return product
 
-@router.get("/shop/{shop_id}", response_model=dict)
+# 📥 Bulk import
+
+def _import_job_read(job: ProductImportJob) -> ProductImportJobRead:
+    return ProductImportJobRead(
+        **job.model_dump(exclude={"errors", "user_id"}),
+        error_count=len(job.errors),
+    )
+
+def _get_import_job(session: Session, job_id: int, current_user: User) -> ProductImportJob:
+    job = session.get(ProductImportJob, job_id)
+    if not job:
+        raise HTTPException(404, detail="Import job not found")
+    ensure_resource_access(current_user, job.user_id, "import job")
+    return job
+
+@router.post("/imports", response_model=ProductImportJobRead, status_code=202)
+async def create_product_import(
+    background_tasks: BackgroundTasks,
+    current_user: Annotated[User, Depends(require_seller_or_approver)],
+    session: Session = Depends(get_session),
+    file: UploadFile = File(..., description="CSV hoặc JSON danh sách sản phẩm"),
+    images: UploadFile = File(None, description="File zip chứa ảnh được tham chiếu trong file"),
+):
+    """
+    Import sản phẩm + biến thể hàng loạt cho shop của user.
+    Trả về job ngay (202), file được xử lý nền; theo dõi qua GET /imports/{job_id}.
+    """
+    shop = session.exec(select(Shop).where(Shop.user_id == current_user.id)).first()
+    if not shop:
+        raise HTTPException(404, detail="No shop found")
+
+    source_format = IMPORT_FORMATS.get(os.path.splitext(file.filename or "")[1].lower())
+    if not source_format:
+        raise HTTPException(400, detail="Import file must be .csv or .json")
+    if images and os.path.splitext(images.filename or "")[1].lower() != ".zip":
+        raise HTTPException(400, detail="Image archive must be a .zip file")
+
+    source_path = await spool_upload(file, IMPORT_MAX_FILE_SIZE)
+    archive_path = None
+    try:
+        if images:
+            archive_path = await spool_upload(images, IMPORT_MAX_ARCHIVE_SIZE)
+    except BaseException:
+        os.remove(source_path)
+        raise
+
+    job = ProductImportJob(
+        shop_id=shop.id,
+        user_id=current_user.id,
+        source_format=source_format,
+        source_filename=file.filename,
+    )
+    session.add(job)
+    session.commit()
+    session.refresh(job)
+
+    background_tasks.add_task(run_import_job, job.id, shop.id, source_path, source_format, archive_path)
+    return _import_job_read(job)
+
+@router.get("/imports/{job_id}", response_model=ProductImportJobRead)
+def get_product_import(
+    job_id: int,
+    current_user: Annotated[User, Depends(get_current_user)],
+    session: Session = Depends(get_session),
+):
+    """Trạng thái và tiến độ của job import"""
+    return _import_job_read(_get_import_job(session, job_id, current_user))
+
+@router.get("/imports/{job_id}/errors", response_model=ProductImportErrorsResponse)
+def get_product_import_errors(
+    job_id: int,
+    current_user: Annotated[User, Depends(get_current_user)],
+    session: Session = Depends(get_session),
+    offset: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+):
+    """Lỗi theo từng dòng của job import (dòng CSV tính cả header, vị trí JSON tính từ 1)"""
+    job = _get_import_job(session, job_id, current_user)
+    return ProductImportErrorsResponse(
+        job_id=job.id,
+        items=job.errors[offset:offset + limit],
+        total=len(job.errors),
+        offset=offset,
+        limit=limit,
+    )
+
+@router.get("/shop/{shop_id}", response_model=dict, dependencies=[Depends(cache_control(PRODUCT_MAX_AGE))])
 def get_products_by_shop(
     shop_id: int, 
     page: int = 1,
@@ -714,7 +775,7 @@ def get_products_by_shop(
         raise HTTPException(status_code=404, detail="Shop not found")
 
     # Tạo base query
-    query = select(Product).where(Product.shop_id == shop_id)
+    query = select_product_list().where(Product.shop_id == shop_id)
     
     # Apply filters
     filters = [Product.shop_id == shop_id]
@@ -761,7 +822,7 @@ def get_products_by_shop(
     query = query.offset(offset).limit(limit)
     
     # Execute query
-    products = session.exec(query).all()
+    products = fetch_product_list(session, query)
     
     # Calculate pagination metadata
     total_pages = (total + limit - 1) // limit
@@ -769,19 +830,7 @@ def get_products_by_shop(
     has_prev = page > 1
     
     # Convert products to dict to match getproduct format
-    items = []
-    for product in products:
-        items.append({
-            "product_id": product.product_id,
-            "name": product.name,
-            "description": product.description,
-            "price": product.price,
-            "cover": product.cover,
-            "shop_id": product.shop_id,
-            "sub_category_id": product.sub_category_id,
-            "is_approved": product.is_approved,
-            "create_at": product.create_at.isoformat() if product.create_at else None
-        })
+    items = [product.to_dict() for product in products]
     
     return {
         "items": items,
@@ -795,7 +844,8 @@ def get_products_by_shop(
 
 
 
-@router.get("/categories/{category_id}/products", response_model=dict)
+@router.get("/categories/{category_id}/products", response_model=dict, dependencies=[Depends(cache_control(PRODUCT_MAX_AGE))])
+@cached_response(product_listing_cache, "category_products", listing_tags)
 def get_products_by_category(
     category_id: int,
     page: int = 1,
@@ -807,13 +857,10 @@ def get_products_by_category(
     """
     Lấy sản phẩm theo category với phân trang (optimized cho mobile)
     """
-    from api.sub_category.model import SubCategory
     from sqlmodel import and_, func
     
-    # Get all subcategories in this category
-    sub_categories = session.exec(
-        select(SubCategory.id).where(SubCategory.category_id == category_id)
-    ).all()
+    # Get all subcategories in this category (từ taxonomy cache)
+    sub_categories = taxonomy_cache.get_sub_category_ids(session, category_id)
     
     if not sub_categories:
         raise HTTPException(status_code=404, detail="Category not found or has no products")
@@ -828,7 +875,7 @@ def get_products_by_category(
     total = session.exec(count_query).one()
     
     # Query products in these subcategories
-    query = select(Product).where(
+    query = select_product_list().where(
         and_(
             Product.sub_category_id.in_(sub_categories),
             Product.is_approved == True
@@ -854,7 +901,7 @@ def get_products_by_category(
     
     # Apply pagination
     query = query.offset((page - 1) * limit).limit(limit)
-    products = session.exec(query).all()
+    products = fetch_product_list(session, query)
     
     # Calculate pagination metadata
     total_pages = (total + limit - 1) // limit
@@ -862,18 +909,7 @@ def get_products_by_category(
     has_prev = page > 1
     
     # Convert to dict
-    items = []
-    for product in products:
-        items.append({
-            "product_id": product.product_id,
-            "name": product.name,
-            "description": product.description,
-            "price": product.price,
-            "cover": product.cover,
-            "shop_id": product.shop_id,
-            "sub_category_id": product.sub_category_id,
-            "create_at": product.create_at.isoformat() if product.create_at else None
-        })
+    items = [product.to_dict() for product in products]
     
     return {
         "items": items,
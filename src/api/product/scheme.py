@@ -1,7 +1,8 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, computed_field
 from typing import Optional, List
 from datetime import datetime
 from fastapi import Form
+from api.media.images import image_variants
 
 class ProductBase(BaseModel):
     shop_id: int
@@ -29,6 +30,12 @@ class ProductRead(ProductBase):
     approved_by: Optional[int] = None
     create_at: datetime
 
+    @computed_field
+    @property
+    def cover_variants(self) -> Optional[List[dict]]:
+        """Các bản WebP/JPEG theo chiều rộng của cover"""
+        return image_variants(self.cover)
+
     class Config:
         from_attributes = True
 
@@ -96,3 +103,37 @@ class ProductDetailWithStock(ProductWithStock):
     total_stock: int
     lowest_price: Optional[float] = None
     highest_price: Optional[float] = None
+
+# 📥 Bulk import
+
+class ImportRowError(BaseModel):
+    """Lỗi của một dòng trong file import"""
+    row: int
+    field: str
+    message: str
+
+class ProductImportJobRead(BaseModel):
+    """Trạng thái / tiến độ của job import"""
+    id: int
+    shop_id: int
+    status: str  # pending, running, completed, failed
+    source_format: str
+    source_filename: Optional[str] = None
+    total_products: int
+    processed_products: int
+    created_products: int
+    created_attributes: int
+    failed_products: int
+    error_count: int
+    message: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+class ProductImportErrorsResponse(BaseModel):
+    """Báo cáo lỗi theo dòng của job import (phân trang)"""
+    job_id: int
+    items: List[ImportRowError]
+    total: int
+    offset: int
+    limit: int
@@ -0,0 +1,222 @@
+"""
+Trending engine
+Điểm trending của sản phẩm = số lượng bán + số lượng thêm vào giỏ, mỗi sự kiện giảm dần
+theo thời gian (half-life), cộng thêm một phần theo số người theo dõi shop.
+Background job cập nhật bảng product_trending theo từng lượt, request chỉ đọc một trang
+theo rank. Mỗi lượt chỉ tính lại chính xác các sản phẩm có đơn hàng mới / đổi trạng thái
+hoặc lượt thêm giỏ từ lượt trước; điểm hoạt động của các sản phẩm còn lại chỉ được nhân
+hệ số giảm dần (cùng kết quả vì decay là hàm mũ), sản phẩm không còn hoạt động trong
+cửa sổ tính điểm bị bỏ khỏi bảng. Bảng rỗng (lần đầu) = dựng lại toàn bộ.
+"""
+
+import asyncio
+import logging
+import math
+from datetime import datetime, timedelta
+from typing import List, Tuple
+from decouple import config as decouple_config
+from sqlalchemy import text
+from sqlmodel import Session
+from api.product.model import Product, ProductTrending
+from api.product.read_model import ProductListItem, select_product_list, fetch_product_list
+
+logger = logging.getLogger(__name__)
+
+TRENDING_REFRESH_SECONDS = decouple_config("TRENDING_REFRESH_SECONDS", default=600, cast=int)
+# Chỉ xét hoạt động trong cửa sổ này
+TRENDING_WINDOW = timedelta(days=14)
+# Sau mỗi half-life, một sự kiện chỉ còn một nửa trọng số
+TRENDING_HALF_LIFE = timedelta(hours=48)
+# Quét lùi thêm so với lượt trước: đơn / giỏ có timestamp trước lượt trước nhưng commit sau
+# vẫn được tính (tính lại một sản phẩm nhiều lần không sai kết quả)
+TRENDING_CHANGE_OVERLAP = timedelta(minutes=5)
+
+ORDER_WEIGHT = 1.0
+CART_WEIGHT = 0.3
+FOLLOW_WEIGHT = 0.5
+
+_REFRESH_LOCK_KEY = 420042
+
+# Sản phẩm có hoạt động mới từ :changed_since (orders.updated_at đổi khi tạo đơn và đổi trạng thái)
+_TOUCHED_QUERY = text("""
+    SELECT oi.product_id
+    FROM orders o
+    JOIN order_items oi ON oi.order_id = o.id
+    WHERE o.updated_at >= :changed_since
+    UNION
+    SELECT a.product_id
+    FROM cartitem ci
+    JOIN attribute a ON a.attribute_id = ci.attribute_id
+    WHERE ci.added_at >= :changed_since
+""")
+
+# Tính lại chính xác điểm hoạt động trong cửa sổ của các sản phẩm :touched
+_UPSERT_TOUCHED_QUERY = text("""
+    WITH order_activity AS (
+        SELECT oi.product_id,
+               SUM(oi.quantity * EXP(-EXTRACT(EPOCH FROM (:now - o.created_at)) / :decay_seconds)) AS score,
+               SUM(oi.quantity) AS quantity,
+               MAX(o.created_at) AS last_at
+        FROM order_items oi
+        JOIN orders o ON o.id = oi.order_id
+        WHERE oi.product_id = ANY(:touched)
+        AND o.created_at >= :since AND o.status <> ALL(:excluded_statuses)
+        GROUP BY oi.product_id
+    ),
+    cart_activity AS (
+        SELECT a.product_id,
+               SUM(ci.quantity * EXP(-EXTRACT(EPOCH FROM (:now - ci.added_at)) / :decay_seconds)) AS score,
+               COUNT(*) AS adds,
+               MAX(ci.added_at) AS last_at
+        FROM cartitem ci
+        JOIN attribute a ON a.attribute_id = ci.attribute_id
+        WHERE a.product_id = ANY(:touched) AND ci.added_at >= :since
+        GROUP BY a.product_id
+    ),
+    scored AS (
+        SELECT p.product_id,
+               COALESCE(oa.score, 0) * :order_weight + COALESCE(ca.score, 0) * :cart_weight AS activity_score,
+               COALESCE(oa.quantity, 0) AS order_quantity,
+               COALESCE(ca.adds, 0) AS cart_adds,
+               GREATEST(oa.last_at, ca.last_at) AS last_activity_at
+        FROM product p
+        LEFT JOIN order_activity oa ON oa.product_id = p.product_id
+        LEFT JOIN cart_activity ca ON ca.product_id = p.product_id
+        WHERE p.product_id = ANY(:touched) AND p.is_approved = TRUE
+        AND (oa.product_id IS NOT NULL OR ca.product_id IS NOT NULL)
+    )
+    INSERT INTO product_trending
+        (product_id, rank, score, activity_score, order_quantity, cart_adds, last_activity_at, updated_at)
+    SELECT product_id, 0, activity_score, activity_score, order_quantity, cart_adds, last_activity_at, :now
+    FROM scored
+    ON CONFLICT (product_id) DO UPDATE SET
+        activity_score = EXCLUDED.activity_score,
+        order_quantity = EXCLUDED.order_quantity,
+        cart_adds = EXCLUDED.cart_adds,
+        last_activity_at = EXCLUDED.last_activity_at,
+        updated_at = EXCLUDED.updated_at
+""")
+
+# Sản phẩm vừa tính lại nhưng không còn hoạt động hợp lệ (đơn bị huỷ, bị gỡ duyệt...)
+_DELETE_INACTIVE_TOUCHED_QUERY = text("""
+    DELETE FROM product_trending WHERE product_id = ANY(:touched) AND updated_at < :now
+""")
+
+# Không còn hoạt động trong cửa sổ hoặc sản phẩm bị gỡ duyệt
+_DELETE_STALE_QUERY = text("""
+    DELETE FROM product_trending t
+    USING product p
+    WHERE p.product_id = t.product_id
+    AND (t.last_activity_at < :since OR p.is_approved = FALSE)
+""")
+
+# Các sản phẩm không có hoạt động mới: điểm cũ nhân hệ số decay theo thời gian đã trôi qua
+_DECAY_QUERY = text("""
+    UPDATE product_trending
+    SET activity_score = activity_score * EXP(-EXTRACT(EPOCH FROM (:now - updated_at)) / :decay_seconds),
+        updated_at = :now
+    WHERE updated_at < :now
+""")
+
+# Cộng điểm theo follower hiện tại của shop và đánh số lại rank (unique rank kiểm tra lúc commit)
+_RERANK_QUERY = text("""
+    UPDATE product_trending t
+    SET score = r.score, rank = r.rank
+    FROM (
+        SELECT scored.product_id, scored.score,
+               ROW_NUMBER() OVER (ORDER BY scored.score DESC, scored.product_id DESC) AS rank
+        FROM (
+            SELECT t.product_id, t.activity_score + LN(1 + s.followers_count) * :follow_weight AS score
+            FROM product_trending t
+            JOIN product p ON p.product_id = t.product_id
+            JOIN shop s ON s.id = p.shop_id
+        ) scored
+    ) r
+    WHERE r.product_id = t.product_id
+""")
+
+
+def refresh_trending(session: Session) -> int:
+    """Cập nhật bảng xếp hạng trong một transaction, trả về số sản phẩm được xếp hạng"""
+    from api.order.model import OrderStatus
+
+    # Nhiều worker cùng chạy job - chỉ một worker cập nhật trong mỗi lượt
+    locked = session.execute(
+        text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": _REFRESH_LOCK_KEY}
+    ).scalar()
+    if not locked:
+        session.rollback()
+        return 0
+
+    now = datetime.utcnow()
+    since = now - TRENDING_WINDOW
+    decay_seconds = TRENDING_HALF_LIFE.total_seconds() / math.log(2)
+
+    last_run = session.execute(text("SELECT MAX(updated_at) FROM product_trending")).scalar()
+    changed_since = max(last_run - TRENDING_CHANGE_OVERLAP, since) if last_run else since
+    touched = list(session.execute(_TOUCHED_QUERY, {"changed_since": changed_since}).scalars())
+
+    if touched:
+        session.execute(_UPSERT_TOUCHED_QUERY, {
+            "touched": touched,
+            "now": now,
+            "since": since,
+            "decay_seconds": decay_seconds,
+            # Đơn huỷ / hoàn tiền / trả hàng không tính là lượt bán
+            "excluded_statuses": [OrderStatus.CANCELLED, OrderStatus.REFUNDED, OrderStatus.RETURNED],
+            "order_weight": ORDER_WEIGHT,
+            "cart_weight": CART_WEIGHT,
+        })
+        session.execute(_DELETE_INACTIVE_TOUCHED_QUERY, {"touched": touched, "now": now})
+
+    session.execute(_DELETE_STALE_QUERY, {"since": since})
+    session.execute(_DECAY_QUERY, {"now": now, "decay_seconds": decay_seconds})
+    ranked = session.execute(_RERANK_QUERY, {"follow_weight": FOLLOW_WEIGHT}).rowcount
+    session.commit()
+    return ranked
+
+
+def get_trending_page(session: Session, offset: int, limit: int) -> Tuple[List[ProductListItem], int]:
+    """
+    Một trang bảng xếp hạng (đọc theo index rank) và tổng số sản phẩm được xếp hạng.
+    Tổng = 0 khi chưa có bảng xếp hạng (chưa chạy job hoặc chưa có hoạt động).
+    """
+    total = session.execute(text("SELECT COALESCE(MAX(rank), 0) FROM product_trending")).scalar()
+    if not total:
+        return [], 0
+    query = (
+        select_product_list()
+        .join(ProductTrending, ProductTrending.product_id == Product.product_id)
+        .where(ProductTrending.rank > offset, Product.is_approved == True)
+        .order_by(ProductTrending.rank)
+        .limit(limit)
+    )
+    return fetch_product_list(session, query), total
+
+
+def _refresh_once():
+    from api.db.session import engine
+    from api.cache.response_cache import product_listing_cache
+    from api.product.cache import ALL_PRODUCTS_TAG
+
+    with Session(engine) as session:
+        ranked = refresh_trending(session)
+    # Trending / featured nằm trong listing không giới hạn phạm vi
+    product_listing_cache.invalidate_tags([ALL_PRODUCTS_TAG])
+    return ranked
+
+
+async def refresh_trending_periodically():
+    """Background task tính lại trending mỗi TRENDING_REFRESH_SECONDS"""
+    while True:
+        try:
+            ranked = await asyncio.to_thread(_refresh_once)
+            logger.info(f"Trending ranking refreshed: {ranked} products")
+        except Exception as e:
+            logger.error(f"Error during trending refresh: {e}")
+
+        await asyncio.sleep(TRENDING_REFRESH_SECONDS)
+
+
+def start_trending_refresh():
+    asyncio.create_task(refresh_trending_periodically())
@@ -0,0 +1,155 @@
+"""
+Shop metrics service
+Tính toàn bộ thống kê đơn hàng của shop trong một lần quét, cache snapshot theo
+shop và xoá cache khi trạng thái đơn hàng thay đổi
+"""
+
+import threading
+import time
+from typing import Dict, Iterable, List, Tuple
+from datetime import datetime, timedelta
+from sqlalchemy import bindparam, text
+from sqlmodel import Session
+from api.order.scheme import ShopOrderStats
+
+# Thời gian sống tối đa của snapshot (giây) - giới hạn độ trễ của orders_today/week/month
+SHOP_METRICS_TTL_SECONDS = 60
+
+# order_shops có đúng một dòng cho mỗi đơn của shop (kèm subtotal phần hàng của shop),
+# nên mọi bộ đếm được tính bằng FILTER trên một lần quét index (shop_id, created_at)
+_SHOP_METRICS_QUERY = text("""
+    WITH shop_orders AS (
+        SELECT o.status, os.created_at, os.subtotal AS shop_total
+        FROM order_shops os
+        JOIN orders o ON o.id = os.order_id
+        WHERE os.shop_id = :shop_id
+    )
+    SELECT
+        COUNT(*) AS total_orders,
+        COUNT(*) FILTER (WHERE status = 1) AS pending_orders,
+        COUNT(*) FILTER (WHERE status = 2) AS confirmed_orders,
+        COUNT(*) FILTER (WHERE status = 3) AS processing_orders,
+        COUNT(*) FILTER (WHERE status = 4) AS shipped_orders,
+        COUNT(*) FILTER (WHERE status = 5) AS delivered_orders,
+        COUNT(*) FILTER (WHERE status = 6) AS cancelled_orders,
+        COUNT(*) FILTER (WHERE status = 7) AS refunded_orders,
+        COUNT(*) FILTER (WHERE status = 8) AS returned_orders,
+        COALESCE(SUM(shop_total) FILTER (WHERE status = 5), 0) AS total_revenue,
+        COALESCE(SUM(shop_total) FILTER (WHERE status IN (1, 2, 3, 4)), 0) AS pending_revenue,
+        COUNT(*) FILTER (WHERE created_at >= :today_start) AS orders_today,
+        COUNT(*) FILTER (WHERE created_at >= :week_start) AS orders_this_week,
+        COUNT(*) FILTER (WHERE created_at >= :month_start) AS orders_this_month
+    FROM shop_orders
+""")
+
+_PENDING_RATINGS_QUERY = text("""
+    SELECT COUNT(*)
+    FROM shop_ratings sr
+    WHERE sr.shop_id = :shop_id
+    AND NOT EXISTS (
+        SELECT 1 FROM shop_rating_responses r WHERE r.rating_id = sr.id
+    )
+""")
+
+_ORDER_SHOPS_QUERY = text("""
+    SELECT DISTINCT shop_id
+    FROM order_shops
+    WHERE order_id IN :order_ids
+""").bindparams(bindparam("order_ids", expanding=True))
+
+
+def compute_shop_metrics(session: Session, shop_id: int) -> ShopOrderStats:
+    """Tính thống kê đơn hàng của shop bằng một query"""
+    now = datetime.utcnow()
+    today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    week_start = today_start - timedelta(days=today_start.weekday())
+    month_start = today_start.replace(day=1)
+
+    row = session.execute(_SHOP_METRICS_QUERY, {
+        "shop_id": shop_id,
+        "today_start": today_start,
+        "week_start": week_start,
+        "month_start": month_start
+    }).fetchone()
+
+    return ShopOrderStats(
+        total_orders=row.total_orders or 0,
+        pending_orders=row.pending_orders or 0,
+        confirmed_orders=row.confirmed_orders or 0,
+        processing_orders=row.processing_orders or 0,
+        shipped_orders=row.shipped_orders or 0,
+        delivered_orders=row.delivered_orders or 0,
+        cancelled_orders=row.cancelled_orders or 0,
+        refunded_orders=row.refunded_orders or 0,
+        returned_orders=row.returned_orders or 0,
+        total_revenue=float(row.total_revenue or 0),
+        pending_revenue=float(row.pending_revenue or 0),
+        orders_today=row.orders_today or 0,
+        orders_this_week=row.orders_this_week or 0,
+        orders_this_month=row.orders_this_month or 0,
+        pending_ratings=_count_pending_ratings(session, shop_id)
+    )
+
+
+def _count_pending_ratings(session: Session, shop_id: int) -> int:
+    # Bảng shop_rating_responses chưa có trong mọi môi trường - kiểm tra trước để
+    # không làm hỏng transaction hiện tại
+    has_responses = session.execute(
+        text("SELECT to_regclass('shop_rating_responses') IS NOT NULL")
+    ).scalar()
+    if not has_responses:
+        return 0
+    return session.execute(_PENDING_RATINGS_QUERY, {"shop_id": shop_id}).scalar() or 0
+
+
+def get_order_shop_ids(session: Session, order_ids: Iterable[int]) -> List[int]:
+    """Các shop có sản phẩm trong những đơn hàng này"""
+    order_ids = tuple(order_ids)
+    if not order_ids:
+        return []
+    rows = session.execute(_ORDER_SHOPS_QUERY, {"order_ids": list(order_ids)}).fetchall()
+    return [row[0] for row in rows]
+
+
+class ShopMetricsCache:
+    """
+    Cache snapshot thống kê theo shop (in-process).
+    Snapshot bị xoá khi đơn hàng của shop đổi trạng thái, và hết hạn sau TTL.
+    """
+    def __init__(self, ttl_seconds: float = SHOP_METRICS_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        # {shop_id: (monotonic time tính xong, snapshot)}
+        self._snapshots: Dict[int, Tuple[float, ShopOrderStats]] = {}
+        # {shop_id: số lần invalidate} - tránh lưu snapshot tính trước khi bị invalidate
+        self._versions: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, session: Session, shop_id: int) -> ShopOrderStats:
+        """Lấy snapshot từ cache, tính lại nếu chưa có hoặc đã hết hạn"""
+        now = time.monotonic()
+        with self._lock:
+            cached = self._snapshots.get(shop_id)
+            version = self._versions.get(shop_id, 0)
+        if cached and now - cached[0] < self.ttl_seconds:
+            return cached[1]
+
+        snapshot = compute_shop_metrics(session, shop_id)
+        with self._lock:
+            if self._versions.get(shop_id, 0) == version:
+                self._snapshots[shop_id] = (now, snapshot)
+        return snapshot
+
+    def invalidate(self, shop_ids: Iterable[int]):
+        """Xoá snapshot của các shop"""
+        with self._lock:
+            for shop_id in shop_ids:
+                self._snapshots.pop(shop_id, None)
+                self._versions[shop_id] = self._versions.get(shop_id, 0) + 1
+
+    def invalidate_orders(self, session: Session, order_ids: Iterable[int]):
+        """Xoá snapshot của mọi shop có hàng trong các đơn hàng này"""
+        self.invalidate(get_order_shop_ids(session, order_ids))
+
+
+# Singleton instance
+shop_metrics = ShopMetricsCache()
@@ -16,6 +16,8 @@ class Shop(SQLModel, table=True):
     is_active: Optional[bool] = None
     is_online: Optional[bool] = None
     create_at: datetime = Field(default_factory=datetime.utcnow)
+    # Số người theo dõi, cập nhật cùng transaction với follow/unfollow shop
+    followers_count: int = Field(default=0)
 
     # Relationships using TYPE_CHECKING
     user: Optional["User"] = Relationship(back_populates="shop")
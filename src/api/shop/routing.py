@@ -1,22 +1,43 @@
-import os
 from fastapi import APIRouter, Depends, HTTPException, Form, UploadFile, File
-from typing import List, Annotated
-from sqlmodel import Session, select
+from typing import List, Annotated, Optional
+from sqlmodel import Session, select, and_
 from datetime import datetime
 from api.auth.auth import get_session
 from api.auth.dependency import get_current_user
 from api.auth.permission import require_seller
-from api.user.model import User
+from api.user.model import User, RatingSummary, RatingTargetType
 from api.shop.model import Shop
 from api.shop.scheme import ShopRead, AddressRead
 from api.address.model import Address
+from api.cache.http import cache_control, SHOP_MAX_AGE
+from api.media.images import save_image, SHOP_AVATAR
 
 
 router = APIRouter()
 
 
+def _shops_with_ratings_query():
+    """select(Shop, RatingSummary) - rating summary được join theo primary key"""
+    return select(Shop, RatingSummary).join(
+        RatingSummary,
+        and_(
+            RatingSummary.target_type == RatingTargetType.shop.value,
+            RatingSummary.target_id == Shop.id
+        ),
+        isouter=True
+    )
+
+
+def _to_shop_read(shop: Shop, summary: Optional[RatingSummary] = None) -> ShopRead:
+    return ShopRead(
+        **shop.model_dump(),
+        rating_count=summary.rating_count if summary else 0,
+        average_rating=summary.average_rating if summary else 0.0
+    )
+
+
 # Tạo shop mới cho user hiện tại (chỉ seller)
-@router.post("", response_model=Shop)
+@router.post("", response_model=ShopRead)
 async def create_shop(
     current_user: Annotated[User, Depends(require_seller)],
     session: Session = Depends(get_session),
@@ -35,15 +56,7 @@ async def create_shop(
         raise HTTPException(status_code=400, detail="You already own a shop.")
 
     # --- Lưu ảnh avatar ---
-    file_ext = os.path.splitext(avatar.filename)[1]
-    filename = f"shop_{current_user.id}_{int(datetime.utcnow().timestamp())}{file_ext}"
-    save_path = f"static/shop_avatars/{filename}"
-
-    os.makedirs(os.path.dirname(save_path), exist_ok=True)
-    with open(save_path, "wb") as f:
-        f.write(await avatar.read())
-
-    avatar_url = f"/static/shop_avatars/{filename}"
+    avatar_url = (await save_image(avatar, SHOP_AVATAR, session)).url
 
     # --- Tạo shop ---
     shop = Shop(
@@ -58,7 +71,8 @@ async def create_shop(
     session.add(shop)
     session.commit()
     session.refresh(shop)
-    return shop
+    # Shop mới chưa có đánh giá
+    return _to_shop_read(shop)
 
 
 
@@ -68,16 +82,16 @@ def get_my_shop(
     current_user: Annotated[User, Depends(get_current_user)],
     session: Session = Depends(get_session),
 ):
-    shop = session.exec(
-        select(Shop).where(Shop.user_id == current_user.id)
+    row = session.exec(
+        _shops_with_ratings_query().where(Shop.user_id == current_user.id)
     ).first()
-    if not shop:
+    if not row:
         raise HTTPException(status_code=404, detail="Shop not found.")
-    return shop
+    return _to_shop_read(*row)
 
 
 # Cập nhật thông tin shop
-@router.put("/me", response_model=Shop)
+@router.put("/me", response_model=ShopRead)
 async def update_my_shop(
     current_user: Annotated[User, Depends(get_current_user)],
     session: Session = Depends(get_session),
@@ -96,15 +110,7 @@ async def update_my_shop(
 
     # Nếu có ảnh mới thì ghi đè
     if avatar:
-        file_ext = os.path.splitext(avatar.filename)[1]
-        filename = f"shop_{current_user.id}_{int(datetime.utcnow().timestamp())}{file_ext}"
-        save_path = f"static/shop_avatars/{filename}"
-
-        os.makedirs(os.path.dirname(save_path), exist_ok=True)
-        with open(save_path, "wb") as f:
-            f.write(await avatar.read())
-
-        shop.avatar = f"/static/shop_avatars/{filename}"
+        shop.avatar = (await save_image(avatar, SHOP_AVATAR, session)).url
 
     # Cập nhật các thông tin khác
     shop.name = name
@@ -116,27 +122,28 @@ async def update_my_shop(
     session.commit()
     session.refresh(shop)
 
-    return shop
+    summary = session.get(RatingSummary, (RatingTargetType.shop.value, shop.id))
+    return _to_shop_read(shop, summary)
 
 # Lấy shop theo ID
-@router.get("/{shop_id}", response_model=ShopRead)
+@router.get("/{shop_id}", response_model=ShopRead, dependencies=[Depends(cache_control(SHOP_MAX_AGE))])
 def get_shop_by_id(
     shop_id: int,
     session: Session = Depends(get_session),
 ):
-    shop = session.exec(select(Shop).where(Shop.id == shop_id)).first()
-    if not shop:
+    row = session.exec(_shops_with_ratings_query().where(Shop.id == shop_id)).first()
+    if not row:
         raise HTTPException(status_code=404, detail="Shop not found.")
-    return shop
+    return _to_shop_read(*row)
 
 
 # Tuỳ chọn: Admin lấy toàn bộ danh sách shop
-@router.get("", response_model=List[ShopRead])
+@router.get("", response_model=List[ShopRead], dependencies=[Depends(cache_control(SHOP_MAX_AGE))])
 def list_shops(
     session: Session = Depends(get_session),
 ):
-    shops = session.exec(select(Shop)).all()
-    return shops
+    rows = session.exec(_shops_with_ratings_query()).all()
+    return [_to_shop_read(shop, summary) for shop, summary in rows]
 
 
 @router.get("/{shop_id}/addresses", response_model=List[AddressRead])
@@ -168,11 +175,8 @@ def get_shop_order_stats(
     - Số lượng đơn hàng đã hủy (status: 6=cancelled)
     - Số lượng phản hồi đánh giá
     """
-    from sqlmodel import func, and_, or_
-    from api.order.model import Order, OrderItem
-    from api.user.model import ShopRating
-    from api.product.model import Product
-    
+    from api.shop.metrics import shop_metrics
+
     # Lấy shop của user hiện tại
     shop = session.exec(
         select(Shop).where(Shop.user_id == current_user.id)
@@ -180,78 +184,20 @@ def get_shop_order_stats(
     if not shop:
         raise HTTPException(status_code=404, detail="Shop not found")
 
-    # 1. Số lượng đơn hàng chờ lấy hàng (confirmed, processing)
-    from sqlalchemy import String
-    pending_pickup_count = session.exec(
-        select(func.count(func.distinct(Order.id)))
-        .join(OrderItem, Order.id == OrderItem.order_id)
-        .join(Product, OrderItem.product_id == Product.product_id)
-        .where(
-            and_(
-                Product.shop_id == shop.id,
-                or_(
-                    Order.status == 2,  # confirmed
-                    Order.status == 3   # processing
-                )
-            )
-        )
-    ).one()
-
-    # 2. Số lượng đơn hàng đã hủy (cancelled)
-    cancelled_orders_count = session.exec(
-        select(func.count(func.distinct(Order.id)))
-        .join(OrderItem, Order.id == OrderItem.order_id)
-        .join(Product, OrderItem.product_id == Product.product_id)
-        .where(
-            and_(
-                Product.shop_id == shop.id,
-                Order.status == 6  # cancelled
-            )
-        )
-    ).one()
-
-    # 3. Số lượng phản hồi đánh giá
-    ratings_count = session.exec(
-        select(func.count(ShopRating.id))
-        .where(ShopRating.shop_id == shop.id)
-    ).one()
-
-    # 4. Thống kê bổ sung
-    # Tổng số đơn hàng
-    total_orders_count = session.exec(
-        select(func.count(func.distinct(Order.id)))
-        .join(OrderItem, Order.id == OrderItem.order_id)
-        .join(Product, OrderItem.product_id == Product.product_id)
-        .where(Product.shop_id == shop.id)
-    ).one()
-
-    # Đơn hàng đã giao thành công
-    delivered_orders_count = session.exec(
-        select(func.count(func.distinct(Order.id)))
-        .join(OrderItem, Order.id == OrderItem.order_id)
-        .join(Product, OrderItem.product_id == Product.product_id)
-        .where(
-            and_(
-                Product.shop_id == shop.id,
-                Order.status == 5  # delivered
-            )
-        )
-    ).one()
-
-    # Điểm đánh giá trung bình
-    avg_rating = session.exec(
-        select(func.avg(ShopRating.rating))
-        .where(ShopRating.shop_id == shop.id)
-    ).one() or 0.0
+    # Toàn bộ bộ đếm đơn hàng từ snapshot của shop metrics service
+    metrics = shop_metrics.get(session, shop.id)
+
+    # Số lượng phản hồi đánh giá + điểm trung bình (một lần lookup rating summary)
+    rating_summary = session.get(RatingSummary, (RatingTargetType.shop.value, shop.id))
 
     return {
         "shop_id": shop.id,
         "shop_name": shop.name,
-        "pending_pickup": pending_pickup_count,
-        "cancelled_orders": cancelled_orders_count,
-        "ratings_count": ratings_count,
-        "total_orders": total_orders_count,
-        "delivered_orders": delivered_orders_count,
-        "average_rating": round(float(avg_rating), 2) if avg_rating else 0.0,
+        "pending_pickup": metrics.confirmed_orders + metrics.processing_orders,
+        "cancelled_orders": metrics.cancelled_orders,
+        "ratings_count": rating_summary.rating_count if rating_summary else 0,
+        "total_orders": metrics.total_orders,
+        "delivered_orders": metrics.delivered_orders,
+        "average_rating": rating_summary.average_rating if rating_summary else 0.0,
         "stats_generated_at": datetime.utcnow().isoformat()
     }
\ No newline at end of file
@@ -1,6 +1,8 @@
+from pydantic import computed_field
 from sqlmodel import SQLModel
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
+from api.media.images import image_variants
 
 class ShopCreate(SQLModel):
     avatar: Optional[str] = None
@@ -25,6 +27,16 @@ class ShopRead(SQLModel):
     is_active: Optional[bool]
     is_online: Optional[bool]
     create_at: datetime
+    followers_count: int = 0
+    # Lấy từ rating_summaries
+    rating_count: int = 0
+    average_rating: float = 0.0
+
+    @computed_field
+    @property
+    def avatar_variants(self) -> Optional[List[dict]]:
+        """Các bản WebP/JPEG theo chiều rộng của avatar"""
+        return image_variants(self.avatar)
 
     class Config:
         from_attributes = True
@@ -5,6 +5,8 @@ from typing import List
 from api.sub_category.model import SubCategory
 from api.sub_category.scheme import SubCategoryCreate, SubCategoryUpdate, SubCategoryRead
 from api.auth.auth import get_session
+from api.category.taxonomy import taxonomy_cache
+from api.cache.http import cache_control, CATEGORY_MAX_AGE
 
 router = APIRouter()
 
@@ -14,13 +16,14 @@ def create_sub_category(payload: SubCategoryCreate, session: Session = Depends(g
     session.add(sub)
     session.commit()
     session.refresh(sub)
+    taxonomy_cache.invalidate()
     return sub
 
-@router.get("", response_model=List[SubCategoryRead])
+@router.get("", response_model=List[SubCategoryRead], dependencies=[Depends(cache_control(CATEGORY_MAX_AGE))])
 def list_sub_categories(session: Session = Depends(get_session)):
-    return session.exec(select(SubCategory)).all()
+    return list(taxonomy_cache.get(session).sub_categories.values())
 
-@router.get("/{sub_category_id}", response_model=SubCategoryRead)
+@router.get("/{sub_category_id}", response_model=SubCategoryRead, dependencies=[Depends(cache_control(CATEGORY_MAX_AGE))])
 def get_sub_category(sub_category_id: int, session: Session = Depends(get_session)):
     sub = session.get(SubCategory, sub_category_id)
     if not sub:
@@ -36,6 +39,7 @@ def update_sub_category(sub_category_id: int, payload: SubCategoryUpdate, sessio
         setattr(sub, key, value)
     session.commit()
     session.refresh(sub)
+    taxonomy_cache.invalidate()
     return sub
 
 @router.delete("/{sub_category_id}")
@@ -45,5 +49,6 @@ def delete_sub_category(sub_category_id: int, session: Session = Depends(get_ses
         raise HTTPException(status_code=404, detail="SubCategory not found")
     session.delete(sub)
     session.commit()
+    taxonomy_cache.invalidate()
     return {"detail": "SubCategory deleted"}
 
@@ -1,10 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
-from typing import Annotated, Optional
-from sqlmodel import Session, select
+from typing import Annotated, List, Optional
+from datetime import datetime
+from sqlmodel import Session, select, or_
 from api.db.session import get_session
 from api.user.model import User, UserRole, RoleChangeRequest
 from api.auth.permission import require_admin, require_admin_or_approver
 from api.auth.token_blacklist import token_blacklist, cleanup_blacklist
+from api.user.analytics import count_users, user_time_series
+from api.cache.response_cache import product_listing_cache
 from pydantic import BaseModel
 
 router = APIRouter()
@@ -19,7 +22,41 @@ class AdminRoleChangeRequest(BaseModel):
     user_id: int
     new_role: UserRole
 
-@router.get("/users", response_model=list[User])
+class AdminUserListItem(BaseModel):
+    """Thông tin user cho danh sách admin - không có password hash / token"""
+    id: int
+    username: Optional[str] = None
+    email: str
+    phone_number: Optional[str] = None
+    first_name: Optional[str] = None
+    last_name: Optional[str] = None
+    avatar: Optional[str] = None
+    role: UserRole
+    is_active: bool
+    is_verified: bool
+    created_at: datetime
+    last_login: Optional[datetime] = None
+
+class AdminUserDirectoryResponse(BaseModel):
+    items: List[AdminUserListItem]
+    next_cursor: Optional[int] = None  # Truyền vào `cursor` để lấy trang tiếp theo
+    has_more: bool
+
+# Các cột được load cho danh sách user (projection, không load hash/token)
+_USER_LIST_COLUMNS = (
+    User.id, User.username, User.email, User.phone_number,
+    User.first_name, User.last_name, User.avatar, User.role,
+    User.is_active, User.is_verified, User.created_at, User.last_login,
+)
+USER_SEARCH_MIN_LENGTH = 2
+
+def _user_list_item(row) -> AdminUserListItem:
+    return AdminUserListItem(**row._mapping)
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+@router.get("/users", response_model=list[AdminUserListItem])
 def get_all_users(
     admin_user: Annotated[User, Depends(require_admin_or_approver)],
     session: Annotated[Session, Depends(get_session)],
@@ -29,7 +66,7 @@ def get_all_users(
     is_active: Optional[bool] = Query(None)
 ):
     """Lấy danh sách tất cả user (chỉ admin và approver)"""
-    query = select(User)
+    query = select(*_USER_LIST_COLUMNS)
     
     # Filter theo role nếu có
     if role:
@@ -40,10 +77,58 @@ def get_all_users(
         query = query.where(User.is_active == is_active)
     
     # Phân trang
-    query = query.offset(skip).limit(limit)
+    query = query.order_by(User.id).offset(skip).limit(limit)
+    
+    return [_user_list_item(row) for row in session.exec(query).all()]
+
+@router.get("/users/directory", response_model=AdminUserDirectoryResponse)
+def get_user_directory(
+    admin_user: Annotated[User, Depends(require_admin_or_approver)],
+    session: Annotated[Session, Depends(get_session)],
+    q: Optional[str] = Query(None, description="Tìm theo username, email hoặc số điện thoại"),
+    role: Optional[UserRole] = Query(None),
+    is_active: Optional[bool] = Query(None),
+    cursor: Optional[int] = Query(None, description="next_cursor của trang trước"),
+    limit: int = Query(50, ge=1, le=100)
+):
+    """
+    Danh bạ user cho admin: tìm kiếm + phân trang keyset (user mới nhất trước).
+    Tìm kiếm dùng index trigram, filter role/active dùng index (role, is_active, id).
+    """
+    query = select(*_USER_LIST_COLUMNS)
+    
+    if role:
+        query = query.where(User.role == role)
+    if is_active is not None:
+        query = query.where(User.is_active == is_active)
     
-    users = session.exec(query).all()
-    return users
+    if q:
+        term = q.strip()
+        if len(term) < USER_SEARCH_MIN_LENGTH:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Search term must be at least {USER_SEARCH_MIN_LENGTH} characters"
+            )
+        pattern = f"%{_escape_like(term)}%"
+        query = query.where(or_(
+            User.username.ilike(pattern, escape="\\"),
+            User.email.ilike(pattern, escape="\\"),
+            User.phone_number.ilike(pattern, escape="\\")
+        ))
+    
+    # Keyset: không dùng OFFSET nên trang sâu vẫn nhanh như trang đầu
+    if cursor is not None:
+        query = query.where(User.id < cursor)
+    
+    rows = session.exec(query.order_by(User.id.desc()).limit(limit + 1)).all()
+    has_more = len(rows) > limit
+    items = [_user_list_item(row) for row in rows[:limit]]
+    
+    return AdminUserDirectoryResponse(
+        items=items,
+        next_cursor=items[-1].id if has_more else None,
+        has_more=has_more
+    )
 
 @router.get("/users/{user_id}", response_model=User)
 def get_user_by_id(
@@ -171,27 +256,23 @@ def get_user_statistics(
     session: Annotated[Session, Depends(get_session)]
 ):
     """Thống kê số lượng user theo role"""
-    stats = {}
-    
-    for role in UserRole:
-        count = session.exec(
-            select(User).where(User.role == role)
-        ).all()
-        stats[role.value] = len(count)
-    
-    # Thống kê user active/inactive
-    active_users = session.exec(
-        select(User).where(User.is_active == True)
-    ).all()
-    inactive_users = session.exec(
-        select(User).where(User.is_active == False)
-    ).all()
-    
-    stats["active_users"] = len(active_users)
-    stats["inactive_users"] = len(inactive_users)
-    stats["total_users"] = len(active_users) + len(inactive_users)
-    
-    return stats
+    return count_users(session)
+
+@router.get("/stats/users/analytics")
+def get_user_analytics(
+    admin_user: Annotated[User, Depends(require_admin_or_approver)],
+    session: Annotated[Session, Depends(get_session)],
+    days: int = Query(30, ge=1, le=365, description="Số ngày gần nhất"),
+    bucket: str = Query("day", pattern="^(day|week)$", description="Gom nhóm theo day hoặc week")
+):
+    """Thống kê user kèm số đăng ký mới và số user đăng nhập theo thời gian"""
+    return {
+        "counts": count_users(session),
+        "signups": user_time_series(session, "signups", days, bucket),
+        "logins": user_time_series(session, "logins", days, bucket),
+        "days": days,
+        "bucket": bucket
+    }
 
 @router.get("/stats/tokens")
 def get_token_statistics(
@@ -203,6 +284,15 @@ def get_token_statistics(
         "message": "Token blacklist statistics"
     }
 
+@router.get("/stats/cache")
+def get_cache_statistics(
+    admin_user: Annotated[User, Depends(require_admin)],
+):
+    """Thống kê hit/miss của response cache listing sản phẩm"""
+    return {
+        "product_listings": product_listing_cache.stats()
+    }
+
 @router.post("/cleanup/tokens")
 def cleanup_token_blacklist(
     admin_user: Annotated[User, Depends(require_admin)],
@@ -0,0 +1,82 @@
+"""
+Thống kê user cho admin dashboard
+Mọi số liệu được đếm bằng aggregate trong database, không load dòng User nào,
+nên bộ nhớ không tăng theo số lượng user.
+"""
+
+from typing import Dict, List
+from datetime import datetime, timedelta
+from sqlalchemy import text
+from sqlmodel import Session, select, func
+from api.user.model import User, UserRole
+
+# Đơn vị gom nhóm cho time series -> bước thời gian
+TIME_BUCKETS = {
+    "day": timedelta(days=1),
+    "week": timedelta(weeks=1),
+}
+
+# Cột thời gian được phép dùng cho time series (tên cột đi vào SQL)
+_TIME_SERIES_COLUMNS = {
+    "signups": "created_at",
+    "logins": "last_login",
+}
+
+
+def count_users(session: Session) -> Dict[str, int]:
+    """Số user theo role và theo trạng thái active bằng một query GROUP BY role, is_active"""
+    rows = session.exec(
+        select(User.role, User.is_active, func.count(User.id))
+        .group_by(User.role, User.is_active)
+    ).all()
+
+    stats = {role.value: 0 for role in UserRole}
+    stats["active_users"] = 0
+    stats["inactive_users"] = 0
+
+    for role, is_active, count in rows:
+        role_name = role.value if isinstance(role, UserRole) else str(role)
+        stats[role_name] = stats.get(role_name, 0) + count
+        if is_active:
+            stats["active_users"] += count
+        else:
+            stats["inactive_users"] += count
+
+    stats["total_users"] = stats["active_users"] + stats["inactive_users"]
+    return stats
+
+
+def _bucket_start(value: datetime, bucket: str) -> datetime:
+    value = value.replace(hour=0, minute=0, second=0, microsecond=0)
+    if bucket == "week":
+        value -= timedelta(days=value.weekday())
+    return value
+
+
+def user_time_series(session: Session, series: str, days: int, bucket: str = "day") -> List[dict]:
+    """
+    Đếm user theo từng mốc thời gian trong `days` ngày gần nhất.
+    series="signups" đếm theo created_at, series="logins" đếm theo lần đăng nhập gần nhất.
+    Các mốc không có dữ liệu vẫn được trả về với count=0.
+    """
+    column = _TIME_SERIES_COLUMNS[series]
+    step = TIME_BUCKETS[bucket]
+
+    end = datetime.utcnow()
+    start = _bucket_start(end - timedelta(days=days - 1), bucket)
+
+    # Quét range trên index của cột thời gian, gom nhóm trong database
+    rows = session.execute(text(f"""
+        SELECT date_trunc(:bucket, {column}) AS bucket, COUNT(*) AS count
+        FROM users
+        WHERE {column} >= :start
+        GROUP BY 1
+    """), {"bucket": bucket, "start": start}).fetchall()
+    counts = {row.bucket: row.count for row in rows}
+
+    points = []
+    current = start
+    while current <= end:
+        points.append({"bucket": current, "count": counts.get(current, 0)})
+        current += step
+    return points
@@ -1,8 +1,9 @@
 from enum import Enum
 from sqlmodel import Relationship, SQLModel, Field
-from typing import Optional, List, TYPE_CHECKING
+from sqlalchemy import Index
+from typing import Optional, List, Dict, TYPE_CHECKING
 from datetime import datetime, timezone
-from pydantic import BaseModel
+from pydantic import BaseModel, computed_field
 
 # Forward references to avoid circular imports
 if TYPE_CHECKING:
@@ -24,6 +25,11 @@ class UserRole(str, Enum):
 
 class User(SQLModel, table=True):
     __tablename__ = "users"
+    # Filter role/active + keyset theo id của danh sách user admin.
+    # Index trigram cho tìm kiếm username/email/phone nằm trong migration (cần pg_trgm).
+    __table_args__ = (
+        Index("ix_users_role_is_active_id", "role", "is_active", "id"),
+    )
     
     id: int = Field(default=None, primary_key=True)
     avatar: Optional[str] = None
@@ -38,9 +44,9 @@ class User(SQLModel, table=True):
     is_active: bool = Field(default=True)  # Required field
     is_online: bool = Field(default=False)  # Required field
     is_verified: bool = Field(default=False)  # Required field
-    last_login: Optional[datetime] = None  # Add missing field
+    last_login: Optional[datetime] = Field(default=None, index=True)  # Cập nhật mỗi lần đăng nhập
     role: UserRole = Field(default=UserRole.buyer)
-    created_at: datetime = Field(default_factory=datetime.utcnow)  # Required field
+    created_at: datetime = Field(default_factory=datetime.utcnow, index=True)  # Required field
     updated_at: datetime = Field(default_factory=datetime.utcnow)  # Required field
     failed_login_attempts: int = Field(default=0)  # Required field
     locked_until: Optional[datetime] = None  # Add missing field
@@ -49,6 +55,10 @@ class User(SQLModel, table=True):
     email_verified_at: Optional[datetime] = None  # Add missing field
     password_reset_token: Optional[str] = None  # Add missing field
     password_reset_expires: Optional[datetime] = None  # Add missing field
+    # Bộ đếm follow, cập nhật cùng transaction với follow/unfollow
+    followers_count: int = Field(default=0)
+    following_count: int = Field(default=0)
+    shop_following_count: int = Field(default=0)
     
     # Re-enable all relationships
     addresses: List["Address"] = Relationship(back_populates="user")
@@ -107,6 +117,13 @@ class UserUpdateResponse(BaseModel):
     phone_number: Optional[str]
     birth_date: Optional[datetime]
 
+    @computed_field
+    @property
+    def avatar_variants(self) -> Optional[List[dict]]:
+        """Các bản WebP/JPEG theo chiều rộng của avatar"""
+        from api.media.images import image_variants
+        return image_variants(self.avatar)
+
     class Config:
         from_attributes = True
 
@@ -193,6 +210,29 @@ class ShopRating(SQLModel, table=True):
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
+class RatingTargetType(str, Enum):
+    user = "user"
+    shop = "shop"
+
+class RatingSummary(SQLModel, table=True):
+    """Tổng hợp rating theo (target_type, target_id), cập nhật cùng transaction với rating"""
+    __tablename__ = "rating_summaries"
+    
+    target_type: str = Field(primary_key=True, max_length=10)  # RatingTargetType
+    target_id: int = Field(primary_key=True)  # users.id hoặc shop.id
+    rating_count: int = Field(default=0)
+    rating_sum: int = Field(default=0)
+    star_1: int = Field(default=0)
+    star_2: int = Field(default=0)
+    star_3: int = Field(default=0)
+    star_4: int = Field(default=0)
+    star_5: int = Field(default=0)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    
+    @property
+    def average_rating(self) -> float:
+        return round(self.rating_sum / self.rating_count, 2) if self.rating_count else 0.0
+
 # =========================
 # PYDANTIC SCHEMAS
 # =========================
@@ -273,6 +313,11 @@ class FollowStatsResponse(BaseModel):
     shop_following_count: int
     my_shop_followers_count: int  # Số người follow shop của mình
 
+class FollowStatusResponse(BaseModel):
+    """Trạng thái follow của user hiện tại với nhiều user/shop"""
+    users: Dict[int, bool] = {}  # {user_id: đang follow?}
+    shops: Dict[int, bool] = {}  # {shop_id: đang follow?}
+
 class RatingStatsResponse(BaseModel):
     """Thống kê rating của user/shop"""
     total_ratings: int
@@ -19,6 +19,7 @@ async def user_profile(current_user: Annotated[User, Depends(get_current_user)])
             "first_name": current_user.first_name,
             "last_name": current_user.last_name,
             "avatar": current_user.avatar,
+            "avatar_variants": image_variants(current_user.avatar),
             "phone_number": current_user.phone_number,
             "birth_date": current_user.birth_date.isoformat() if current_user.birth_date else None,
             "bio": current_user.bio,
@@ -35,7 +36,7 @@ from fastapi import APIRouter, Depends, File, Form, UploadFile, HTTPException
 from sqlmodel import Session, select
 from typing import Annotated
 from datetime import datetime
-import os
+from api.media.images import save_image, image_variants, USER_AVATAR
 
 @router.put("/me", response_model=UserUpdateResponse)
 async def update_info(
@@ -64,15 +65,7 @@ async def update_info(
 
     # --- Xử lý ảnh đại diện ---
     if avatar:
-        file_ext = os.path.splitext(avatar.filename)[1]
-        filename = f"{user.id}_avatar{file_ext}"
-        save_path = f"static/avatars/{filename}"
-
-        os.makedirs(os.path.dirname(save_path), exist_ok=True)
-        with open(save_path, "wb") as f:
-            f.write(await avatar.read())
-
-        user.avatar = f"/static/avatars/{filename}"
+        user.avatar = (await save_image(avatar, USER_AVATAR, session)).url
 
     # --- Cập nhật các trường còn lại nếu có ---
     if first_name is not None:
@@ -137,6 +130,7 @@ def change_user_role(
             "first_name": user.first_name,
             "last_name": user.last_name,
             "avatar": user.avatar,
+            "avatar_variants": image_variants(user.avatar),
             "phone_number": user.phone_number,
             "birth_date": user.birth_date.isoformat() if user.birth_date else None,
             "bio": user.bio,
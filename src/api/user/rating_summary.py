@@ -0,0 +1,78 @@
+"""
+Rating summary được duy trì tăng dần
+Mỗi lần tạo/sửa rating chỉ cộng delta vào bảng rating_summaries trong cùng
+transaction, nên đọc thống kê chỉ là một lần lookup theo primary key
+"""
+
+from typing import Optional
+from datetime import datetime
+from sqlalchemy.dialects.postgresql import insert
+from sqlmodel import Session
+from api.user.model import RatingSummary, RatingTargetType, RatingStatsResponse
+
+_STAR_COLUMNS = {i: f"star_{i}" for i in range(1, 6)}
+
+
+def apply_rating_change(
+    session: Session,
+    target_type: RatingTargetType,
+    target_id: int,
+    old_rating: Optional[int],
+    new_rating: int,
+):
+    """
+    Cộng delta của một rating vào summary (một câu upsert, không commit).
+    old_rating=None khi tạo rating mới, ngược lại là điểm cũ khi sửa rating.
+    """
+    deltas = {name: 0 for name in _STAR_COLUMNS.values()}
+    deltas[_STAR_COLUMNS[new_rating]] += 1
+    if old_rating is None:
+        count_delta, sum_delta = 1, new_rating
+    else:
+        deltas[_STAR_COLUMNS[old_rating]] -= 1
+        count_delta, sum_delta = 0, new_rating - old_rating
+
+    if count_delta == 0 and sum_delta == 0:
+        return
+
+    now = datetime.utcnow()
+    stmt = insert(RatingSummary).values(
+        target_type=target_type.value,
+        target_id=target_id,
+        rating_count=count_delta,
+        rating_sum=sum_delta,
+        updated_at=now,
+        **deltas,
+    )
+    table = RatingSummary.__table__
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.target_type, table.c.target_id],
+        set_={
+            "rating_count": table.c.rating_count + stmt.excluded.rating_count,
+            "rating_sum": table.c.rating_sum + stmt.excluded.rating_sum,
+            **{name: table.c[name] + stmt.excluded[name] for name in _STAR_COLUMNS.values()},
+            "updated_at": stmt.excluded.updated_at,
+        },
+    )
+    session.execute(stmt)
+
+
+def get_rating_stats(session: Session, target_type: RatingTargetType, target_id: int) -> RatingStatsResponse:
+    """Thống kê rating bằng một lần lookup theo primary key"""
+    summary = session.get(RatingSummary, (target_type.value, target_id))
+    return to_rating_stats(summary)
+
+
+def to_rating_stats(summary: Optional[RatingSummary]) -> RatingStatsResponse:
+    """Chuyển RatingSummary (có thể None) thành RatingStatsResponse"""
+    if summary is None:
+        return RatingStatsResponse(
+            total_ratings=0,
+            average_rating=0.0,
+            rating_breakdown={str(i): 0 for i in _STAR_COLUMNS}
+        )
+    return RatingStatsResponse(
+        total_ratings=summary.rating_count,
+        average_rating=summary.average_rating,
+        rating_breakdown={str(i): getattr(summary, name) for i, name in _STAR_COLUMNS.items()}
+    )
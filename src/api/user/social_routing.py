@@ -1,4 +1,5 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import update, delete
 from sqlmodel import Session, select, func, and_, or_
 from typing import List, Annotated
 from datetime import datetime
@@ -9,12 +10,28 @@ from .model import (
     User, UserFollow, ShopFollow, UserRating, ShopRating,
     FollowUserRequest, FollowShopRequest, RateUserRequest, RateShopRequest,
     UserFollowResponse, ShopFollowResponse, UserRatingResponse, ShopRatingResponse,
-    FollowStatsResponse, RatingStatsResponse
+    FollowStatsResponse, FollowStatusResponse, RatingStatsResponse, RatingTargetType
 )
 from api.shop.model import Shop
+from .rating_summary import apply_rating_change, get_rating_stats
 
 router = APIRouter()
 
+# Số id tối đa cho mỗi loại trong batch follow status
+FOLLOW_STATUS_MAX_IDS = 100
+
+
+def _bump_counters(session: Session, model, row_id: int, **deltas: int):
+    """Cộng/trừ các bộ đếm follow bằng một câu UPDATE nguyên tử (không commit)"""
+    session.execute(
+        update(model)
+        .where(model.id == row_id)
+        .values({
+            name: func.greatest(getattr(model, name) + delta, 0)
+            for name, delta in deltas.items()
+        })
+    )
+
 # ============================
 # FOLLOW ENDPOINTS
 # ============================
@@ -64,6 +81,8 @@ def follow_user(
         following_id=request.following_id
     )
     session.add(new_follow)
+    _bump_counters(session, User, current_user.id, following_count=1)
+    _bump_counters(session, User, request.following_id, followers_count=1)
     session.commit()
     session.refresh(new_follow)
     
@@ -84,22 +103,23 @@ def unfollow_user(
 ):
     """Bỏ theo dõi user"""
     
-    follow = session.exec(
-        select(UserFollow).where(
+    result = session.execute(
+        delete(UserFollow).where(
             and_(
                 UserFollow.follower_id == current_user.id,
                 UserFollow.following_id == following_id
             )
         )
-    ).first()
+    )
     
-    if not follow:
+    if result.rowcount == 0:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Không tìm thấy mối quan hệ theo dõi"
         )
     
-    session.delete(follow)
+    _bump_counters(session, User, current_user.id, following_count=-1)
+    _bump_counters(session, User, following_id, followers_count=-1)
     session.commit()
     
     return {"message": "Đã bỏ theo dõi thành công"}
@@ -142,6 +162,8 @@ def follow_shop(
         shop_id=request.shop_id
     )
     session.add(new_follow)
+    _bump_counters(session, User, current_user.id, shop_following_count=1)
+    _bump_counters(session, Shop, request.shop_id, followers_count=1)
     session.commit()
     session.refresh(new_follow)
     
@@ -161,22 +183,23 @@ def unfollow_shop(
 ):
     """Bỏ theo dõi shop"""
     
-    follow = session.exec(
-        select(ShopFollow).where(
+    result = session.execute(
+        delete(ShopFollow).where(
             and_(
                 ShopFollow.user_id == current_user.id,
                 ShopFollow.shop_id == shop_id
             )
         )
-    ).first()
+    )
     
-    if not follow:
+    if result.rowcount == 0:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Không tìm thấy mối quan hệ theo dõi"
         )
     
-    session.delete(follow)
+    _bump_counters(session, User, current_user.id, shop_following_count=-1)
+    _bump_counters(session, Shop, shop_id, followers_count=-1)
     session.commit()
     
     return {"message": "Đã bỏ theo dõi shop thành công"}
@@ -373,45 +396,64 @@ def get_follow_stats(
     current_user: Annotated[User, Depends(get_current_user)],
     session: Session = Depends(get_session)
 ):
-    """Thống kê follow của user hiện tại"""
+    """Thống kê follow của user hiện tại (đọc từ bộ đếm, không COUNT)"""
     
-    # Đếm followers
-    followers_count = session.exec(
-        select(func.count(UserFollow.id))
-        .where(UserFollow.following_id == current_user.id)
-    ).one()
-    
-    # Đếm following users
-    following_count = session.exec(
-        select(func.count(UserFollow.id))
-        .where(UserFollow.follower_id == current_user.id)
-    ).one()
-    
-    # Đếm following shops
-    shop_following_count = session.exec(
-        select(func.count(ShopFollow.id))
-        .where(ShopFollow.user_id == current_user.id)
-    ).one()
-    
-    # Đếm followers của shop mình (nếu có shop)
-    my_shop_followers_count = 0
-    user_shop = session.exec(
-        select(Shop).where(Shop.user_id == current_user.id)
-    ).first()
-    
-    if user_shop:
-        my_shop_followers_count = session.exec(
-            select(func.count(ShopFollow.id))
-            .where(ShopFollow.shop_id == user_shop.id)
-        ).one()
+    # Followers của shop mình (nếu có shop)
+    my_shop_followers_count = session.exec(
+        select(Shop.followers_count).where(Shop.user_id == current_user.id)
+    ).first() or 0
     
     return FollowStatsResponse(
-        followers_count=followers_count,
-        following_count=following_count,
-        shop_following_count=shop_following_count,
+        followers_count=current_user.followers_count,
+        following_count=current_user.following_count,
+        shop_following_count=current_user.shop_following_count,
         my_shop_followers_count=my_shop_followers_count
     )
 
+@router.get("/follow/status", response_model=FollowStatusResponse)
+def get_follow_status(
+    current_user: Annotated[User, Depends(get_current_user)],
+    session: Session = Depends(get_session),
+    user_ids: List[int] = Query([], description="Danh sách user id cần kiểm tra"),
+    shop_ids: List[int] = Query([], description="Danh sách shop id cần kiểm tra"),
+):
+    """
+    Kiểm tra hàng loạt user hiện tại có đang follow các user/shop hay không.
+    Mỗi loại là một query trên unique index (follower, target) - dùng cho nút follow trong feed.
+    """
+    if len(user_ids) > FOLLOW_STATUS_MAX_IDS or len(shop_ids) > FOLLOW_STATUS_MAX_IDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Tối đa {FOLLOW_STATUS_MAX_IDS} id cho mỗi loại"
+        )
+    
+    followed_users = set()
+    if user_ids:
+        followed_users = set(session.exec(
+            select(UserFollow.following_id).where(
+                and_(
+                    UserFollow.follower_id == current_user.id,
+                    UserFollow.following_id.in_(user_ids)
+                )
+            )
+        ).all())
+    
+    followed_shops = set()
+    if shop_ids:
+        followed_shops = set(session.exec(
+            select(ShopFollow.shop_id).where(
+                and_(
+                    ShopFollow.user_id == current_user.id,
+                    ShopFollow.shop_id.in_(shop_ids)
+                )
+            )
+        ).all())
+    
+    return FollowStatusResponse(
+        users={user_id: user_id in followed_users for user_id in user_ids},
+        shops={shop_id: shop_id in followed_shops for shop_id in shop_ids}
+    )
+
 # ============================
 # RATING ENDPOINTS
 # ============================
@@ -446,11 +488,15 @@ def rate_user(
                 UserRating.rater_id == current_user.id,
                 UserRating.rated_user_id == request.rated_user_id
             )
-        )
+        ).with_for_update()
     ).first()
     
     if existing_rating:
-        # Cập nhật đánh giá hiện tại
+        # Cập nhật đánh giá hiện tại (summary chỉ cộng phần chênh lệch)
+        apply_rating_change(
+            session, RatingTargetType.user, request.rated_user_id,
+            old_rating=existing_rating.rating, new_rating=request.rating
+        )
         existing_rating.rating = request.rating
         existing_rating.comment = request.comment
         existing_rating.updated_at = datetime.utcnow()
@@ -478,6 +524,7 @@ def rate_user(
         comment=request.comment
     )
     session.add(new_rating)
+    apply_rating_change(session, RatingTargetType.user, request.rated_user_id, old_rating=None, new_rating=request.rating)
     session.commit()
     session.refresh(new_rating)
     
@@ -516,11 +563,15 @@ def rate_shop(
                 ShopRating.user_id == current_user.id,
                 ShopRating.shop_id == request.shop_id
             )
-        )
+        ).with_for_update()
     ).first()
     
     if existing_rating:
-        # Cập nhật đánh giá hiện tại
+        # Cập nhật đánh giá hiện tại (summary chỉ cộng phần chênh lệch)
+        apply_rating_change(
+            session, RatingTargetType.shop, request.shop_id,
+            old_rating=existing_rating.rating, new_rating=request.rating
+        )
         existing_rating.rating = request.rating
         existing_rating.comment = request.comment
         existing_rating.updated_at = datetime.utcnow()
@@ -548,6 +599,7 @@ def rate_shop(
         comment=request.comment
     )
     session.add(new_rating)
+    apply_rating_change(session, RatingTargetType.shop, request.shop_id, old_rating=None, new_rating=request.rating)
     session.commit()
     session.refresh(new_rating)
     
@@ -645,36 +697,7 @@ def get_user_rating_stats(
     session: Session = Depends(get_session)
 ):
     """Thống kê đánh giá của user"""
-    
-    # Đếm tổng ratings
-    total_ratings = session.exec(
-        select(func.count(UserRating.id))
-        .where(UserRating.rated_user_id == user_id)
-    ).one()
-    
-    # Tính điểm trung bình
-    avg_rating = session.exec(
-        select(func.avg(UserRating.rating))
-        .where(UserRating.rated_user_id == user_id)
-    ).one() or 0.0
-    
-    # Phân tích theo từng điểm
-    rating_breakdown = {}
-    for i in range(1, 6):
-        count = session.exec(
-            select(func.count(UserRating.id))
-            .where(and_(
-                UserRating.rated_user_id == user_id,
-                UserRating.rating == i
-            ))
-        ).one()
-        rating_breakdown[str(i)] = count
-    
-    return RatingStatsResponse(
-        total_ratings=total_ratings,
-        average_rating=round(float(avg_rating), 2),
-        rating_breakdown=rating_breakdown
-    )
+    return get_rating_stats(session, RatingTargetType.user, user_id)
 
 @router.get("/rating/shop/{shop_id}/stats", response_model=RatingStatsResponse)
 def get_shop_rating_stats(
@@ -682,33 +705,4 @@ def get_shop_rating_stats(
     session: Session = Depends(get_session)
 ):
     """Thống kê đánh giá của shop"""
-    
-    # Đếm tổng ratings
-    total_ratings = session.exec(
-        select(func.count(ShopRating.id))
-        .where(ShopRating.shop_id == shop_id)
-    ).one()
-    
-    # Tính điểm trung bình
-    avg_rating = session.exec(
-        select(func.avg(ShopRating.rating))
-        .where(ShopRating.shop_id == shop_id)
-    ).one() or 0.0
-    
-    # Phân tích theo từng điểm
-    rating_breakdown = {}
-    for i in range(1, 6):
-        count = session.exec(
-            select(func.count(ShopRating.id))
-            .where(and_(
-                ShopRating.shop_id == shop_id,
-                ShopRating.rating == i
-            ))
-        ).one()
-        rating_breakdown[str(i)] = count
-    
-    return RatingStatsResponse(
-        total_ratings=total_ratings,
-        average_rating=round(float(avg_rating), 2),
-        rating_breakdown=rating_breakdown
-    ) 
\ No newline at end of file
+    return get_rating_stats(session, RatingTargetType.shop, shop_id)
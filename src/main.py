@@ -1,5 +1,4 @@
 from fastapi import FastAPI, HTTPException, status
-from fastapi.staticfiles import StaticFiles
 from api.events import router as event_router
 from api.user import router as user_router
 from contextlib import asynccontextmanager
@@ -10,16 +9,22 @@ from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from typing import Annotated
 from fastapi import Depends, HTTPException
 from sqlmodel import Session
-from datetime import timedelta
+from sqlalchemy import update
+from datetime import datetime, timedelta
 from api.user.scheme import Token, RefreshRequest
 from api.auth.token_blacklist import add_token_to_blacklist
 from api.auth.dependency import get_current_user
 from api.user.model import User
 from api.auth.cleanup_task import start_background_tasks
+from api.product.trending import start_trending_refresh
 from api.user.protected_routing import router as user_protected_router
 from api.user.admin_routing import router as admin_router
 from api.user.social_routing import router as social_router
 from api.chat.connection_manager import connection_manager
+from api.media.processing import shutdown_process_pool
+from api.media.assets import start_media_gc
+from api.media.config import MEDIA_ROOT
+from api.media.static import MediaStaticFiles
 from api.address.routing import router as address_router
 from api.shop.routing import router as shop_router
 from api.category.routing import router as category_router
@@ -34,8 +39,9 @@ from api.payment.routing import router as payment_router
 from api.payment.model import Payment, PaymentMethod, RefundRequest  # Import để SQLModel biết về models
 # Debug imports
 from api.db.debug import router as debug_router
-from fastapi.responses import FileResponse, RedirectResponse
+from fastapi.responses import FileResponse, RedirectResponse, ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
+from api.cache.http import ConditionalGetMiddleware
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
@@ -45,23 +51,32 @@ async def lifespan( app:FastAPI):
     init_db()
     # Khởi động background tasks
     start_background_tasks()
+    start_trending_refresh()
+    start_media_gc()
     # Khởi động chat connection manager
     await connection_manager.start_background_tasks()
     yield
     #clean up
     await connection_manager.stop_background_tasks()
+    shutdown_process_pool()
 
 app = FastAPI(lifespan=lifespan,
             title="GreenBuy API",
+            # orjson thay cho json stdlib khi render mọi response JSON
+            default_response_class=ORJSONResponse,
             description="API cho hệ thống GreenBuy - ứng dụng thương mại điện tử",
             version="1.0.0",
             )
-app.mount("/static", StaticFiles(directory="static"), name="static")
+# Cache-Control immutable cho file theo nội dung, Range, file nén sẵn, X-Accel-Redirect (api/media/static.py)
+app.mount("/static", MediaStaticFiles(directory=MEDIA_ROOT), name="static")
 
 @app.get("/favicon.ico", include_in_schema=False)
 async def favicon():
     return FileResponse("static/favicon.png")
 
+# ETag / 304 cho các endpoint public có Cache-Control (đặt trong CORS để 304 vẫn có header CORS)
+app.add_middleware(ConditionalGetMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -104,6 +119,12 @@ async def login(form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
     if not user:
         raise HTTPException(status_code=401, detail="Invalid username or password")
 
+    # Ghi nhận lần đăng nhập (dùng cho thống kê user đăng nhập theo thời gian)
+    session.execute(
+        update(User).where(User.id == user.id).values(last_login=datetime.utcnow())
+    )
+    session.commit()
+
     expiry_time = timedelta(minutes=EXPIRE_TIME)
     access_token = create_access_token({"sub": form_data.username}, expiry_time)
 